@@ -0,0 +1,174 @@
+""" Time and memory-profile the query helpers against a synthetic repo.
+
+    python benchmarks/run.py --files 500 --output before.json
+    python benchmarks/run.py --files 500 --compare before.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import logging
+import os
+import platform
+import resource
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import semgrepl.cache
+import semgrepl.detect
+import semgrepl.main as sm
+from semgrepl.config import SemgreplConfig
+from synthetic import generate, LANGUAGES
+
+QUERIES = ["imports", "function_defs", "function_calls", "classes", "strings"]
+
+def measure(fn, rounds: int):
+    """ Run fn() `rounds` times. Returns per round wall times, the peak
+        Python heap allocated during one more round, and the result of the
+        last timed round. Allocations are only traced in that extra round,
+        as tracing slows down the code being timed.
+    """
+    times = []
+    result = None
+    for _ in range(rounds):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return times, peak, result
+
+def _stats(times, peak, result):
+    return {
+        "rounds": len(times),
+        "min": min(times),
+        "max": max(times),
+        "mean": statistics.mean(times),
+        "median": statistics.median(times),
+        "stddev": statistics.stdev(times) if len(times) > 1 else 0.0,
+        "peak_memory": peak,
+        "results": len(result) if result is not None and hasattr(result, "__len__") else None,
+    }
+
+def run(args) -> dict:
+    root = tempfile.mkdtemp(prefix="semgrepl-bench-")
+    try:
+        return _run(args, root)
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+def _run(args, root: str) -> dict:
+    repo = generate(os.path.join(root, "repo"), files=args.files, functions=args.functions,
+                    imports=args.imports, strings=args.strings, languages=args.languages, seed=args.seed)
+    benchmarks = {}
+
+    configs = []
+
+    def init():
+        # Forget what earlier rounds detected, in memory and on disk, so
+        # each one reads the whole repo
+        semgrepl.detect.clear_memo()
+        cache_dir = tempfile.mkdtemp(prefix="cache-", dir=root)
+        with contextlib.redirect_stdout(io.StringIO()):
+            config = SemgreplConfig([repo], sm.DEFAULT_RULES_DIR, workers=args.workers, cache_dir=cache_dir)
+        configs.append(config)
+        return config
+
+    try:
+        times, peak, config = measure(init, args.rounds)
+        benchmarks["init"] = _stats(times, peak, None)
+
+        # Without the result cache every round runs semgrep
+        config.cache.close()
+        config.cache = None
+        for name in QUERIES:
+            query = getattr(sm, name)
+            benchmarks[name] = _stats(*measure(lambda: query(config), args.rounds))
+
+        # Every round after the first is served from the result cache,
+        # closed with the config
+        config.cache = semgrepl.cache.ResultCache(os.path.join(root, "cache"))
+        for name in QUERIES:
+            query = getattr(sm, name)
+            query(config)
+            benchmarks[name + "[cached]"] = _stats(*measure(lambda: query(config), args.rounds))
+    finally:
+        for config in configs:
+            config.close()
+
+    return {
+        "machine": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "semgrep": semgrepl.cache.semgrep_version(),
+            # ru_maxrss is in KiB on Linux, bytes on macOS
+            "max_rss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        },
+        "params": {k: getattr(args, k) for k in ("files", "functions", "imports", "strings", "languages",
+                                                 "rounds", "workers", "seed")},
+        "benchmarks": benchmarks,
+    }
+
+def compare(current: dict, baseline: dict, threshold: float) -> bool:
+    """ Print each benchmark's median against the baseline's. Returns False if
+        any got slower by more than `threshold` (e.g. 0.2 for 20%).
+    """
+    ok = True
+    print("{:<24} {:>12} {:>12} {:>8}".format("benchmark", "baseline", "current", "change"))
+    for name, stats in current["benchmarks"].items():
+        old = baseline["benchmarks"].get(name)
+        if old is None:
+            print("{:<24} {:>12} {:>12.4f}".format(name, "-", stats["median"]))
+            continue
+        change = stats["median"] / old["median"] - 1 if old["median"] else 0.0
+        flag = ""
+        if change > threshold:
+            flag = "  SLOWER"
+            ok = False
+        print("{:<24} {:>12.4f} {:>12.4f} {:>+7.1%}{}".format(name, old["median"], stats["median"], change, flag))
+    return ok
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=100, help="source files per language")
+    parser.add_argument("--functions", type=int, default=10, help="functions per file")
+    parser.add_argument("--imports", type=int, default=5, help="imports per file")
+    parser.add_argument("--strings", type=int, default=2, help="string literals per function")
+    parser.add_argument("--languages", nargs="+", default=LANGUAGES, choices=LANGUAGES)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="JSON file of an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="with --compare, exit 1 if a benchmark is this much slower")
+    args = parser.parse_args()
+    # Missing rules for some languages are expected, don't drown the report
+    logging.disable(logging.WARNING)
+
+    results = run(args)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if not compare(results, baseline, args.threshold):
+            sys.exit(1)
+    else:
+        json.dump(results["benchmarks"], sys.stdout, indent=2)
+        print()
+
+if __name__ == "__main__":
+    main()
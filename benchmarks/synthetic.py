@@ -0,0 +1,102 @@
+""" Generate synthetic multi-language repos to benchmark semgrepl against.
+"""
+import os
+import random
+from typing import List
+
+LANGUAGES = ["python", "go", "java", "javascript", "ruby"]
+
+def _words(rng: random.Random, n: int) -> str:
+    return " ".join(rng.choice(["alpha", "beta", "gamma", "delta", "token", "secret", "user", "path"])
+                    for _ in range(n))
+
+def _python(rng, i, functions, imports, strings):
+    lines = ["import module_{}".format(rng.randrange(1000)) for _ in range(imports)]
+    lines.append("")
+    lines.append("class Class{}(object):".format(i))
+    lines.append("    name = \"{}\"".format(_words(rng, 2)))
+    lines.append("")
+    for f in range(functions):
+        lines.append("def func_{}_{}(arg):".format(i, f))
+        for _ in range(strings):
+            lines.append("    value = \"{}\"".format(_words(rng, 3)))
+        lines.append("    func_{}_{}(value)".format(rng.randrange(i + 1), rng.randrange(functions)))
+        lines.append("    return arg")
+        lines.append("")
+    return "py", lines
+
+def _go(rng, i, functions, imports, strings):
+    lines = ["package pkg{}".format(i), "", "import ("]
+    lines += ["\t\"example.com/module_{}\"".format(rng.randrange(1000)) for _ in range(imports)]
+    lines += [")", ""]
+    for f in range(functions):
+        lines.append("func Func{}_{}(arg string) string {{".format(i, f))
+        for _ in range(strings):
+            lines.append("\tvalue := \"{}\"".format(_words(rng, 3)))
+            lines.append("\targ = value")
+        lines.append("\tFunc{}_{}(arg)".format(rng.randrange(i + 1), rng.randrange(functions)))
+        lines.append("\treturn arg")
+        lines += ["}", ""]
+    return "go", lines
+
+def _java(rng, i, functions, imports, strings):
+    lines = ["import com.example.Module{};".format(rng.randrange(1000)) for _ in range(imports)]
+    lines += ["", "class Class{} {{".format(i)]
+    for f in range(functions):
+        lines.append("    public String func{}(String arg) {{".format(f))
+        for _ in range(strings):
+            lines.append("        arg = \"{}\";".format(_words(rng, 3)))
+        lines.append("        func{}(arg);".format(rng.randrange(functions)))
+        lines.append("        return arg;")
+        lines += ["    }", ""]
+    lines.append("}")
+    return "java", lines
+
+def _javascript(rng, i, functions, imports, strings):
+    lines = ["import m{0} from \"module_{1}\";".format(n, rng.randrange(1000)) for n in range(imports)]
+    lines.append("")
+    for f in range(functions):
+        lines.append("function func_{}_{}(arg) {{".format(i, f))
+        for _ in range(strings):
+            lines.append("  arg = \"{}\";".format(_words(rng, 3)))
+        lines.append("  func_{}_{}(arg);".format(rng.randrange(i + 1), rng.randrange(functions)))
+        lines.append("  return arg;")
+        lines += ["}", ""]
+    return "js", lines
+
+def _ruby(rng, i, functions, imports, strings):
+    lines = ["require \"module_{}\"".format(rng.randrange(1000)) for _ in range(imports)]
+    lines += ["", "class Class{}".format(i)]
+    for f in range(functions):
+        lines.append("  def func_{}(arg)".format(f))
+        for _ in range(strings):
+            lines.append("    arg = \"{}\"".format(_words(rng, 3)))
+        lines.append("    func_{}(arg)".format(rng.randrange(functions)))
+        lines.append("    arg")
+        lines += ["  end", ""]
+    lines.append("end")
+    return "rb", lines
+
+GENERATORS = {
+    "python": _python,
+    "go": _go,
+    "java": _java,
+    "javascript": _javascript,
+    "ruby": _ruby,
+}
+
+def generate(root: str, files: int = 100, functions: int = 10, imports: int = 5, strings: int = 2,
+             languages: List[str] = LANGUAGES, seed: int = 0) -> str:
+    """ Write a repo of `files` source files per language under `root`,
+        spread over nested packages. The same arguments always produce the
+        same repo.
+    """
+    rng = random.Random(seed)
+    for lang in languages:
+        for i in range(files):
+            ext, lines = GENERATORS[lang](rng, i, functions, imports, strings)
+            d = os.path.join(root, lang, "pkg{}".format(i // 50), "sub{}".format(i % 5))
+            os.makedirs(d, exist_ok=True)
+            with open(os.path.join(d, "file{}.{}".format(i, ext)), 'w') as f:
+                f.write("\n".join(lines) + "\n")
+    return root
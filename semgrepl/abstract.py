@@ -1,13 +1,130 @@
+import ast
+import logging
 import os
-from typing import List, Dict
+import re
+import sys
+import itertools
+import textwrap
+from typing import List, Dict, Tuple
 import semgrepl
 from semgrepl import tokei
+from semgrepl.strings import unquote
+from semgrepl.resultset import ResultSet
+from semgrepl.table import ResultTable
 
 class SemgreplObject:
+    """ Base of all query results.
+
+        Results keep only their location, as interned paths and plain ints,
+        rather than semgrep's match dict. The matched source is read back
+        from disk when asked for (see `lines`).
+    """
+    __slots__ = ('file_path', 'start_line', 'start_col', 'end_line', 'end_col')
+
+    def _set_location(self, match):
+        self.file_path = sys.intern(match['path'])
+        self.start_line = match['start']['line']
+        self.start_col = match['start']['col']
+        self.end_line = match['end']['line']
+        self.end_col = match['end']['col']
+
     @property
     def key(self):
         raise Exception("Every SemgreplObject must implement a unique `key`")
 
+    @property
+    def start(self):
+        return {'line': self.start_line, 'col': self.start_col}
+
+    @property
+    def end(self):
+        return {'line': self.end_line, 'col': self.end_col}
+
+    @property
+    def location(self):
+        return "{}:{}".format(self.file_path, self.start_line)
+
+    @property
+    def lines(self) -> str:
+        """ The source lines of the match, read from disk.
+        """
+        return "".join(_read_lines(self.file_path, self.start_line, self.end_line)).rstrip("\n")
+
+def _read_lines(path: str, first: int, last: int) -> List[str]:
+    """ Lines `first` to `last` (1-based, included) of a file, read on each
+        call rather than cached, so results never keep whole files alive.
+    """
+    try:
+        with open(path, encoding='utf-8', errors='replace') as f:
+            return list(itertools.islice(f, first - 1, last))
+    except OSError:
+        return []
+
+def _metavar(metavars, name):
+    return sys.intern(metavars[name]['abstract_content'])
+
+def _dotted_name(node) -> str:
+    if isinstance(node, ast.Name):
+        return node.id
+    if isinstance(node, ast.Attribute):
+        value = _dotted_name(node.value)
+        return value + "." + node.attr if value else None
+    if isinstance(node, ast.Subscript):
+        # Generic[T] => Generic
+        return _dotted_name(node.value)
+    return None
+
+def _class_bases(source: str) -> List[str]:
+    """ Base classes named in the header of a Python class definition, e.g.
+        ["web.RequestHandler", "Mixin"].
+    """
+    m = re.search(r"^[ \t]*class\b", source, re.M)
+    if m is None:
+        return []
+    # The header ends at the first colon outside brackets
+    depth = 0
+    for i in range(m.start(), len(source)):
+        c = source[i]
+        if c in "([{":
+            depth += 1
+        elif c in ")]}":
+            depth -= 1
+        elif c == ":" and depth == 0:
+            break
+    else:
+        return []
+    try:
+        tree = ast.parse(source[m.start():i + 1].strip() + " pass")
+    except SyntaxError:
+        return []
+    names = (_dotted_name(b) for b in tree.body[0].bases)
+    return [sys.intern(n) for n in names if n and n != "object"]
+
+class SemgreplResults(list):
+    """ The SemgreplObjects returned by a query. Remembers the query that
+        produced them, so `refresh` can bring them up to date in place.
+    """
+    # Timings and counters of the run that produced them, see stats.QueryStats
+    stats = None
+    # The scope.Scope the query was restricted to, if any
+    scope = None
+    # Name of the result set it's saved as in a session.SessionStore, if any
+    session_name = None
+
+    def __init__(self, items=(), query=None):
+        super().__init__(items)
+        self.query = query
+
+    def __getstate__(self):
+        # Stats describe this session's runs, don't save them with the index
+        return {"query": self.query}
+
+    def to_table(self) -> ResultTable:
+        return ResultTable.from_results(self)
+
+    def to_set(self) -> ResultSet:
+        return ResultSet(self)
+
 
 # TODO: should matches include which `language` is associated with the rule?
 # * Alternatively: we build a map of rule_id => YAML
@@ -15,18 +132,17 @@ class SemgreplObject:
 #   * Then do the mapping ourselves
 # * PAIN POINT - mixing Python, etc. imports
 class SemgreplImport(SemgreplObject):
+    __slots__ = ('import_path',)
+
     def __init__(self, match):
         metavars = match['extra']['metavars']
-        self.file_path = match['path']
-        self.start = match['start']
-        self.end = match['end']
-        self.match = match
+        self._set_location(match)
 
         if '$A' in metavars:
             # Parse out all the keys and sort alphabetically to get proper path
             sorted_keys = sorted(metavars.keys())
             matched = [metavars[x]['abstract_content'] for x in sorted_keys]
-            self.import_path = ".".join(matched)
+            self.import_path = sys.intern(".".join(matched))
         else:
             print("Failed on file: " + self.file_path)
             self.import_path = "FAILED"
@@ -39,30 +155,25 @@ class SemgreplImport(SemgreplObject):
         return self.import_path
 
     def __hash__(self):
-        return hash(self.import_path + self.file_path)
+        return hash((self.import_path, self.file_path))
 
     def __eq__(self, other):
         return self.file_path == other.file_path and self.import_path == other.import_path
 
 class SemgreplFunctionCall(SemgreplObject):
+    __slots__ = ('name', 'instance')
+
     def __init__(self, function_name, match):
         metavars = match['extra']['metavars']
-        self.file_path = match['path']
-        self.start = match['start']
-        self.end = match['end']
-        self.name = function_name
+        self._set_location(match)
+        self.name = sys.intern(function_name)
         self.instance = None
-        self.match = match
 
         if '$INSTANCE' in metavars:
-            self.instance = metavars['$INSTANCE']['abstract_content']
+            self.instance = _metavar(metavars, '$INSTANCE')
 
         if '$NAME' in metavars:
-            self.name = metavars['$NAME']['abstract_content']
-
-    @property
-    def location(self):
-        return "{}:{}".format(self.file_path, self.start['line'])
+            self.name = _metavar(metavars, '$NAME')
 
     @property
     def key(self):
@@ -72,23 +183,22 @@ class SemgreplFunctionCall(SemgreplObject):
         return "<SemgreplFunctionCall file_path={} name={} instance={}>".format(self.file_path, self.name, self.instance)
 
     def __hash__(self):
-        return hash(self.file_path + self.name)
+        return hash((self.file_path, self.name))
 
     def __eq__(self, other):
         return self.file_path == other.file_path and self.name == other.name
 
 class SemgreplFunctionDef(SemgreplObject):
+    __slots__ = ('name',)
+
     def __init__(self, match, function_name=None):
         metavars = match['extra']['metavars']
-        self.file_path = match['path']
-        self.start = match['start']
-        self.end = match['end']
-        self.match = match
+        self._set_location(match)
 
         if function_name != "$X":
-            self.name = function_name
+            self.name = sys.intern(function_name)
         elif '$X' in metavars:
-            self.name = metavars['$X']['abstract_content']
+            self.name = _metavar(metavars, '$X')
         else:
             print("Failed on file: " + self.file_path)
             self.name = "FAILED"
@@ -96,16 +206,18 @@ class SemgreplFunctionDef(SemgreplObject):
     @property
     def annotations(self):
         annotations = []
-        lines = self.match['extra']['lines']
-        for l in lines.split("\n"):
+        # Up to the match only, for the decorators directly above it, in
+        # case it starts at the `def`
+        source = _read_lines(self.file_path, 1, self.end_line)
+        # (the file may have shrunk since the scan)
+        first = min(self.start_line - 1, len(source))
+        while first > 0 and source[first - 1].strip().startswith("@"):
+            first -= 1
+        for l in source[first:self.end_line]:
             if l.strip().startswith("@"):
                 annotations.append(l.strip())
         return annotations
 
-    @property
-    def location(self):
-        return "{}:{}".format(self.file_path, self.start['line'])
-
     @property
     def key(self):
         return self.name
@@ -114,21 +226,23 @@ class SemgreplFunctionDef(SemgreplObject):
         return "<SemgreplFunctionDef file_path={} name={}>".format(self.file_path, self.name)
 
     def __hash__(self):
-        return hash(self.file_path + self.name)
+        return hash((self.file_path, self.name))
 
     def __eq__(self, other):
         return self.file_path == other.file_path and self.name == other.name
 
 class SemgreplClass(SemgreplObject):
+    __slots__ = ('name', 'bases')
+
     def __init__(self, match, class_name=None):
-        self.file_path = match['path']
+        self._set_location(match)
         metavars = match['extra']['metavars']
-        self.match = match
+        self.bases = _class_bases(match['extra'].get('lines', ""))
 
         if class_name != "$X":
-            self.name = class_name
+            self.name = sys.intern(class_name)
         elif '$X' in metavars:
-            self.name = metavars['$X']['abstract_content']
+            self.name = _metavar(metavars, '$X')
         else:
             print("Failed on file: " + self.file_path)
             self.name = "FAILED"
@@ -141,23 +255,30 @@ class SemgreplClass(SemgreplObject):
         return self.name
 
     def __hash__(self):
-        return hash(self.file_path + self.name)
+        return hash((self.file_path, self.name))
 
     def __eq__(self, other):
         return self.file_path == other.file_path and self.name == other.name
 
 class SemgreplString(SemgreplObject):
+    __slots__ = ('name',)
+
     def __init__(self, match):
-        self.file_path = match['path']
+        self._set_location(match)
         metavars = match['extra']['metavars']
-        self.match = match
 
         if '$X' in metavars:
-            self.name = metavars['$X']['abstract_content']
+            self.name = _metavar(metavars, '$X')
         else:
             print("Failed on file: " + self.file_path)
             self.name = "FAILED"
 
+    @property
+    def value(self) -> str:
+        """ The string itself; `name` is the literal as written, with quotes.
+        """
+        return unquote(self.name)
+
     @property
     def key(self):
         return self.name
@@ -166,19 +287,20 @@ class SemgreplString(SemgreplObject):
         return "<SemgreplString file_path={} name={}".format(self.file_path, self.name)
 
     def __hash__(self):
-        return hash(self.file_path + self.name)
+        return hash((self.file_path, self.name))
 
     def __eq__(self, other):
         return self.file_path == other.file_path and self.name == other.name
 
 class SemgreplAnnotation(SemgreplObject):
+    __slots__ = ('name',)
+
     def __init__(self, match):
-        self.file_path = match['path']
+        self._set_location(match)
         metavars = match['extra']['metavars']
-        self.match = match
 
         if '$X' in metavars:
-            self.name = metavars['$X']['abstract_content']
+            self.name = _metavar(metavars, '$X')
         else:
             print("Failed on file: " + self.file_path)
             self.name = "FAILED"
@@ -191,7 +313,173 @@ class SemgreplAnnotation(SemgreplObject):
         return "<SemgreplString file_path={} name={}".format(self.file_path, self.name)
 
     def __hash__(self):
-        return hash(self.file_path + self.name)
+        return hash((self.file_path, self.name))
 
     def __eq__(self, other):
         return self.file_path == other.file_path and self.name == other.name
+
+def _rule_id(match):
+    # semgrep prefixes rule ids with the path of the config they came from
+    return sys.intern(match['check_id'].rsplit('.', 1)[-1])
+
+class SemgreplRoute(SemgreplObject):
+    __slots__ = ('path', 'function_name', 'app')
+
+    def __init__(self, match):
+        self._set_location(match)
+        metavars = match['extra']['metavars']
+        self.path = sys.intern(metavars['$PATH']['abstract_content'].strip("'\"")) if '$PATH' in metavars else None
+        self.function_name = _metavar(metavars, '$FUNC') if '$FUNC' in metavars else None
+        self.app = _metavar(metavars, '$APP') if '$APP' in metavars else None
+
+    @property
+    def method(self):
+        """ The decorator used, e.g. "route" or "get".
+        """
+        m = re.match(r"\s*@[\w.]+\.(\w+)\(", self.lines)
+        return m.group(1) if m else None
+
+    @property
+    def key(self):
+        return self.path
+
+    def __repr__(self):
+        return "<SemgreplRoute file_path={} path={} function_name={}>".format(self.file_path, self.path,
+                                                                            self.function_name)
+
+    def __hash__(self):
+        return hash((self.file_path, self.start_line, self.path))
+
+    def __eq__(self, other):
+        return (self.file_path == other.file_path and self.start_line == other.start_line
+                and self.path == other.path)
+
+class SemgreplSink(SemgreplObject):
+    """ A call into something dangerous (shell, eval, deserialization, ...),
+        see rules/python/sinks.yaml.
+    """
+    __slots__ = ('category',)
+
+    def __init__(self, match):
+        self._set_location(match)
+        category = match['extra'].get('metadata', {}).get('category')
+        if category is None:
+            category = _rule_id(match).split("sink-", 1)[-1]
+        self.category = sys.intern(category)
+
+    @property
+    def key(self):
+        return self.category
+
+    def __repr__(self):
+        return "<SemgreplSink file_path={} category={} start_line={}>".format(self.file_path, self.category,
+                                                                            self.start_line)
+
+    def __hash__(self):
+        return hash((self.file_path, self.start_line, self.category))
+
+    def __eq__(self, other):
+        return (self.file_path == other.file_path and self.start_line == other.start_line
+                and self.category == other.category)
+
+class SemgreplMatch(SemgreplObject):
+    """ A match of a rules file semgrepl has no dedicated class for.
+    """
+    __slots__ = ('rule_id', 'message')
+
+    def __init__(self, match):
+        self._set_location(match)
+        self.rule_id = _rule_id(match)
+        self.message = sys.intern(match['extra'].get('message', "").strip())
+
+    @property
+    def key(self):
+        return self.rule_id
+
+    def __repr__(self):
+        return "<SemgreplMatch file_path={} rule_id={} start_line={}>".format(self.file_path, self.rule_id,
+                                                                            self.start_line)
+
+    def __hash__(self):
+        return hash((self.file_path, self.start_line, self.rule_id))
+
+    def __eq__(self, other):
+        return (self.file_path == other.file_path and self.start_line == other.start_line
+                and self.rule_id == other.rule_id)
+
+def _matched_source(match) -> str:
+    """ The text semgrep matched, cut out of the whole lines it reports, so
+        e.g. the `try:` before `try: import a` isn't parsed with it.
+    """
+    lines = match['extra'].get('lines', "").split("\n")
+    n = match['end']['line'] - match['start']['line'] + 1
+    lines = lines[:n]
+    if len(lines) == n:
+        lines[-1] = lines[-1][:match['end']['col'] - 1]
+    lines[0] = lines[0][match['start']['col'] - 1:]
+    return "\n".join(lines)
+
+def _parse_imports(source: str) -> List[Tuple[str, str, int]]:
+    """ (module, name, level) of everything a Python import statement
+        imports: `import a.b` => ("a.b", None, 0), `from ..c import d` =>
+        ("c", "d", 2), `from . import e` => ("", "e", 1).
+        Raises SyntaxError if `source` doesn't parse.
+    """
+    tree = ast.parse(textwrap.dedent(source))
+    entries = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            entries.extend((sys.intern(a.name), None, 0) for a in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            module = sys.intern(node.module or "")
+            entries.extend((module, sys.intern(a.name), node.level) for a in node.names)
+    return entries
+
+class SemgreplImportStatement(SemgreplObject):
+    """ A whole import statement, see importgraph.extract_file.
+        `imports` lists what it imports as (module, name, level) tuples.
+    """
+    __slots__ = ('imports',)
+
+    def __init__(self, match):
+        self._set_location(match)
+        imports = match['extra'].get('imports')
+        if imports is not None:
+            # Already parsed, see importgraph.extract_file
+            self.imports = [(sys.intern(module), sys.intern(name) if name is not None else None, level)
+                            for module, name, level in imports]
+            return
+        try:
+            self.imports = _parse_imports(_matched_source(match))
+        except SyntaxError as e:
+            logging.warning("Can't parse the import statement at {}:{}: {}".format(
+                self.file_path, self.start_line, e))
+            self.imports = []
+
+    @property
+    def modules(self) -> List[str]:
+        """ Modules imported, relative ones with their leading dots.
+        """
+        names = []
+        for module, name, level in self.imports:
+            prefix = "." * level
+            if name is None:
+                names.append(module)
+            elif module:
+                names.append(prefix + module)
+            else:
+                names.append(prefix + name)
+        return list(dict.fromkeys(names))
+
+    @property
+    def key(self):
+        return ", ".join(self.modules)
+
+    def __repr__(self):
+        return "<SemgreplImportStatement file_path={} modules={}>".format(self.file_path, self.modules)
+
+    def __hash__(self):
+        return hash((self.file_path, self.start_line))
+
+    def __eq__(self, other):
+        return self.file_path == other.file_path and self.start_line == other.start_line
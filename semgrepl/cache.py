@@ -0,0 +1,177 @@
+import contextlib
+import functools
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import zlib
+from typing import List, Dict, Tuple
+
+# cache_dir argument standing for default_cache_dir()
+DEFAULT_CACHE_DIR = "$XDG_CACHE_HOME/semgrepl"
+
+# 512 MiB of compressed results
+DEFAULT_MAX_SIZE = 512 * 1024 * 1024
+
+# When the cache grows past max_size, evict down to this fraction of it so
+# that we don't evict again on the very next write.
+EVICT_TO = 0.8
+
+# Paths looked up per SQL statement, below SQLite's limit on parameters
+LOOKUP_CHUNK = 500
+
+# Content hashes kept, by (path, mtime_ns, size), so unchanged files are
+# only read once per session. Least recently hashed files (and old versions
+# of edited ones) are forgotten past this.
+HASH_MEMO_SIZE = 100000
+
+def default_cache_dir() -> str:
+    """ $XDG_CACHE_HOME/semgrepl, or ~/.cache/semgrepl. Looked up when a
+        cache is opened rather than at import, so it can be changed later
+        (the tests point it at a temporary directory).
+    """
+    return os.path.join(os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache")), "semgrepl")
+
+def resolve_dir(cache_dir: str) -> str:
+    return default_cache_dir() if cache_dir == DEFAULT_CACHE_DIR else cache_dir
+
+@contextlib.contextmanager
+def atomic_write(path: str, mode: str = 'w'):
+    """ A file to write `path` through: a uniquely named temporary file in
+        the same directory, renamed over `path` once the block succeeds, so
+        readers and concurrent writers (other threads or sessions) never see
+        a partial file.
+    """
+    f = tempfile.NamedTemporaryFile(mode, dir=os.path.dirname(path) or ".",
+                                    prefix=os.path.basename(path) + ".", suffix=".tmp", delete=False)
+    try:
+        with f:
+            yield f
+        os.replace(f.name, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.unlink(f.name)
+        raise
+
+def file_hash(path: str) -> str:
+    st = os.stat(path)
+    return _hash(path, st.st_mtime_ns, st.st_size)
+
+@functools.lru_cache(maxsize=HASH_MEMO_SIZE)
+def _hash(path: str, mtime_ns: int, size: int) -> str:
+    with open(path, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+def semgrep_version() -> str:
+    try:
+        import semgrep
+        return getattr(semgrep, "__VERSION__", "")
+    except ImportError:
+        return ""
+
+def rules_key(rules: List[Dict]) -> str:
+    """ Results depend on the rules and the semgrep version matching them.
+    """
+    h = hashlib.sha1(semgrep_version().encode('utf-8'))
+    h.update(json.dumps(rules, sort_keys=True).encode('utf-8'))
+    return h.hexdigest()
+
+class ResultCache:
+    """ Semgrep matches per (rules, file), stored in SQLite.
+
+        A file's entry is only served while its content hash is unchanged.
+        Least recently used entries are evicted once the cache holds more
+        than `max_size` bytes.
+    """
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, max_size: int = DEFAULT_MAX_SIZE):
+        cache_dir = resolve_dir(cache_dir)
+        os.makedirs(cache_dir, exist_ok=True)
+        self.path = os.path.join(cache_dir, "results.sqlite3")
+        self.max_size = max_size
+        # Used from the asyncio helpers' worker threads too
+        self.db = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self.lock = threading.RLock()
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS results (
+                rules_key TEXT NOT NULL,
+                path TEXT NOT NULL,
+                file_hash TEXT NOT NULL,
+                data BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (rules_key, path)
+            )""")
+        self.db.execute("CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used)")
+        self.db.commit()
+
+    def __repr__(self):
+        return "<ResultCache path={} max_size={}>".format(self.path, self.max_size)
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+    def get_many(self, rules_key: str, file_hashes: Dict[str, str]) -> Dict[str, List[Dict]]:
+        """ Returns {path: matches} for every file in `file_hashes` ({path: hash})
+            with an up to date entry.
+        """
+        hits = {}
+        paths = list(file_hashes)
+        with self.lock:
+            for i in range(0, len(paths), LOOKUP_CHUNK):
+                chunk = paths[i:i + LOOKUP_CHUNK]
+                rows = self.db.execute(
+                    "SELECT path, file_hash, data FROM results WHERE rules_key = ? AND path IN ({})".format(
+                        ", ".join("?" * len(chunk))),
+                    [rules_key] + chunk).fetchall()
+                for path, cached_hash, data in rows:
+                    if file_hashes[path] == cached_hash:
+                        hits[path] = json.loads(zlib.decompress(data))
+            if hits:
+                now = time.time()
+                self.db.executemany(
+                    "UPDATE results SET last_used = ? WHERE rules_key = ? AND path = ?",
+                    [(now, rules_key, path) for path in hits])
+                self.db.commit()
+        return hits
+
+    def put_many(self, entries: List[Tuple[str, str, str, List[Dict]]]):
+        """ Store (rules_key, path, file_hash, matches) entries.
+        """
+        now = time.time()
+        rows = []
+        for key, path, fhash, matches in entries:
+            data = zlib.compress(json.dumps(matches).encode('utf-8'))
+            rows.append((key, path, fhash, data, len(data), now))
+        with self.lock:
+            self.db.executemany("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?)", rows)
+            self.db.commit()
+            self.evict()
+
+    @property
+    def size(self) -> int:
+        with self.lock:
+            return self.db.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+
+    def evict(self):
+        with self.lock:
+            size = self.size
+            if size <= self.max_size:
+                return
+            doomed = []
+            for rowid, entry_size in self.db.execute("SELECT rowid, size FROM results ORDER BY last_used"):
+                if size <= self.max_size * EVICT_TO:
+                    break
+                doomed.append((rowid,))
+                size -= entry_size
+            self.db.executemany("DELETE FROM results WHERE rowid = ?", doomed)
+            self.db.commit()
+
+    def clear(self):
+        with self.lock:
+            self.db.execute("DELETE FROM results")
+            self.db.commit()
+            self.db.execute("VACUUM")
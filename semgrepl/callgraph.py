@@ -0,0 +1,133 @@
+from collections import defaultdict, deque
+from typing import List, Dict, Set, Union
+from semgrepl.abstract import *
+from semgrepl.index import SymbolIndex, bare_name
+
+# A function can be given by name (every def with that name) or as the
+# SemgreplFunctionDef itself
+Function = Union[str, SemgreplFunctionDef]
+
+class CallGraph:
+    """ Which functions call which, approximated from names: a call to `get`
+        is an edge to every def named `get`. Calls to names with no def in
+        the targets (e.g. `exec`) are kept as sinks that can still be
+        searched for.
+
+        Nodes are indexes into `self.defs`; adjacency is held as lists of
+        sets, so every query is a plain BFS over prebuilt edges.
+    """
+    def __init__(self, index: SymbolIndex):
+        self.defs = list(index.defs)
+        self._node_of = node_of = {id(d): i for i, d in enumerate(self.defs)}
+        self.nodes_by_name = defaultdict(list)
+        for i, d in enumerate(self.defs):
+            self.nodes_by_name[d.name].append(i)
+
+        self.callees = [set() for _ in self.defs]
+        self.callers = [set() for _ in self.defs]
+        # name => nodes calling a function of that name, names being bare
+        # (self.helper() and mod.helper() are calls to "helper")
+        self.call_sites = defaultdict(set)
+        # calls made at module level, by name
+        self.module_calls = defaultdict(list)
+
+        for call in index.calls:
+            name = bare_name(call.name)
+            func = index.enclosing_function(call)
+            if func is None:
+                self.module_calls[name].append(call)
+                continue
+            caller = node_of[id(func)]
+            self.call_sites[name].add(caller)
+            for callee in self.nodes_by_name.get(name, []):
+                self.callees[caller].add(callee)
+                self.callers[callee].add(caller)
+
+    def __repr__(self):
+        return "<CallGraph functions={} edges={}>".format(len(self.defs), sum(len(c) for c in self.callees))
+
+    def _nodes(self, functions) -> List[int]:
+        if isinstance(functions, (str, SemgreplFunctionDef)):
+            functions = [functions]
+        nodes = []
+        for f in functions:
+            if isinstance(f, str):
+                nodes.extend(self.nodes_by_name.get(f, []))
+            elif id(f) in self._node_of:
+                nodes.append(self._node_of[id(f)])
+        return nodes
+
+    def _bfs(self, start: List[int], edges: List[Set[int]], depth: int = None) -> List[int]:
+        """ Nodes reachable from `start` along `edges`, closest first, at most
+            `depth` steps away (counting `start` as 1 step).
+        """
+        seen = set(start)
+        order = list(start)
+        frontier = deque((n, 1) for n in start)
+        while frontier:
+            node, d = frontier.popleft()
+            if depth is not None and d >= depth:
+                continue
+            for nxt in edges[node]:
+                if nxt not in seen:
+                    seen.add(nxt)
+                    order.append(nxt)
+                    frontier.append((nxt, d + 1))
+        return order
+
+    def callers_of(self, function: Function, depth: int = 1) -> List[SemgreplFunctionDef]:
+        """ Functions calling `function`, then their callers and so on, up to
+            `depth` levels (None for no limit). Closest callers come first.
+
+            `function` may be the name of something never defined in the
+            targets, e.g. callers_of("exec", depth=None).
+        """
+        if isinstance(function, str):
+            start = sorted(self.call_sites.get(bare_name(function), ()))
+        else:
+            start = sorted(set().union(*(self.callers[n] for n in self._nodes(function))))
+        return [self.defs[n] for n in self._bfs(start, self.callers, depth)]
+
+    def callees_of(self, function: Function, depth: int = 1) -> List[SemgreplFunctionDef]:
+        """ Functions defined in the targets that `function` calls, up to
+            `depth` levels (None for no limit).
+        """
+        start = sorted(set().union(*(self.callees[n] for n in self._nodes(function))))
+        return [self.defs[n] for n in self._bfs(start, self.callees, depth)]
+
+    def reachable(self, functions, depth: int = None) -> List[SemgreplFunctionDef]:
+        """ Every function that can be reached by calls from `functions`.
+        """
+        return [self.defs[n] for n in self._bfs(self._nodes(functions), self.callees, depth)]
+
+    def paths_to(self, entry_points, sink: Function) -> List[List[SemgreplFunctionDef]]:
+        """ For every entry point that can reach `sink`, a shortest chain of
+            calls from it: [entry point, ..., function calling the sink].
+
+            Computed with one backwards BFS from the sink, so the cost doesn't
+            depend on the number of entry points.
+        """
+        if isinstance(sink, str):
+            targets = sorted(self.call_sites.get(bare_name(sink), ()))
+        else:
+            targets = sorted(set().union(*(self.callers[n] for n in self._nodes(sink))))
+
+        # next_hop[n]: the next function on a shortest path from n to the sink
+        next_hop = {n: None for n in targets}
+        frontier = deque(targets)
+        while frontier:
+            node = frontier.popleft()
+            for caller in self.callers[node]:
+                if caller not in next_hop:
+                    next_hop[caller] = node
+                    frontier.append(caller)
+
+        paths = []
+        for entry in self._nodes(entry_points):
+            if entry not in next_hop:
+                continue
+            path = [entry]
+            while next_hop[path[-1]] is not None:
+                path.append(next_hop[path[-1]])
+            paths.append([self.defs[n] for n in path])
+        return paths
@@ -1,15 +1,28 @@
 import os
 import logging
-from typing import List, Dict
+import threading
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import List, Dict, Set
 import semgrepl.tokei as tokei
+import semgrepl.cache as cache
+import semgrepl.detect as detect
+import semgrepl.targets as targets
+from semgrepl.snapshot import Snapshot
+from semgrepl.stats import QueryStats
 
 # TODO: should infer this from semgrep somehow
 SEMGREP_SUPPORTED_LANGUAGES = ["python", "go", "java", "javascript", "ruby"]
 
+# Targets whose languages are detected at the same time
+DETECT_THREADS = 8
+
 class SemgreplConfig:
     """ Object holding configuration for targets.
     """
-    def __init__(self, targets, rules_dir = "", default_language = None, exclude_paths = []):
+    def __init__(self, targets, rules_dir = "", default_language = None, exclude_paths = [],
+                 cache_dir = cache.DEFAULT_CACHE_DIR, cache_max_size = cache.DEFAULT_MAX_SIZE, workers = 1,
+                 background_detection = False, result_cache = None):
         self.logger = logging.getLogger(__name__)
         self.logger.setLevel(logging.DEBUG)
         self.rules_dir = os.path.abspath(rules_dir)
@@ -22,24 +35,148 @@ class SemgreplConfig:
         # Make all targets absolute paths
         self.targets = [os.path.abspath(x) for x in targets]
 
-        # Maps repo root to languages used
-        self.languages_used = {}
+        # Results of previous semgrep runs, keyed by rules and file content.
+        # Pass cache_dir=None to always rescan, or result_cache to share an
+        # open one between configs.
+        self.cache_dir = cache.resolve_dir(cache_dir)
+        # Closed by close() unless it was passed in
+        self._owns_cache = result_cache is None
+        if result_cache is not None:
+            self.cache = result_cache
+        else:
+            self.cache = cache.ResultCache(self.cache_dir, cache_max_size) if self.cache_dir else None
+
+        # Number of processes semgrep scans are sharded across
+        self.workers = workers
+        self._executor = None
+
+        # Long-lived semgrep worker processes, see main.start_workers()
+        self.worker_pool = None
+
+        # Timings and counters of every query run with this config
+        self.stats = QueryStats()
+
+        # State of the targets' files when results were last brought up to
+        # date, and weak references to the SemgreplResults handed out since,
+        # see main.refresh()
+        self.snapshot = None
+        self.history = []
 
-        # Run tokei on all targets
+        # Set by main.build_index(). When it was last checked for edited
+        # files (time.monotonic()), see main._index_for()
+        self.index = None
+        self.index_checked = None
+        self.index_lock = threading.Lock()
+
+        # Set by main.open_session()
+        self.session = None
+
+        # Detect languages used in all targets, in parallel. With
+        # background_detection=True this returns right away and
+        # languages_used / languages wait for the result when first used.
         logging.info("Determining languages used in target repos...")
+        # State of the files before detection walks them, so files added
+        # or deleted later can be re-filed, see sync_manifest(). Taken
+        # first, so nothing edited during detection is missed.
+        self._manifest_since = Snapshot.take(self.targets, exclude_paths)
+        self._manifest_lock = threading.Lock()
+        pool = ThreadPoolExecutor(max_workers=max(1, min(len(self.targets), DETECT_THREADS)))
+        self._detection = {}
         for target in self.targets:
             # for ease of reference, just have the base dirname of the repo
             # be the key
             key = os.path.basename(target)
-            self.languages_used[key] = tokei.Tokei.run(target)
-        logging.info("Finished language detection.")
+            self._detection[key] = pool.submit(detect.detect, target, exclude_paths, self.cache_dir)
+        pool.shutdown(wait=False)
+        self._languages_used = None
+        self._languages = None
+        self._manifest = None
+        self._manifest_lists = {}
+
+        if not background_detection:
+            self.print_languages_used()
+            logging.info("Finished language detection.")
+
+    @property
+    def languages_used(self) -> Dict[str, tokei.TokeiOutput]:
+        """ Maps repo root to languages used
+        """
+        if self._languages_used is None:
+            self._languages_used = {key: f.result() for key, f in self._detection.items()}
+        return self._languages_used
 
-        # self.languages is the union list of languages used in any repo
-        # in [targets] that semgrep can currently parse
-        self.languages = self.semgrep_supported_langs_any_repo(self.languages_used)
+    @property
+    def languages(self) -> List[str]:
+        """ The union list of languages used in any repo in [targets] that
+            semgrep can currently parse. Can be modified to add or skip
+            languages.
+        """
+        if self._languages is None:
+            self._languages = self.semgrep_supported_langs_any_repo(self.languages_used)
+        return self._languages
 
-        self.print_languages_used()
+    @languages.setter
+    def languages(self, languages: List[str]):
+        self._languages = languages
 
+    @property
+    def manifest(self) -> Dict[str, Set[str]]:
+        """ Maps each language semgrep supports to the files of that language
+            in the targets, as found by language detection.
+        """
+        if self._manifest is None:
+            self._manifest = defaultdict(set)
+            for output in self.languages_used.values():
+                for name, info in output.data.items():
+                    lang = targets.canonical_language(name)
+                    if lang in SEMGREP_SUPPORTED_LANGUAGES:
+                        self._manifest[lang].update(info.paths)
+        return self._manifest
+
+    def language_files(self, language_key: str) -> List[str]:
+        """ Sorted files that rules declaring `language_key` (a comma
+            separated list of languages) can match, or None if any of the
+            languages isn't one detection knows about.
+        """
+        if language_key not in self._manifest_lists:
+            languages = [targets.canonical_language(l) for l in language_key.split(",")]
+            if not all(l in SEMGREP_SUPPORTED_LANGUAGES for l in languages):
+                return None
+            self._manifest_lists[language_key] = sorted(set().union(*(self.manifest[l] for l in languages)))
+        return self._manifest_lists[language_key]
+
+    def update_manifest(self, paths):
+        """ Re-file `paths` (e.g. files changed since the manifest was built)
+            under their current language, dropping the ones that are gone.
+        """
+        manifest = self.manifest
+        for path in paths:
+            for files in manifest.values():
+                files.discard(path)
+            if not os.path.isfile(path) or targets.is_excluded(path, self.exclude_paths):
+                continue
+            lang = detect.language_of(path)
+            lang = targets.canonical_language(lang) if lang is not None else None
+            if lang in SEMGREP_SUPPORTED_LANGUAGES:
+                manifest[lang].add(path)
+        self._manifest_lists = {}
+
+    def sync_manifest(self) -> Set[str]:
+        """ Re-file the files added, modified or deleted in the targets since
+            the manifest was last brought up to date, so queries see files
+            created after init. Returns those files.
+        """
+        with self._manifest_lock:
+            since = self._manifest_since
+            changed = since.changed_files(self.targets)
+            if not changed:
+                return changed
+            snapshot = Snapshot.take(self.targets, self.exclude_paths)
+            # Again, so nothing changed before `snapshot` was taken is missed
+            changed = since.changed_files(self.targets)
+            self.update_manifest(changed)
+            self._manifest_since = snapshot
+        return changed
 
     def print_languages_used(self):
         for repo, tokei_output in self.languages_used.items():
@@ -47,6 +184,41 @@ class SemgreplConfig:
             tokei_output.print_languages_used()
             print()
 
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        # Started on first use and kept for the session, so worker
+        # processes only import semgrep once
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor
+
+    def close(self):
+        """ Shut down the config's worker processes and close its result
+            cache and session. Queries can't be run with it afterwards.
+        """
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        if self.worker_pool is not None:
+            self.worker_pool.stop()
+            self.worker_pool = None
+        if self.session is not None:
+            self.session.close()
+            self.session = None
+        if self.cache is not None and self._owns_cache:
+            self.cache.close()
+        self.cache = None
+
+    def __enter__(self) -> 'SemgreplConfig':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def clear_cache(self):
+        if self.cache is not None:
+            self.cache.clear()
+
     def __repr__(self):
         return "<SemgreplConfig rules_dir={}, default_language={}, targets={}, languages_used={}".format(
             self.rules_dir, self.default_language, self.targets,
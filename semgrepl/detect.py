@@ -0,0 +1,177 @@
+import hashlib
+import json
+import os
+import re
+import threading
+from typing import List, Dict, Tuple
+import semgrepl.targets as targets
+from semgrepl.cache import atomic_write
+from semgrepl.tokei import TokeiOutput, TokeiLanguageInfo
+
+# Language name (as tokei spells it) => (extensions, line comment prefix)
+LANGUAGES = {
+    "Python": ([".py", ".pyi", ".pyw"], b"#"),
+    "Go": ([".go"], b"//"),
+    "Java": ([".java"], b"//"),
+    "JavaScript": ([".js", ".jsx", ".mjs", ".cjs"], b"//"),
+    "TypeScript": ([".ts", ".tsx"], b"//"),
+    "Ruby": ([".rb", ".rake", ".gemspec"], b"#"),
+    "C": ([".c", ".h"], b"//"),
+    "C++": ([".cc", ".cpp", ".cxx", ".hh", ".hpp", ".hxx"], b"//"),
+    "C#": ([".cs"], b"//"),
+    "Kotlin": ([".kt", ".kts"], b"//"),
+    "Scala": ([".scala"], b"//"),
+    "Rust": ([".rs"], b"//"),
+    "PHP": ([".php"], b"//"),
+    "Shell": ([".sh", ".bash", ".zsh"], b"#"),
+    "Perl": ([".pl", ".pm"], b"#"),
+    "Lua": ([".lua"], b"--"),
+    "Swift": ([".swift"], b"//"),
+    "HTML": ([".html", ".htm"], None),
+    "CSS": ([".css", ".scss", ".less"], None),
+    "YAML": ([".yml", ".yaml"], b"#"),
+    "JSON": ([".json"], None),
+    "Markdown": ([".md", ".markdown"], None),
+}
+
+EXTENSIONS = {ext: lang for lang, (exts, _) in LANGUAGES.items() for ext in exts}
+
+# Interpreter named on a #! line => language, for extensionless scripts
+SHEBANGS = {
+    "python": "Python",
+    "ruby": "Ruby",
+    "node": "JavaScript",
+    "sh": "Shell",
+    "bash": "Shell",
+    "zsh": "Shell",
+    "perl": "Perl",
+    "lua": "Lua",
+}
+
+_SHEBANG = re.compile(rb"#![ \t]*(?:\S*/)?([a-z]+)[0-9.]*(?:[ \t]+([a-z]+)[0-9.]*)?")
+_BLANK = re.compile(rb"^[ \t\r\f\v]*$", re.M)
+
+# Bump when the per-file stats change meaning
+CACHE_VERSION = 1
+
+# target => {path: [mtime_ns, size, language, code, comments, blanks]},
+# shared by every config of the session
+_memo = {}
+_memo_lock = threading.Lock()
+
+def clear_memo():
+    """ Forget the per-file counts remembered in memory, so the next
+        detection reads every file again unless its cache_dir has them.
+    """
+    with _memo_lock:
+        _memo.clear()
+
+def language_of(path: str, head: bytes = None) -> str:
+    """ Language of a file from its extension, or from its #! line if it
+        has none. Returns None if it's neither.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext:
+        return EXTENSIONS.get(ext)
+    if head is None:
+        try:
+            with open(path, 'rb') as f:
+                head = f.read(128)
+        except OSError:
+            return None
+    m = _SHEBANG.match(head)
+    if m is None:
+        return None
+    # `#!/usr/bin/env python3` names the interpreter second
+    interpreter = m.group(2) if m.group(1) == b"env" and m.group(2) else m.group(1)
+    return SHEBANGS.get(interpreter.decode('ascii'))
+
+def count_lines(data: bytes, comment: bytes) -> Tuple[int, int, int]:
+    """ (code, comments, blanks) of a file. Only whole line comments count
+        as comments; block comments are counted as code.
+    """
+    if not data:
+        return 0, 0, 0
+    lines = data.count(b"\n") + (1 if not data.endswith(b"\n") else 0)
+    blanks = len(_BLANK.findall(data)) - (1 if data.endswith(b"\n") else 0)
+    comments = len(re.findall(rb"^[ \t]*" + re.escape(comment), data, re.M)) if comment else 0
+    return lines - blanks - comments, comments, blanks
+
+def _cache_file(cache_dir: str, target: str, exclude_paths: List[str]) -> str:
+    h = hashlib.sha1(repr((CACHE_VERSION, target, sorted(exclude_paths))).encode('utf-8'))
+    return os.path.join(cache_dir, "languages-{}.json".format(h.hexdigest()))
+
+def _load(cache_dir: str, target: str, exclude_paths: List[str]) -> Dict[str, List]:
+    key = (target, tuple(exclude_paths))
+    with _memo_lock:
+        if key in _memo:
+            return _memo[key]
+    if cache_dir is not None:
+        try:
+            with open(_cache_file(cache_dir, target, exclude_paths)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            pass
+    return {}
+
+def _store(cache_dir: str, target: str, exclude_paths: List[str], stats: Dict[str, List]):
+    with _memo_lock:
+        _memo[(target, tuple(exclude_paths))] = stats
+    if cache_dir is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        path = _cache_file(cache_dir, target, exclude_paths)
+        with atomic_write(path) as f:
+            json.dump(stats, f)
+
+def detect(target: str, exclude_paths: List[str] = [], cache_dir: str = None) -> TokeiOutput:
+    """ Languages used in `target`, in the same form tokei's report is
+        parsed into, from a single walk of the tree.
+
+        Per-file counts are remembered (in memory, and in `cache_dir` if
+        given) by mtime and size, so detecting again only reads files that
+        changed.
+    """
+    previous = _load(cache_dir, target, exclude_paths)
+    stats = {}
+    for path in targets.walk(target, exclude_paths):
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        old = previous.get(path)
+        if old is not None and old[0] == st.st_mtime_ns and old[1] == st.st_size:
+            stats[path] = old
+            continue
+        lang = language_of(path)
+        if lang is None and os.path.splitext(path)[1]:
+            continue
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            continue
+        if lang is None:
+            lang = language_of(path, data[:128])
+            if lang is None:
+                continue
+        stats[path] = [st.st_mtime_ns, st.st_size, lang] + list(count_lines(data, LANGUAGES[lang][1]))
+    _store(cache_dir, target, exclude_paths, stats)
+    return _report(target, stats)
+
+def _report(target: str, stats: Dict[str, List]) -> TokeiOutput:
+    totals = {}
+    for path in sorted(stats):
+        _, _, lang, code, comments, blanks = stats[path]
+        t = totals.setdefault(lang, {"code": 0, "comments": 0, "blanks": 0, "paths": []})
+        t["code"] += code
+        t["comments"] += comments
+        t["blanks"] += blanks
+        t["paths"].append(path)
+
+    output = TokeiOutput({}, target)
+    root = os.path.dirname(target)
+    for lang, t in totals.items():
+        # Same "<repo name>/<path in repo>" form as Tokei.relative_path
+        files = [os.path.relpath(p, root) for p in t["paths"]]
+        output.data[lang] = TokeiLanguageInfo(t, target, files=files, paths=t["paths"])
+    return output
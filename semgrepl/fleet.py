@@ -0,0 +1,110 @@
+import hashlib
+import json
+from collections import namedtuple
+from typing import List, Dict, Tuple
+from semgrepl.abstract import *
+from semgrepl.session import SessionStore, query_name
+from semgrepl.snapshot import Snapshot
+from semgrepl import cache
+from semgrepl import targets
+from semgrepl import tokei
+
+# One unit of work of a fleet scan: one rule pack (query) over the files of
+# one language in one repo. `loc` is the language's lines of code in the
+# repo, an estimate of how long the unit takes.
+Unit = namedtuple("Unit", ["repo", "language", "query", "loc"])
+
+def unit_name(repo: str, language: str, query: Tuple[str, Dict]) -> str:
+    """ Name of a unit's result set in the checkpoint.
+    """
+    return json.dumps([repo, language, query_name(query)])
+
+def repo_state(repo: str, exclude_paths: List[str] = []) -> str:
+    """ Hash of the state of a repo's files: its git HEAD and the files
+        differing from it, or the mtime and size of every file.
+    """
+    snapshot = Snapshot.take([repo], exclude_paths)
+    state = (sorted(snapshot.git_heads.items()), sorted(snapshot.stats.items()))
+    return hashlib.sha1(repr(state).encode('utf-8')).hexdigest()
+
+def unit_version(rules: List[Dict], state: str) -> str:
+    """ What a unit's results depend on besides its name: the rules of its
+        query (and the semgrep version, see cache.rules_key) and the state
+        of its repo (see repo_state).
+    """
+    return hashlib.sha1((cache.rules_key(rules) + state).encode('utf-8')).hexdigest()
+
+def plan(languages_used: Dict[str, tokei.TokeiOutput], queries: List[Tuple[str, Dict]],
+         supported: List[str]) -> List[Unit]:
+    """ The units of scanning every repo ({repo: detected languages}) with
+        every query, largest first. Starting the long units first keeps one
+        big repo from being left to run alone at the end of the scan.
+    """
+    units = []
+    for repo, output in languages_used.items():
+        for name, info in output.languages_by_frequency:
+            language = targets.canonical_language(name)
+            if language not in supported:
+                continue
+            units.extend(Unit(repo, language, query, info.code) for query in queries)
+    return sorted(units, key=lambda u: (-u.loc, u.repo, u.language))
+
+class FleetCheckpoint:
+    """ The results of a fleet scan, one result set per finished unit, in a
+        SessionStore. A unit is written in one transaction once it's done,
+        so after a crash or Ctrl-C the finished units are kept and the scan
+        resumes with the others.
+
+        Each unit is saved with its version (see unit_version), so a unit
+        whose repo or rules changed since is run again.
+    """
+    def __init__(self, path: str):
+        self.session = SessionStore(path)
+        with self.session.lock, self.session.db:
+            self.session.db.execute("""
+                CREATE TABLE IF NOT EXISTS fleet_units (
+                    name TEXT PRIMARY KEY,
+                    version TEXT NOT NULL
+                )""")
+
+    def __repr__(self):
+        return "<FleetCheckpoint path={} units={}>".format(self.session.path, len(self.session.result_sets()))
+
+    def close(self):
+        self.session.close()
+
+    def done(self, unit: Unit, version: str) -> bool:
+        name = unit_name(unit.repo, unit.language, unit.query)
+        if name not in self.session:
+            return False
+        row = self.session.sql("SELECT version FROM fleet_units WHERE name = ?", (name,))
+        return bool(row) and row[0][0] == version
+
+    def save(self, unit: Unit, results: SemgreplResults, version: str):
+        name = unit_name(unit.repo, unit.language, unit.query)
+        # Results first: if this is interrupted in between, the unit only
+        # looks out of date and runs again
+        self.session.save(results, name)
+        with self.session.lock, self.session.db:
+            self.session.db.execute("INSERT OR REPLACE INTO fleet_units VALUES (?, ?)", (name, version))
+
+    def units(self) -> List[Tuple[str, str, str]]:
+        """ (repo, language, query name) of every finished unit.
+        """
+        return [tuple(json.loads(name)) for name in self.session.result_sets()]
+
+    def results(self, query) -> Dict[str, SemgreplResults]:
+        """ {repo: results} of a query over all languages: a (rules file,
+            template_vars) tuple as given to the scan, or a rules file name
+            for every query of that file.
+        """
+        if isinstance(query, str):
+            name = query
+        else:
+            name = query_name(query)
+        found = {}
+        for repo, language, unit_query in self.units():
+            if unit_query == name or unit_query.split(" ")[0] == name:
+                results = self.session.load(json.dumps([repo, language, unit_query]))
+                found.setdefault(repo, SemgreplResults([], results.query)).extend(results)
+        return found
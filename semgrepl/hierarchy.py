@@ -0,0 +1,139 @@
+import os
+from collections import defaultdict, deque
+from typing import List, Dict, Set, Union
+from semgrepl.abstract import *
+from semgrepl.index import SymbolIndex
+
+# A class can be given by name (every class with that name) or as the
+# SemgreplClass itself
+Class = Union[str, SemgreplClass]
+
+def _same_class(a: str, b: str) -> bool:
+    """ Whether two names as written can refer to the same class, i.e. one
+        is a dotted suffix of the other: "tornado.web.RequestHandler",
+        "web.RequestHandler" and "RequestHandler" (depending on how it was
+        imported) all can, "django.RequestHandler" can't be the first two.
+    """
+    short, long = sorted((a, b), key=len)
+    return long == short or long.endswith("." + short)
+
+class ClassHierarchy:
+    """ Inheritance between the classes of the targets, and the methods
+        defined in each.
+
+        Bases are resolved by name: `class A(web.RequestHandler)` is an edge
+        from A to every class named RequestHandler. Bases that aren't
+        defined in the targets can still be searched for by name, plain or
+        dotted, whichever way they were imported.
+
+        Nodes are indexes into `self.classes`; edges are held as lists of
+        sets, so subclass and superclass queries are a BFS over prebuilt
+        edges.
+    """
+    def __init__(self, index: SymbolIndex):
+        self.classes = list(index.classes)
+        self._node_of = {id(c): i for i, c in enumerate(self.classes)}
+        self.nodes_by_name = defaultdict(list)
+        for i, c in enumerate(self.classes):
+            self.nodes_by_name[c.name].append(i)
+
+        self.subclasses = [set() for _ in self.classes]
+        self.superclasses = [set() for _ in self.classes]
+        # base name => classes naming it as a base, whether or not it's
+        # defined in the targets
+        self.direct_subclasses = defaultdict(set)
+        for i, c in enumerate(self.classes):
+            for base in getattr(c, "bases", ()):
+                name = base.rsplit(".", 1)[-1]
+                self.direct_subclasses[name].add(i)
+                for parent in self.nodes_by_name.get(name, []):
+                    if parent != i:
+                        self.subclasses[parent].add(i)
+                        self.superclasses[i].add(parent)
+
+        self.methods = [[] for _ in self.classes]
+        self._assign_methods(index.defs)
+
+    def __repr__(self):
+        return "<ClassHierarchy classes={} edges={}>".format(len(self.classes),
+                                                            sum(len(s) for s in self.subclasses))
+
+    def _assign_methods(self, defs: List[SemgreplFunctionDef]):
+        """ Give each class the defs directly in its body, not those nested
+            in a method or an inner class. One sweep per file over classes
+            and defs sorted by position, keeping the open ones on a stack.
+        """
+        by_file = defaultdict(list)
+        for i, c in enumerate(self.classes):
+            by_file[os.path.abspath(c.file_path)].append((c.start_line, -c.end_line, 0, i))
+        for d in defs:
+            if os.path.abspath(d.file_path) in by_file:
+                by_file[os.path.abspath(d.file_path)].append((d.start_line, -d.end_line, 1, d))
+
+        for items in by_file.values():
+            items.sort(key=lambda x: x[:3])
+            stack = []
+            for start, neg_end, is_def, item in items:
+                while stack and stack[-1][0] < start:
+                    stack.pop()
+                if is_def and stack and not stack[-1][1]:
+                    self.methods[stack[-1][2]].append(item)
+                stack.append((-neg_end, is_def, item))
+
+    def _nodes(self, classes) -> List[int]:
+        if isinstance(classes, (str, SemgreplClass)):
+            classes = [classes]
+        nodes = []
+        for c in classes:
+            if isinstance(c, str):
+                nodes.extend(self.nodes_by_name.get(c.rsplit(".", 1)[-1], []))
+            elif id(c) in self._node_of:
+                nodes.append(self._node_of[id(c)])
+        return nodes
+
+    def _bfs(self, start: List[int], edges: List[Set[int]], transitive: bool) -> List[int]:
+        seen = set(start)
+        order = list(start)
+        frontier = deque(start)
+        while frontier and transitive:
+            for nxt in edges[frontier.popleft()]:
+                if nxt not in seen:
+                    seen.add(nxt)
+                    order.append(nxt)
+                    frontier.append(nxt)
+        return order
+
+    def subclasses_of(self, cls: Class, transitive: bool = True) -> List[SemgreplClass]:
+        """ Classes inheriting from `cls`, directly or (by default) through
+            other classes, closest first. `cls` may be the name of a class
+            not defined in the targets, e.g. subclasses_of("RequestHandler")
+            or subclasses_of("tornado.web.RequestHandler"); the latter also
+            finds `class A(web.RequestHandler)` and `class B(RequestHandler)`.
+        """
+        if isinstance(cls, str):
+            start = sorted(i for i in self.direct_subclasses.get(cls.rsplit(".", 1)[-1], ())
+                           if any(_same_class(base, cls) for base in self.classes[i].bases))
+        else:
+            start = sorted(set().union(*(self.subclasses[n] for n in self._nodes(cls))))
+        return [self.classes[n] for n in self._bfs(start, self.subclasses, transitive)]
+
+    def superclasses_of(self, cls: Class, transitive: bool = True) -> List[SemgreplClass]:
+        """ Classes defined in the targets that `cls` inherits from.
+        """
+        start = sorted(set().union(*(self.superclasses[n] for n in self._nodes(cls))))
+        return [self.classes[n] for n in self._bfs(start, self.superclasses, transitive)]
+
+    def methods_of(self, cls: Class, inherited: bool = False) -> List[SemgreplFunctionDef]:
+        """ Methods defined in the body of `cls`. With inherited=True, also
+            those of its superclasses that it doesn't override.
+        """
+        nodes = self._nodes(cls)
+        methods = [m for n in nodes for m in self.methods[n]]
+        if inherited:
+            seen = {m.name for m in methods}
+            for n in self._bfs(sorted(set().union(*(self.superclasses[n] for n in nodes))), self.superclasses, True):
+                for m in self.methods[n]:
+                    if m.name not in seen:
+                        seen.add(m.name)
+                        methods.append(m)
+        return methods
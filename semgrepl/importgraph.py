@@ -0,0 +1,224 @@
+import ast
+import logging
+import os
+from collections import defaultdict, deque
+from typing import List, Dict, Set, Tuple
+from semgrepl.abstract import *
+
+def module_name(path: str) -> str:
+    """ Dotted name Python would import `path` as: its path from the first
+        directory up that isn't a package (has no __init__.py).
+    """
+    d, base = os.path.split(os.path.abspath(path))
+    parts = [] if base == "__init__.py" else [os.path.splitext(base)[0]]
+    while os.path.exists(os.path.join(d, "__init__.py")):
+        d, package = os.path.split(d)
+        parts.insert(0, package)
+    return ".".join(parts)
+
+def _column(line: bytes, offset: int) -> int:
+    # ast's columns are UTF-8 byte offsets, semgrep's are 1-based characters
+    return len(line[:offset].decode('utf-8', 'replace')) + 1
+
+def extract_file(path: str) -> List[Dict]:
+    """ Every import statement of a Python file, nested ones included, in
+        the form of a semgrep match of import-statements.yaml with what it
+        imports in extra.imports (see SemgreplImportStatement).
+    """
+    try:
+        with open(path, 'rb') as f:
+            source = f.read()
+        tree = ast.parse(source, path)
+    except (OSError, SyntaxError, ValueError) as e:
+        logging.warning("Can't parse {} for its imports: {}".format(path, e))
+        return []
+    lines = source.splitlines()
+    matches = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            imports = [(a.name, None, 0) for a in node.names]
+        elif isinstance(node, ast.ImportFrom):
+            imports = [(node.module or "", a.name, node.level) for a in node.names]
+        else:
+            continue
+        # No end positions before Python 3.8
+        end_line = getattr(node, "end_lineno", None) or node.lineno
+        end_col = getattr(node, "end_col_offset", None)
+        matches.append({
+            "check_id": "python-import-statements",
+            "path": path,
+            "start": {"line": node.lineno, "col": _column(lines[node.lineno - 1], node.col_offset)},
+            "end": {"line": end_line,
+                    "col": _column(lines[end_line - 1], end_col) if end_col is not None else len(lines[end_line - 1]) + 1},
+            "extra": {"imports": imports},
+        })
+    matches.sort(key=lambda m: (m["start"]["line"], m["start"]["col"]))
+    return matches
+
+def extract_files(files: List[Tuple[str, str]]) -> List[Dict]:
+    """ extract_file for each (path, language), as one job of a process pool.
+    """
+    return [m for path, _ in files for m in extract_file(path)]
+
+def _is_package(path: str) -> bool:
+    return os.path.basename(path) == "__init__.py"
+
+class ImportGraph:
+    """ Which files of the targets import which, from whole import
+        statements (SemgreplImportStatement).
+
+        Imports are resolved to local files when a module of that name is in
+        `files`, otherwise to the top level name of an external package.
+        Nodes are local file paths and external package names; the edges
+        and fan-in/fan-out counts are computed once, so later queries don't
+        rescan anything.
+    """
+    def __init__(self, statements: List[SemgreplImportStatement], files: List[str]):
+        self.files = sorted(os.path.abspath(f) for f in files)
+        self.module_of = {f: module_name(f) for f in self.files}
+        self.modules = {}
+        for f in self.files:
+            self.modules.setdefault(self.module_of[f], f)
+
+        # node => nodes it imports / nodes importing it
+        self.imports = defaultdict(set)
+        self.importers = defaultdict(set)
+        self.external = set()
+        # import statements by importing file, for where an edge comes from
+        self.statements = defaultdict(list)
+        for stmt in statements:
+            path = os.path.abspath(stmt.file_path)
+            self.statements[path].append(stmt)
+            for entry in stmt.imports:
+                target = self.resolve(path, *entry)
+                if target is None:
+                    continue
+                if target not in self.module_of:
+                    self.external.add(target)
+                self.imports[path].add(target)
+                self.importers[target].add(path)
+
+        self.fan_out = {node: len(deps) for node, deps in self.imports.items()}
+        self.fan_in = {node: len(users) for node, users in self.importers.items()}
+
+    def __repr__(self):
+        return "<ImportGraph files={} external={} edges={}>".format(
+            len(self.files), len(self.external), sum(len(d) for d in self.imports.values()))
+
+    def _absolute(self, path: str, module: str, level: int) -> str:
+        if level == 0:
+            return module
+        package = self.module_of.get(path, module_name(path)).split(".")
+        if not _is_package(path):
+            package = package[:-1]
+        if level > 1:
+            package = package[:-(level - 1)] if level - 1 < len(package) else []
+        return ".".join(package + ([module] if module else []))
+
+    def resolve(self, path: str, module: str, name: str, level: int) -> str:
+        """ The local file or external package `path` gets from importing
+            `name` from `module` (see SemgreplImportStatement.imports).
+        """
+        full = self._absolute(path, module, level)
+        candidates = [full + "." + name if full else name] if name and name != "*" else []
+        candidates.append(full)
+        for candidate in candidates:
+            # `import a.b.c` still depends on a/b.py if that's all there is
+            parts = candidate.split(".") if candidate else []
+            for i in range(len(parts), 0, -1):
+                f = self.modules.get(".".join(parts[:i]))
+                if f is not None:
+                    return f
+        if level > 0 or not full:
+            # A relative import of something that isn't in the targets
+            return None
+        return full.split(".")[0]
+
+    def _node(self, x: str) -> str:
+        if x in self.module_of or x in self.external:
+            return x
+        if os.path.abspath(x) in self.module_of:
+            return os.path.abspath(x)
+        return self.modules.get(x, x)
+
+    def _bfs(self, start: str, edges: Dict[str, Set[str]], transitive: bool) -> List[str]:
+        seen = {start}
+        order = []
+        frontier = deque([start])
+        while frontier:
+            node = frontier.popleft()
+            for nxt in sorted(edges.get(node, ())):
+                if nxt not in seen:
+                    seen.add(nxt)
+                    order.append(nxt)
+                    if transitive:
+                        frontier.append(nxt)
+        return order
+
+    def importers_of(self, module: str, transitive: bool = True) -> List[str]:
+        """ Files importing `module` (a file path, a local module name or an
+            external package), directly or through other files. Closest
+            first.
+        """
+        return self._bfs(self._node(module), self.importers, transitive)
+
+    def imports_of(self, path: str, transitive: bool = False) -> List[str]:
+        """ Files and external packages `path` imports.
+        """
+        return self._bfs(self._node(path), self.imports, transitive)
+
+    def cycles(self) -> List[List[str]]:
+        """ Groups of local files that import each other, directly or not:
+            the strongly connected components of more than one file (or a
+            file importing itself), found with an iterative Tarjan.
+        """
+        index = {}
+        low = {}
+        on_stack = set()
+        stack = []
+        components = []
+        counter = 0
+        for root in self.files:
+            if root in index:
+                continue
+            work = [(root, iter(sorted(self.imports.get(root, ()))))]
+            index[root] = low[root] = counter
+            counter += 1
+            stack.append(root)
+            on_stack.add(root)
+            while work:
+                node, children = work[-1]
+                for child in children:
+                    if child not in self.module_of:
+                        continue
+                    if child not in index:
+                        index[child] = low[child] = counter
+                        counter += 1
+                        stack.append(child)
+                        on_stack.add(child)
+                        work.append((child, iter(sorted(self.imports.get(child, ())))))
+                        break
+                    if child in on_stack:
+                        low[node] = min(low[node], index[child])
+                else:
+                    work.pop()
+                    if work:
+                        parent = work[-1][0]
+                        low[parent] = min(low[parent], low[node])
+                    if low[node] == index[node]:
+                        component = []
+                        while True:
+                            member = stack.pop()
+                            on_stack.discard(member)
+                            component.append(member)
+                            if member == node:
+                                break
+                        if len(component) > 1 or node in self.imports.get(node, ()):
+                            components.append(sorted(component))
+        return components
+
+    def most_imported(self, n: int = 10) -> List[Tuple[str, int]]:
+        return sorted(self.fan_in.items(), key=lambda x: (-x[1], x[0]))[:n]
+
+    def most_importing(self, n: int = 10) -> List[Tuple[str, int]]:
+        return sorted(self.fan_out.items(), key=lambda x: (-x[1], x[0]))[:n]
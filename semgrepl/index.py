@@ -0,0 +1,119 @@
+import bisect
+import hashlib
+import os
+import pickle
+from collections import defaultdict
+from typing import List, Dict, Tuple
+from semgrepl.abstract import *
+from semgrepl.cache import atomic_write
+from semgrepl.snapshot import Snapshot
+
+# Bump when the pickled layout changes, so old index files are rebuilt
+INDEX_VERSION = 2
+
+def index_path(cache_dir: str, targets: List[str], exclude_paths: List[str]) -> str:
+    h = hashlib.sha1(repr((INDEX_VERSION, sorted(targets), sorted(exclude_paths))).encode('utf-8'))
+    return os.path.join(cache_dir, "index-{}.pickle".format(h.hexdigest()))
+
+def bare_name(name: str) -> str:
+    """ A called name without what it's called on, e.g. "helper" for
+        self.helper(), the way function-calls.yaml matches both `name(...)`
+        and `$INSTANCE.name(...)`.
+    """
+    return name.rsplit(".", 1)[-1]
+
+class SymbolIndex:
+    """ Every function definition, function call, class and import in the
+        targets, hashed by name and by file, with calls also grouped by the
+        function they're made in.
+
+        Built once per session by main.build_index(), after which the
+        *_by_name helpers are answered from here instead of rescanning.
+    """
+    def __init__(self, defs: SemgreplResults, calls: SemgreplResults, classes: SemgreplResults,
+                 imports: SemgreplResults, snapshot: Snapshot = None):
+        self.defs = defs
+        self.calls = calls
+        self.classes = classes
+        self.imports = imports
+        self.snapshot = snapshot
+        self.reindex()
+
+    def __repr__(self):
+        return "<SymbolIndex defs={} calls={} classes={} imports={}>".format(
+            len(self.defs), len(self.calls), len(self.classes), len(self.imports))
+
+    def __getstate__(self):
+        # Only the results are stored, the hash tables are rebuilt on load
+        return {k: getattr(self, k) for k in ("defs", "calls", "classes", "imports", "snapshot")}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.reindex()
+
+    @staticmethod
+    def _by(objects: List[SemgreplObject], attr: str) -> Dict[str, List[SemgreplObject]]:
+        table = defaultdict(list)
+        for x in objects:
+            table[getattr(x, attr)].append(x)
+        return dict(table)
+
+    def reindex(self):
+        """ Rebuild the hash tables, e.g. after the result lists were patched
+            by main.refresh().
+        """
+        self.defs_by_name = self._by(self.defs, "name")
+        self.calls_by_name = defaultdict(list)
+        for call in self.calls:
+            self.calls_by_name[bare_name(call.name)].append(call)
+        self.calls_by_name = dict(self.calls_by_name)
+        self.classes_by_name = self._by(self.classes, "name")
+        self.imports_by_path = self._by(self.imports, "import_path")
+        self.defs_by_file = self._by(self.defs, "file_path")
+        self.calls_by_file = self._by(self.calls, "file_path")
+        self.classes_by_file = self._by(self.classes, "file_path")
+        self.imports_by_file = self._by(self.imports, "file_path")
+
+        # Per file: defs ordered by (start_line, -end_line), so nested defs
+        # come after the def containing them
+        self._scopes = {}
+        for file_path, defs in self.defs_by_file.items():
+            ordered = sorted(defs, key=lambda d: (d.start_line, -d.end_line))
+            self._scopes[file_path] = ([d.start_line for d in ordered], ordered)
+
+        self.calls_by_scope = defaultdict(list)
+        for call in self.calls:
+            self.calls_by_scope[self._scope_key(self.enclosing_function(call))].append(call)
+
+    @staticmethod
+    def _scope_key(func: SemgreplFunctionDef) -> Tuple[str, int]:
+        return (func.file_path, func.start_line) if func is not None else None
+
+    def enclosing_function(self, obj: SemgreplObject) -> SemgreplFunctionDef:
+        """ The innermost function definition containing `obj`, or None at
+            module level.
+        """
+        if obj.file_path not in self._scopes:
+            return None
+        starts, ordered = self._scopes[obj.file_path]
+        i = bisect.bisect_right(starts, obj.start_line)
+        while i > 0:
+            i -= 1
+            func = ordered[i]
+            if func is not obj and func.start_line <= obj.start_line and obj.end_line <= func.end_line:
+                return func
+        return None
+
+    def calls_in(self, func: SemgreplFunctionDef) -> List[SemgreplFunctionCall]:
+        """ Calls made directly in `func` (not in functions nested in it).
+        """
+        return self.calls_by_scope.get(self._scope_key(func), [])
+
+    def save(self, path: str):
+        with atomic_write(path, 'wb') as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def load(path: str) -> 'SymbolIndex':
+        with open(path, 'rb') as f:
+            return pickle.load(f)
@@ -1,18 +1,46 @@
+import asyncio
 import json
+import logging
 import os
-import tempfile
 import glob
+import itertools
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from collections import defaultdict
-from typing import List, Dict
+from typing import List, Dict, Set, Tuple
 from io import StringIO
+import numpy as np
 from semgrep.output import OutputHandler
 from semgrep.output import OutputSettings
 from semgrep.constants import OutputFormat
 import semgrep.semgrep_main
-from jinja2 import Environment, FileSystemLoader
 from semgrepl.abstract import *
+import semgrepl.cache
+import semgrepl.fleet
+import semgrepl.importgraph
+import semgrepl.index
+import semgrepl.prefilter
+import semgrepl.profile
+import semgrepl.rules
+import semgrepl.session
+import semgrepl.strings
+import semgrepl.targets
 import semgrepl.tokei
-from semgrepl.config import SemgreplConfig
+from semgrepl.config import SemgreplConfig, SEMGREP_SUPPORTED_LANGUAGES
+from semgrepl.callgraph import CallGraph
+from semgrepl.fleet import FleetCheckpoint, Unit
+from semgrepl.hierarchy import ClassHierarchy
+from semgrepl.importgraph import ImportGraph
+from semgrepl.index import SymbolIndex
+from semgrepl.profile import Profile
+from semgrepl.scope import Scope
+from semgrepl.session import SessionStore
+from semgrepl.snapshot import Snapshot
+from semgrepl.stats import QueryStats
+from semgrepl.strings import StringLiteral
+from semgrepl.table import ResultTable
+from semgrepl.worker import WorkerPool
 
 # Prompt user during setup to define the scope of what they're testing
 # (probably a repo), and the base rules dir.
@@ -130,16 +158,31 @@ DEFAULT_RULES_DIR = os.path.abspath(
     os.path.join(__file__, '..', '..', 'rules')
     )
 
+# Number of files scanned per semgrep run by the iter_* helpers
+DEFAULT_BATCH_SIZE = 256
+
+# semgrep command line, used by the asyncio helpers
+SEMGREP_BIN = "semgrep"
+
+# Largest lists of files handed to a single semgrep run
+MAX_CHUNK_FILES = 2000
+MAX_CHUNK_BYTES = 128 * 1024
+
 # A default pack that runs all security rules
 SEMGREP_RULES_ALL_SECURITY = "https://semgrep.dev/p/r2c-security-audit"
 
-def init(target : str, rules_dir: str = DEFAULT_RULES_DIR, default_language: str = None):
+def init(target : str, rules_dir: str = DEFAULT_RULES_DIR, default_language: str = None, workers: int = 1,
+         background: bool = False):
     """ Run at the beginning of your session to set up your target and initialize semgrep.
+        With background=True, language detection runs in the background and
+        init returns immediately.
     """
-    semgrepl_config = SemgreplConfig([target], rules_dir, default_language)
+    semgrepl_config = SemgreplConfig([target], rules_dir, default_language, workers=workers,
+                                     background_detection=background)
     return semgrepl_config
 
-def init_dir(target_dir : str, rules_dir: str = DEFAULT_RULES_DIR, default_language: str = None):
+def init_dir(target_dir : str, rules_dir: str = DEFAULT_RULES_DIR, default_language: str = None, workers: int = 1,
+             background: bool = False):
     """ Run at the beginning of your session to set up your target
         Adds a whole dir to targets.
     """
@@ -149,10 +192,32 @@ def init_dir(target_dir : str, rules_dir: str = DEFAULT_RULES_DIR, default_langu
         print("Note that characters like ~ are not expanded")
         print("glob.glob is used from: https://docs.python.org/3/library/glob.html")
         return
-    semgrepl_config = SemgreplConfig(dirs, rules_dir, default_language)
+    semgrepl_config = SemgreplConfig(dirs, rules_dir, default_language, workers=workers,
+                                     background_detection=background)
     return semgrepl_config
 
-def semgrep_pattern(pattern: str, targets: List[str], exclude_paths: List = [], config: str = ""):
+def start_workers(semgrepl_config: SemgreplConfig, workers: int = None) -> WorkerPool:
+    """ Start long-lived semgrep worker processes (config.workers of them by
+        default). Until stop_workers() is called, the async helpers send
+        their scans to them instead of starting a semgrep CLI process per
+        scan. Synchronous queries keep running semgrep in this process, where
+        it's already imported.
+    """
+    stop_workers(semgrepl_config)
+    semgrepl_config.worker_pool = WorkerPool(workers or semgrepl_config.workers)
+    return semgrepl_config.worker_pool
+
+def stop_workers(semgrepl_config: SemgreplConfig):
+    if semgrepl_config.worker_pool is not None:
+        semgrepl_config.worker_pool.stop()
+        semgrepl_config.worker_pool = None
+
+def semgrep_pattern(pattern: str, targets: List[str], exclude_paths: List = [], config: str = "",
+                    worker_pool: WorkerPool = None, stats: QueryStats = None):
+    if stats is None:
+        stats = QueryStats()
+    if worker_pool is not None:
+        return worker_pool.run(pattern, targets, exclude_paths, config, stats)
     io_capture = StringIO()
     output_handler = OutputHandler(
         OutputSettings(
@@ -163,16 +228,21 @@ def semgrep_pattern(pattern: str, targets: List[str], exclude_paths: List = [],
         ),
         stdout=io_capture,
     )
-    semgrep.semgrep_main.main(
-        output_handler=output_handler,
-        target=[str(os.path.abspath(t)) for t in targets],
-        pattern=pattern,
-        config=config,
-        lang="python",
-        exclude=exclude_paths)
+    with stats.timer("semgrep"):
+        semgrep.semgrep_main.main(
+            output_handler=output_handler,
+            target=[str(os.path.abspath(t)) for t in targets],
+            pattern=pattern,
+            config=config,
+            lang="python",
+            exclude=exclude_paths)
+        output_handler.close()
 
-    output_handler.close()
-    return json.loads(io_capture.getvalue())
+    output = io_capture.getvalue()
+    stats.count("json_bytes", len(output))
+    stats.count("semgrep_runs")
+    with stats.timer("decode"):
+        return json.loads(output)
 
 def collect_matches(matches: List[SemgreplObject]):
     ret = defaultdict(set)
@@ -188,71 +258,959 @@ def count_collection(obj_collection):
         result[key] = len(items)
     return result
 
+# Results that are only equal when they're on the same line
+_EQUAL_BY_LINE = (SemgreplRoute, SemgreplSink, SemgreplMatch, SemgreplImportStatement)
+
 # Given a list of SemgreplObjects, print
 # <key name>: count to STDOUT
 def print_match_summary(matches: List[SemgreplObject]):
-    collected = collect_matches(matches)
-    counts = count_collection(collected)
+    # Counts the distinct objects of each key, like collect_matches +
+    # count_collection: distinct by file, and also by line for the classes
+    # whose __eq__ compares start_line
+    table = ResultTable.from_results(matches)
+    by_line = np.fromiter((isinstance(x, _EQUAL_BY_LINE) for x in matches), dtype=bool, count=len(matches))
+    lines = np.where(by_line, table.columns["start_line"], -1)
+    distinct = np.unique(np.stack([table.columns["name"].codes, table.columns["file_path"].codes, lines]), axis=1)
+    counts = np.bincount(distinct[0], minlength=len(table.columns["name"].values))
 
-    s = sorted(counts.items(), key=lambda x: x[1], reverse=False)
-    for (key, matches) in s:
-        print("{}: {}".format(key, matches))
+    for code in np.argsort(counts, kind="stable"):
+        if counts[code]:
+            print("{}: {}".format(table.columns["name"].values[code], counts[code]))
 
-def _render_and_run(semgrepl_config: SemgreplConfig, rules_yaml_file: str, template_vars: Dict = {}):
-    matches = []
+# Maps a rules file to a function building a SemgreplObject from one of its
+# matches, and the template variables used when a query doesn't give any.
+QUERIES = {
+    "imports.yaml": (lambda match, template_vars: SemgreplImport(match), {}),
+    "function-calls.yaml": (lambda match, template_vars: SemgreplFunctionCall(template_vars["function_name"], match),
+                            {"function_name": "$NAME"}),
+    "function-defs.yaml": (lambda match, template_vars: SemgreplFunctionDef(match, template_vars["function_name"]),
+                           {"function_name": "$X"}),
+    "classes.yaml": (lambda match, template_vars: SemgreplClass(match, template_vars["class_name"]),
+                     {"class_name": "$X"}),
+    "strings.yaml": (lambda match, template_vars: SemgreplString(match), {}),
+    "import-statements.yaml": (lambda match, template_vars: SemgreplImportStatement(match), {}),
+    "routes.yaml": (lambda match, template_vars: SemgreplRoute(match), {}),
+    "sinks.yaml": (lambda match, template_vars: SemgreplSink(match), {}),
+}
+
+# A query is either a rules file name or a (rules file name, template_vars) tuple
+def _normalize_query(query) -> Tuple[str, Dict]:
+    if isinstance(query, str):
+        rules_yaml_file, template_vars = query, {}
+    else:
+        rules_yaml_file, template_vars = query
+    default_vars = QUERIES[rules_yaml_file][1] if rules_yaml_file in QUERIES else {}
+    return rules_yaml_file, {**default_vars, **template_vars}
+
+def _rules_by_language(semgrepl_config: SemgreplConfig, queries: List[Tuple[str, Dict]],
+                       stats: QueryStats) -> Dict[str, Dict[int, List[Dict]]]:
+    """ Render every query's rules and group them as {language: {query index: rules}}
+    """
+    with stats.timer("render"):
+        return _render_rules(semgrepl_config, queries)
+
+def _render_rules(semgrepl_config: SemgreplConfig, queries: List[Tuple[str, Dict]]) -> Dict[str, Dict[int, List[Dict]]]:
+    rules_by_lang = defaultdict(lambda: defaultdict(list))
     languages = list(semgrepl_config.languages)
     languages.append("")        # some rules work for all languages
-    for lang in languages:
-        lang_dir = os.path.join(semgrepl_config.rules_dir, lang)
-        semgrepl_config.logger.debug(lang_dir)
-        env = Environment(loader = FileSystemLoader(lang_dir), trim_blocks=True, lstrip_blocks=True)
-        if not os.path.exists(os.path.join(lang_dir, rules_yaml_file)):
-            if lang:
-                semgrepl_config.logger.warning("{} does not exist for language {}".format(rules_yaml_file, lang))
+    for index, (rules_yaml_file, template_vars) in enumerate(queries):
+        if _extractor(semgrepl_config, rules_yaml_file) is not None:
             continue
-        template = env.get_template(rules_yaml_file)
-        rendered_config = template.render(**template_vars)
-        # This is ugly, but semgrep_main wants a config file path...
-        # Use a lower-level API to avoid tmp file creation?
-        tf = tempfile.NamedTemporaryFile(mode='wt')
-        tf.write(rendered_config)
-        tf.flush()
-        matches.extend(semgrep_pattern("", semgrepl_config.targets, semgrepl_config.exclude_paths, tf.name)['results'])
-        tf.close()
-
-    return matches
-
-def imports(semgrepl_config: SemgreplConfig) -> List[SemgreplImport]:
-    matches = _render_and_run(semgrepl_config, "imports.yaml")
-    import_matches = [SemgreplImport(x) for x in matches]
-    return import_matches
-
-def function_calls_by_name(semgrepl_config: SemgreplConfig, function_name: str) -> List[SemgreplFunctionCall]:
+        for lang in languages:
+            semgrepl_config.logger.debug(os.path.join(semgrepl_config.rules_dir, lang))
+            rules = semgrepl.rules.load(semgrepl_config.rules_dir, lang, rules_yaml_file, template_vars)
+            if rules is None:
+                if lang:
+                    semgrepl_config.logger.warning("{} does not exist for language {}".format(rules_yaml_file, lang))
+                continue
+            for rule in rules:
+                rules_by_lang[semgrepl.rules.language_key(rule)][index].append(rule)
+    return rules_by_lang
+
+def _config_path(rules_by_query: Dict[int, List[Dict]], stats: QueryStats) -> str:
+    """ Path of a semgrep config holding the rules of several queries, tagged
+        so matches can be routed back to their query.
+    """
+    with stats.timer("write"):
+        return semgrepl.rules.config_path([semgrepl.rules.tag_rule(rule, index)
+                                           for index, query_rules in rules_by_query.items() for rule in query_rules])
+
+def _run_rules(config_path: str, targets: List[str], exclude_paths: List,
+               worker_pool: WorkerPool = None) -> Tuple[Dict[int, List[Dict]], QueryStats]:
+    """ Run a config written by _config_path and split the matches back up
+        by query. Also returns the stats of the run, which may have happened
+        in another process.
+    """
+    stats = QueryStats()
+    stats.count("files", len(targets))
+    output = semgrep_pattern("", targets, exclude_paths, config_path, worker_pool, stats)
+    return _split_by_query(output['results']), stats
+
+def _split_by_query(matches: List[Dict]) -> Dict[int, List[Dict]]:
+    results = defaultdict(list)
+    for match in matches:
+        match['check_id'], index = semgrepl.rules.untag_check_id(match['check_id'])
+        results[index].append(match)
+    return results
+
+class SemgrepError(Exception):
+    """ A semgrep process exited with an error.
+    """
+    def __init__(self, returncode: int, stderr: str):
+        super().__init__("semgrep exited with {}: {}".format(returncode, stderr.strip()))
+        self.returncode = returncode
+        self.stderr = stderr
+
+async def _arun_rules(config_path: str, targets: List[str], exclude_paths: List) -> Tuple[Dict[int, List[Dict]], QueryStats]:
+    """ _run_rules in a semgrep subprocess, which is killed if the awaiting
+        task is cancelled.
+    """
+    args = [SEMGREP_BIN, "--json", "--config", config_path]
+    for exclude in exclude_paths:
+        args += ["--exclude", exclude]
+    stats = QueryStats()
+    stats.count("files", len(targets))
+    with stats.timer("semgrep"):
+        proc = await asyncio.create_subprocess_exec(*args, *targets, stdout=asyncio.subprocess.PIPE,
+                                                    stderr=asyncio.subprocess.PIPE)
+        try:
+            stdout, stderr = await proc.communicate()
+        except asyncio.CancelledError:
+            proc.kill()
+            await proc.wait()
+            raise
+    if proc.returncode != 0:
+        raise SemgrepError(proc.returncode, stderr.decode('utf-8', 'replace'))
+    stats.count("json_bytes", len(stdout))
+    stats.count("semgrep_runs")
+    with stats.timer("decode"):
+        output = json.loads(stdout)
+    return _split_by_query(output['results']), stats
+
+async def _arun_on_worker(pool: WorkerPool, config_path: str, targets: List[str],
+                          exclude_paths: List) -> Tuple[Dict[int, List[Dict]], QueryStats]:
+    """ _run_rules on one of the pool's workers. If the awaiting task is
+        cancelled the worker is restarted, which stops its semgrep run.
+    """
+    loop = asyncio.get_running_loop()
+    stats = QueryStats()
+    stats.count("files", len(targets))
+    worker = await loop.run_in_executor(None, pool.acquire)
+    try:
+        output = await loop.run_in_executor(None, worker.run, "", targets, exclude_paths, config_path, stats)
+    except asyncio.CancelledError:
+        await loop.run_in_executor(None, worker.restart)
+        raise
+    finally:
+        pool.release(worker)
+    return _split_by_query(output['results']), stats
+
+def _shard(items: List[str], n: int) -> List[List[str]]:
+    """ Split `items` into at least `n` contiguous chunks of similar size,
+        more if needed to keep each chunk under MAX_CHUNK_FILES files and
+        MAX_CHUNK_BYTES bytes of paths.
+    """
+    size = max(1, -(-len(items) // max(1, n)))
+    chunks = []
+    for shard in (items[i:i + size] for i in range(0, len(items), size)):
+        chunk = []
+        chunk_bytes = 0
+        for item in shard:
+            if chunk and (len(chunk) >= MAX_CHUNK_FILES or chunk_bytes + len(item) > MAX_CHUNK_BYTES):
+                chunks.append(chunk)
+                chunk, chunk_bytes = [], 0
+            chunk.append(item)
+            chunk_bytes += len(item) + 1
+        chunks.append(chunk)
+    return chunks
+
+def _merge_job_results(indexes, job_results: List[Dict[int, List[Dict]]]) -> Dict[int, List[Dict]]:
+    merged = {index: [] for index in indexes}
+    for job_result in job_results:
+        for index, matches in job_result.items():
+            merged[index].extend(matches)
+    return merged
+
+def _language_files(semgrepl_config: SemgreplConfig, lang: str, only_files: Set[str] = None) -> List[str]:
+    """ Files the rules of `lang` should scan, or None to let semgrep walk
+        the targets itself.
+    """
+    files = semgrepl_config.language_files(lang)
+    if only_files is not None:
+        candidates = files if files is not None else only_files
+        files = sorted(f for f in candidates if f in only_files and os.path.exists(f))
+    return files
+
+def _plan_language(semgrepl_config: SemgreplConfig, lang: str, rules_by_query: Dict[int, List[Dict]],
+                   files: List[str], stats: QueryStats):
+    """ Work out what semgrep has to scan for the rules of one language in
+        `files` (from _language_files).
+
+        Returns (jobs, finish). Each job is a (rules_by_query, targets) pair
+        to run with _run_rules; finish takes the results of the jobs, in
+        order, and returns {query index: matches}.
+    """
+    if files == []:
+        return [], lambda job_results: {index: [] for index in rules_by_query}
+    if semgrepl_config.cache is None or files is None:
+        targets = files if files is not None else semgrepl_config.targets
+        jobs = [(rules_by_query, shard) for shard in _shard(targets, semgrepl_config.workers)]
+        return jobs, lambda job_results: _merge_job_results(rules_by_query, job_results)
+
+    # Serve unchanged files from the cache, only send the rest to semgrep
+    with stats.timer("cache"):
+        hashes = {f: semgrepl.cache.file_hash(f) for f in files}
+        keys = {index: semgrepl.cache.rules_key(rules) for index, rules in rules_by_query.items()}
+        results = {}
+        missing = {}
+        for index in rules_by_query:
+            cached = semgrepl_config.cache.get_many(keys[index], hashes)
+            results[index] = [m for matches in cached.values() for m in matches]
+            missing[index] = set(files) - set(cached)
+
+    todo = {index: rules for index, rules in rules_by_query.items() if missing[index]}
+    stats.count("cached_files", len(set(files) - set.union(*(missing[index] for index in rules_by_query))))
+    if not todo:
+        return [], lambda job_results: results
+    todo_files = sorted(set.union(*(missing[index] for index in todo)))
+    semgrepl_config.logger.debug("{} of {} {} files not cached".format(len(todo_files), len(files), lang))
+
+    def finish(job_results):
+        fresh = _merge_job_results(todo, job_results)
+        entries = []
+        for index, matches in fresh.items():
+            by_file = defaultdict(list)
+            for match in matches:
+                by_file[os.path.abspath(match['path'])].append(match)
+            for f in todo_files:
+                entries.append((keys[index], f, hashes[f], by_file[f]))
+                if f in missing[index]:
+                    results[index].extend(by_file[f])
+        with stats.timer("cache"):
+            semgrepl_config.cache.put_many(entries)
+        return results
+
+    return [(todo, shard) for shard in _shard(todo_files, semgrepl_config.workers)], finish
+
+def _execute(semgrepl_config: SemgreplConfig, jobs: List, stats: QueryStats,
+             worker_pool: WorkerPool = None) -> List[Dict[int, List[Dict]]]:
+    """ Run _run_rules jobs, on `worker_pool` if given (for callers that run
+        several scans from threads, like fleet_scan), otherwise across
+        config.workers processes if there is more than one.
+        Results are returned in the order of `jobs`.
+    """
+    config_paths = [_config_path(rules, stats) for rules, _ in jobs]
+    pool = worker_pool
+    if pool is not None:
+        with ThreadPoolExecutor(max_workers=len(pool.workers)) as threads:
+            runs = list(threads.map(
+                lambda job: _run_rules(job[0], job[1], semgrepl_config.exclude_paths, pool),
+                zip(config_paths, (targets for _, targets in jobs))))
+    elif semgrepl_config.workers <= 1 or len(jobs) <= 1:
+        runs = [_run_rules(path, targets, semgrepl_config.exclude_paths)
+                for path, (_, targets) in zip(config_paths, jobs)]
+    else:
+        runs = list(semgrepl_config.executor.map(
+            _run_rules,
+            config_paths,
+            [targets for _, targets in jobs],
+            itertools.repeat(semgrepl_config.exclude_paths)))
+    return _collect_runs(runs, stats)
+
+def _collect_runs(runs: List[Tuple[Dict[int, List[Dict]], QueryStats]], stats: QueryStats) -> List[Dict[int, List[Dict]]]:
+    for _, run_stats in runs:
+        stats.merge(run_stats)
+    return [results for results, _ in runs]
+
+def _match_order(match: Dict):
+    return (match['path'], match['start']['line'], match['start']['col'])
+
+def _run_queries(semgrepl_config: SemgreplConfig, queries: List, only_files: Set[str] = None,
+                 stats: QueryStats = None, worker_pool: WorkerPool = None) -> List[List[Dict]]:
+    """ Run several queries with one semgrep invocation per language (and
+        per shard, when config.workers > 1).
+        Returns the raw matches of each query, in the order of `queries`.
+        If `only_files` is given, only those files are scanned.
+    """
+    if stats is None:
+        stats = QueryStats()
+    queries, plans = _plan_queries(semgrepl_config, queries, only_files, stats)
+    job_results = iter(_execute(semgrepl_config, [job for jobs, _ in plans for job in jobs], stats, worker_pool))
+    return _finish_queries(queries, plans, job_results, stats)
+
+def _plan_queries(semgrepl_config: SemgreplConfig, queries: List, only_files: Set[str], stats: QueryStats):
+    queries = [_normalize_query(q) for q in queries]
+    semgrepl_config.sync_manifest()
+    plans = []
+    for lang, rules_by_query in _rules_by_language(semgrepl_config, queries, stats).items():
+        files = _prefilter(semgrepl_config, queries, rules_by_query,
+                           _language_files(semgrepl_config, lang, only_files), stats)
+        plans.append(_plan_language(semgrepl_config, lang, rules_by_query, files, stats))
+    for rules_yaml_file, indexes in _extracted(semgrepl_config, queries).items():
+        plans.append(_plan_extracted(semgrepl_config, rules_yaml_file, indexes, only_files, stats))
+    return queries, plans
+
+def _extractor(semgrepl_config: SemgreplConfig, rules_yaml_file: str):
+    """ The EXTRACTORS entry answering queries of `rules_yaml_file`, or None
+        if there's none or the config has its own rules, which only semgrep
+        can run.
+    """
+    if semgrepl_config.rules_dir != DEFAULT_RULES_DIR:
+        return None
+    return EXTRACTORS.get(rules_yaml_file)
+
+def _extracted(semgrepl_config: SemgreplConfig, queries: List[Tuple[str, Dict]]) -> Dict[str, List[int]]:
+    """ Indexes of the queries answered by EXTRACTORS, by rules file.
+    """
+    indexes = defaultdict(list)
+    for index, (rules_yaml_file, _) in enumerate(queries):
+        if _extractor(semgrepl_config, rules_yaml_file) is not None:
+            indexes[rules_yaml_file].append(index)
+    return indexes
+
+def _plan_extracted(semgrepl_config: SemgreplConfig, rules_yaml_file: str, indexes: List[int],
+                    only_files: Set[str], stats: QueryStats):
+    """ Like _plan_language, for queries of an in-process extractor: there
+        are no semgrep jobs, finish does the work.
+    """
+    extract, languages = EXTRACTORS[rules_yaml_file]
+    files = _extractor_files(semgrepl_config, languages, only_files)
+
+    def finish(job_results):
+        matches = extract(semgrepl_config, files, stats)
+        return {index: matches for index in indexes}
+    return [], finish
+
+def _extractor_files(semgrepl_config: SemgreplConfig, languages: List[str],
+                     only_files: Set[str] = None) -> List[Tuple[str, str]]:
+    files = []
+    for lang in languages:
+        if lang in semgrepl_config.languages:
+            files.extend((f, lang) for f in _language_files(semgrepl_config, lang, only_files) or [])
+    return files
+
+def _extract_strings(semgrepl_config: SemgreplConfig, files: List[Tuple[str, str]], stats: QueryStats) -> List[Dict]:
+    """ Matches for strings.yaml: every string literal of `files` ((path,
+        language) pairs), found by tokenizing them ourselves. Spread across
+        config.workers processes when there's more than one.
+    """
+    stats.count("files", len(files))
+    with stats.timer("extract"):
+        extracted = _map_files(semgrepl_config, semgrepl.strings.extract_files, files)
+        return [semgrepl.strings.to_match(path, literal) for path, literals in extracted for literal in literals]
+
+def _extract_import_statements(semgrepl_config: SemgreplConfig, files: List[Tuple[str, str]],
+                               stats: QueryStats) -> List[Dict]:
+    """ Matches for import-statements.yaml: every import statement of the
+        Python `files`, from Python's own parser, so no form of import
+        (relative to any level, any number of dotted parts) is missed.
+    """
+    stats.count("files", len(files))
+    with stats.timer("extract"):
+        return _map_files(semgrepl_config, semgrepl.importgraph.extract_files, files)
+
+def _map_files(semgrepl_config: SemgreplConfig, extract_files, files: List[Tuple[str, str]]) -> List:
+    """ extract_files(files), spread across config.workers processes when
+        there's more than one.
+    """
+    n = semgrepl_config.workers
+    if n <= 1 or len(files) <= 1:
+        return extract_files(files)
+    return [x for chunk in semgrepl_config.executor.map(extract_files, [files[i::n] for i in range(n)])
+            for x in chunk]
+
+# Bundled rules files whose queries are answered in-process instead of by
+# semgrep, with the languages they handle. With another rules_dir the
+# config's own rules file is run by semgrep. The matches have the shape semgrep's
+# would, so they mix with other queries in run_many, scopes and refresh().
+EXTRACTORS = {
+    "strings.yaml": (_extract_strings, semgrepl.strings.LANGUAGES),
+    "import-statements.yaml": (_extract_import_statements, ["python"]),
+}
+
+def _prefilter(semgrepl_config: SemgreplConfig, queries: List[Tuple[str, Dict]],
+               rules_by_query: Dict[int, List[Dict]], files: List[str], stats: QueryStats) -> List[str]:
+    """ Drop the files that can't match any of the queries, because they
+        don't contain the identifiers a query was given (e.g. the "exec" of
+        function_calls_by_name(config, "exec")).
+
+        Only done for the bundled queries with the bundled rules, which are
+        known to need every template variable to appear in a match.
+    """
+    if not files or semgrepl_config.rules_dir != DEFAULT_RULES_DIR:
+        return files
+    required = []
+    for index in rules_by_query:
+        rules_yaml_file, template_vars = queries[index]
+        lits = semgrepl.prefilter.literals(template_vars) if rules_yaml_file in QUERIES else []
+        if not lits:
+            return files
+        required.append(lits)
+    with stats.timer("prefilter"):
+        candidates = semgrepl.prefilter.candidates(files, required)
+    stats.count("prefiltered_files", len(files) - len(candidates))
+    return candidates
+
+def _finish_queries(queries: List, plans: List, job_results, stats: QueryStats) -> List[List[Dict]]:
+    results = [[] for _ in queries]
+    for jobs, finish in plans:
+        for index, matches in finish([next(job_results) for _ in jobs]).items():
+            results[index].extend(matches)
+
+    # Same order no matter how the scan was split up or what was cached
+    for matches in results:
+        matches.sort(key=_match_order)
+        stats.count("matches", len(matches))
+    return results
+
+async def _arun_queries(semgrepl_config: SemgreplConfig, queries: List, stats: QueryStats) -> List[List[Dict]]:
+    """ _run_queries for asyncio: semgrep runs in subprocesses, at most
+        config.workers at a time, and the bookkeeping around them (hashing,
+        cache lookups) in a thread, so the event loop is never blocked.
+    """
+    loop = asyncio.get_running_loop()
+    queries, plans = await loop.run_in_executor(None, _plan_queries, semgrepl_config, queries, None, stats)
+    limit = asyncio.Semaphore(max(1, semgrepl_config.workers))
+
+    async def run(rules, targets):
+        async with limit:
+            if semgrepl_config.worker_pool is None:
+                return await _arun_rules(_config_path(rules, stats), targets, semgrepl_config.exclude_paths)
+            return await _arun_on_worker(semgrepl_config.worker_pool, _config_path(rules, stats), targets,
+                                         semgrepl_config.exclude_paths)
+
+    runs = await asyncio.gather(*(run(rules, targets) for jobs, _ in plans for rules, targets in jobs))
+    job_results = iter(_collect_runs(runs, stats))
+    return await loop.run_in_executor(None, _finish_queries, queries, plans, job_results, stats)
+
+def _iter_queries(semgrepl_config: SemgreplConfig, queries: List, batch_size: int, stats: QueryStats):
+    """ Like _run_queries, but scans `batch_size` files at a time and yields
+        (query index, matches) after each batch, so only one batch of
+        results is ever held in memory.
+    """
+    queries = [_normalize_query(q) for q in queries]
+    semgrepl_config.sync_manifest()
+    for lang, rules_by_query in _rules_by_language(semgrepl_config, queries, stats).items():
+        files = _prefilter(semgrepl_config, queries, rules_by_query, _language_files(semgrepl_config, lang), stats)
+        batches = [None] if files is None else [files[i:i + batch_size] for i in range(0, len(files), batch_size)]
+        for batch in batches:
+            jobs, finish = _plan_language(semgrepl_config, lang, rules_by_query, batch, stats)
+            for index, matches in finish(_execute(semgrepl_config, jobs, stats)).items():
+                matches.sort(key=_match_order)
+                stats.count("matches", len(matches))
+                yield index, matches
+    for rules_yaml_file, indexes in _extracted(semgrepl_config, queries).items():
+        extract, languages = EXTRACTORS[rules_yaml_file]
+        files = _extractor_files(semgrepl_config, languages)
+        for i in range(0, len(files), batch_size):
+            matches = extract(semgrepl_config, files[i:i + batch_size], stats)
+            matches.sort(key=_match_order)
+            for index in indexes:
+                stats.count("matches", len(matches))
+                yield index, list(matches)
+
+def _render_and_run(semgrepl_config: SemgreplConfig, rules_yaml_file: str, template_vars: Dict = {}):
+    return _run_queries(semgrepl_config, [(rules_yaml_file, template_vars)])[0]
+
+def run_many(semgrepl_config: SemgreplConfig, queries: List, scope=None) -> List[List[SemgreplObject]]:
+    """ Run several queries over the targets at once, e.g.
+        imports, classes = run_many(config, ["imports.yaml", "classes.yaml"])
+
+        Each query is a rules file name or a (rules file name, template_vars)
+        tuple. Target files are only parsed once per language instead of
+        once per query.
+
+        `scope` restricts the queries to the lines covered by earlier
+        results, e.g. scope=classes_by_name(config, "Handler"). Only the
+        files of those results are scanned.
+
+        Each result list's `stats` holds the timings and counters of the
+        run; config.stats adds up those of every run.
+    """
+    queries = [_normalize_query(q) for q in queries]
+    if semgrepl_config.snapshot is None:
+        semgrepl_config.snapshot = Snapshot.take(semgrepl_config.targets, semgrepl_config.exclude_paths)
+    stats = QueryStats()
+    scope = _scope(scope)
+    only_files = scope.files if scope is not None else None
+    results = [_track(semgrepl_config, query, _build(query, _in_scope(scope, matches), stats), stats, scope)
+               for query, matches in zip(queries, _run_queries(semgrepl_config, queries, only_files, stats))]
+    semgrepl_config.stats.merge(stats)
+    return results
+
+def _scope(scope) -> Scope:
+    if scope is None or isinstance(scope, Scope):
+        return scope
+    return Scope(scope)
+
+def _in_scope(scope: Scope, matches: List[Dict]) -> List[Dict]:
+    return matches if scope is None else scope.filter_matches(matches)
+
+def _track(semgrepl_config: SemgreplConfig, query: Tuple[str, Dict], objects: List[SemgreplObject],
+           stats: QueryStats = None, scope: Scope = None) -> SemgreplResults:
+    """ Wrap the results of `query` so refresh() keeps them up to date.
+    """
+    results = objects if isinstance(objects, SemgreplResults) else SemgreplResults(objects, query)
+    if stats is not None:
+        results.stats = stats
+    results.scope = scope
+    semgrepl_config.history.append(weakref.ref(results))
+    if semgrepl_config.session is not None and query is not None and scope is None:
+        semgrepl_config.session.save(results, results.session_name, semgrepl_config.snapshot)
+    return results
+
+def _build(query: Tuple[str, Dict], matches: List[Dict], stats: QueryStats = None) -> List[SemgreplObject]:
+    rules_yaml_file, template_vars = query
+    build = QUERIES[rules_yaml_file][0] if rules_yaml_file in QUERIES else lambda match, _: SemgreplMatch(match)
+    if stats is None:
+        return [build(x, template_vars) for x in matches]
+    with stats.timer("build"):
+        objects = [build(x, template_vars) for x in matches]
+    stats.count("objects", len(objects))
+    return objects
+
+def refresh(semgrepl_config: SemgreplConfig) -> Set[str]:
+    """ Bring the results of previous queries up to date after files in the
+        targets were edited. Only the changed files are rescanned, and the
+        result lists are updated in place.
+
+        Returns the set of files that changed.
+    """
+    if semgrepl_config.snapshot is None:
+        return set()
+    live = [r for r in (ref() for ref in semgrepl_config.history) if r is not None]
+    semgrepl_config.history = [weakref.ref(r) for r in live]
+    semgrepl_config.snapshot, changed = _patch(semgrepl_config, semgrepl_config.snapshot, live)
+
+    session = semgrepl_config.session
+    if changed and session is not None:
+        for results in live:
+            if results.session_name in session:
+                session.save(results, results.session_name, semgrepl_config.snapshot)
+
+    index = semgrepl_config.index
+    if changed and index is not None:
+        index.snapshot = semgrepl_config.snapshot
+        index.reindex()
+        _save_index(semgrepl_config, index)
+    return changed
+
+def _patch(semgrepl_config: SemgreplConfig, since: Snapshot, live: List[SemgreplResults]) -> Tuple[Snapshot, Set[str]]:
+    """ Rescan the files changed since `since` and patch `live` in place.
+        Returns a new snapshot and the changed files.
+    """
+    changed = since.changed_files(semgrepl_config.targets)
+    if not changed:
+        return since, changed
+    # Taken before listing the changes that are rescanned, so a file edited
+    # during the rescan shows up as changed next time
+    snapshot = Snapshot.take(semgrepl_config.targets, semgrepl_config.exclude_paths)
+    changed = since.changed_files(semgrepl_config.targets)
+    if not changed or not live:
+        return snapshot, changed
+
+    # Results of the same query are patched from a single rescan
+    queries = {}
+    for results in live:
+        queries.setdefault(json.dumps(results.query, sort_keys=True), results.query)
+    keys = list(queries)
+    stats = QueryStats()
+    fresh = dict(zip(keys, _run_queries(semgrepl_config, [queries[k] for k in keys], changed, stats)))
+
+    for results in live:
+        matches = fresh[json.dumps(results.query, sort_keys=True)]
+        results[:] = ([x for x in results if os.path.abspath(x.file_path) not in changed]
+                      + _build(results.query, _in_scope(results.scope, matches), stats))
+    semgrepl_config.stats.merge(stats)
+    return snapshot, changed
+
+# Queries making up a SymbolIndex, in SymbolIndex's argument order
+INDEX_QUERIES = ["function-defs.yaml", "function-calls.yaml", "classes.yaml", "imports.yaml"]
+
+# Seconds during which index lookups don't check the targets for edits
+# again, so a batch of *_by_name queries (e.g. one per name in a loop)
+# pays for a single check
+INDEX_CHECK_INTERVAL = 1.0
+
+def _index_path(semgrepl_config: SemgreplConfig) -> str:
+    if semgrepl_config.cache_dir is None:
+        return None
+    return semgrepl.index.index_path(semgrepl_config.cache_dir, semgrepl_config.targets, semgrepl_config.exclude_paths)
+
+def _save_index(semgrepl_config: SemgreplConfig, index: SymbolIndex):
+    path = _index_path(semgrepl_config)
+    if path is not None:
+        index.save(path)
+
+def build_index(semgrepl_config: SemgreplConfig, rebuild: bool = False) -> SymbolIndex:
+    """ Collect every function definition, call, class and import in one scan
+        and index them by name, file and enclosing function. Afterwards the
+        *_by_name helpers answer from the index instead of rescanning.
+
+        The index is saved in the cache dir; later sessions on the same
+        targets load it and only rescan files that changed since. Pass
+        rebuild=True to start from scratch.
+    """
+    path = _index_path(semgrepl_config)
+    index = None
+    if not rebuild and path is not None and os.path.exists(path):
+        try:
+            index = SymbolIndex.load(path)
+        except Exception as e:
+            semgrepl_config.logger.warning("Ignoring unreadable index {}: {}".format(path, e))
+
+    if index is None:
+        snapshot = Snapshot.take(semgrepl_config.targets, semgrepl_config.exclude_paths)
+        index = SymbolIndex(*run_many(semgrepl_config, INDEX_QUERIES), snapshot=snapshot)
+    else:
+        _update_index(semgrepl_config, index)
+        for r in [index.defs, index.calls, index.classes, index.imports]:
+            _track(semgrepl_config, r.query, r)
+        if semgrepl_config.snapshot is None:
+            semgrepl_config.snapshot = index.snapshot
+
+    _save_index(semgrepl_config, index)
+    semgrepl_config.index = index
+    semgrepl_config.index_checked = None
+    return index
+
+def _update_index(semgrepl_config: SemgreplConfig, index: SymbolIndex) -> Set[str]:
+    """ Rescan the files changed since the index was last brought up to date
+        and reindex. Returns the changed files.
+    """
+    results = [index.defs, index.calls, index.classes, index.imports]
+    index.snapshot, changed = _patch(semgrepl_config, index.snapshot, results)
+    if changed:
+        index.reindex()
+    return changed
+
+def _index_for(semgrepl_config: SemgreplConfig, name: str) -> SymbolIndex:
+    """ The symbol index, if there is one and it can answer a query for
+        `name`. The index only knows bare names, so anything but a plain
+        identifier (metavariables, "os.system", ...) goes to semgrep. Files
+        edited since the index was last updated are rescanned first, checked
+        for at most once every INDEX_CHECK_INTERVAL seconds.
+    """
+    index = semgrepl_config.index
+    if index is None or not name.isidentifier():
+        return None
+    with semgrepl_config.index_lock:
+        checked = semgrepl_config.index_checked
+        if checked is None or time.monotonic() - checked >= INDEX_CHECK_INTERVAL:
+            if _update_index(semgrepl_config, index):
+                _save_index(semgrepl_config, index)
+            semgrepl_config.index_checked = time.monotonic()
+    return index
+
+def call_graph(semgrepl_config: SemgreplConfig) -> CallGraph:
+    """ Call graph of the targets, built from the symbol index (which is
+        built first if needed), e.g.
+
+            graph = call_graph(config)
+            graph.callers_of("exec", depth=None)
+            graph.paths_to(["main"], "exec")
+    """
+    if semgrepl_config.index is None:
+        build_index(semgrepl_config)
+    return CallGraph(semgrepl_config.index)
+
+def open_session(semgrepl_config: SemgreplConfig, path: str = None) -> SessionStore:
+    """ Open the session database of the targets (in the cache dir unless
+        `path` is given). Until close_session(), every query's results are
+        saved to it, and can be reopened after a restart with saved(),
+        filtered with SQL and tagged while triaging, e.g.
+
+            session = open_session(config)
+            session.tag(function_calls_by_name(config, "exec"), semgrepl.session.REVIEW_LATER)
+            session.select("function_calls", "file_path LIKE ?", ("%/api/%",))
+    """
+    close_session(semgrepl_config)
+    if path is None:
+        if semgrepl_config.cache_dir is None:
+            raise ValueError("No cache dir to keep the session in, pass a path")
+        path = semgrepl.session.session_path(semgrepl_config.cache_dir, semgrepl_config.targets,
+                                             semgrepl_config.exclude_paths)
+    semgrepl_config.session = SessionStore(path)
+    return semgrepl_config.session
+
+def close_session(semgrepl_config: SemgreplConfig):
+    if semgrepl_config.session is not None:
+        semgrepl_config.session.close()
+        semgrepl_config.session = None
+
+def saved(semgrepl_config: SemgreplConfig, name: str) -> SemgreplResults:
+    """ Results saved in the open session, by name: the query's name (see
+        session.query_name(), e.g. "imports.yaml") or the one given to
+        SessionStore.save(). Files changed since they were saved are
+        rescanned, and refresh() keeps them up to date from then on.
+    """
+    session = semgrepl_config.session
+    if session is None:
+        raise ValueError("No session open, see open_session()")
+    results = session.load(name)
+    snapshot = session.snapshot(name)
+    if snapshot is not None and results.query is not None:
+        snapshot, changed = _patch(semgrepl_config, snapshot, [results])
+        if changed:
+            session.save(results, name, snapshot)
+        if semgrepl_config.snapshot is None:
+            semgrepl_config.snapshot = snapshot
+    semgrepl_config.history.append(weakref.ref(results))
+    return results
+
+# Categories of the report made by profile(), and the query filling each in
+PROFILE_QUERIES = {
+    "imports": "imports.yaml",
+    "classes": "classes.yaml",
+    "function_defs": "function-defs.yaml",
+    "strings": "strings.yaml",
+    "routes": "routes.yaml",
+    "sinks": "sinks.yaml",
+}
+
+def _languages_summary(semgrepl_config: SemgreplConfig) -> Dict[str, Dict[str, Dict[str, int]]]:
+    return {repo: {lang: {"code": info.code, "files": len(info.files)} for lang, info in output.languages_by_frequency}
+            for repo, output in semgrepl_config.languages_used.items()}
+
+def _profile_rules_key(semgrepl_config: SemgreplConfig, categories: Dict) -> str:
+    queries = [_normalize_query(q) for q in categories.values()]
+    rules = _rules_by_language(semgrepl_config, queries, QueryStats())
+    return semgrepl.cache.rules_key([{"categories": list(categories), "rules": rules}])
+
+def profile(semgrepl_config: SemgreplConfig, categories: Dict = None, rebuild: bool = False) -> Profile:
+    """ Everything worth knowing in the first hour on a new repo, from one
+        scan per language: imports, classes, functions, strings, routes and
+        dangerous sinks (see PROFILE_QUERIES), plus the languages used.
+
+        `categories` adds to or overrides PROFILE_QUERIES, e.g.
+        {"jwt": "jwt.yaml"} for rules of your own in the rules dir.
+
+        The report is saved in the cache dir. Later sessions on the same
+        targets load it and only rescan files that changed since, unless the
+        rules changed or rebuild=True.
+    """
+    categories = {**PROFILE_QUERIES, **(categories or {})}
+    rules_key = _profile_rules_key(semgrepl_config, categories)
+    path = None
+    if semgrepl_config.cache_dir is not None:
+        path = semgrepl.profile.profile_path(semgrepl_config.cache_dir, semgrepl_config.targets,
+                                             semgrepl_config.exclude_paths)
+
+    report = None
+    if not rebuild and path is not None and os.path.exists(path):
+        try:
+            report = Profile.load(path)
+        except Exception as e:
+            semgrepl_config.logger.warning("Ignoring unreadable profile {}: {}".format(path, e))
+        if report is not None and report.rules_key != rules_key:
+            report = None
+
+    if report is None:
+        snapshot = Snapshot.take(semgrepl_config.targets, semgrepl_config.exclude_paths)
+        names = list(categories)
+        results = run_many(semgrepl_config, [categories[name] for name in names])
+        report = Profile(dict(zip(names, results)), _languages_summary(semgrepl_config), snapshot, rules_key)
+    else:
+        results = list(report.results.values())
+        report.snapshot, changed = _patch(semgrepl_config, report.snapshot, results)
+        if changed:
+            report.languages = _languages_summary(semgrepl_config)
+        for r in results:
+            _track(semgrepl_config, r.query, r)
+        if semgrepl_config.snapshot is None:
+            semgrepl_config.snapshot = report.snapshot
+
+    if path is not None:
+        report.save(path)
+    return report
+
+def import_graph(semgrepl_config: SemgreplConfig) -> ImportGraph:
+    """ Which Python files of the targets import which, and which external
+        packages, e.g.
+
+            graph = import_graph(config)
+            graph.importers_of("pickle")
+            graph.cycles()
+            graph.most_imported()
+    """
+    statements = run_many(semgrepl_config, ["import-statements.yaml"])[0]
+    files = semgrepl_config.language_files("python")
+    if files is None:
+        files = [f for target in semgrepl_config.targets
+                 for f in semgrepl.targets.walk(target, semgrepl_config.exclude_paths) if f.endswith(".py")]
+    return ImportGraph(statements, files)
+
+def class_hierarchy(semgrepl_config: SemgreplConfig) -> ClassHierarchy:
+    """ Inheritance between the classes of the targets, built from the
+        symbol index (which is built first if needed), e.g.
+
+            hierarchy = class_hierarchy(config)
+            hierarchy.subclasses_of("RequestHandler")
+            hierarchy.methods_of("LoginHandler", inherited=True)
+    """
+    if semgrepl_config.index is None:
+        build_index(semgrepl_config)
+    return ClassHierarchy(semgrepl_config.index)
+
+def fleet_scan(repos, queries: List, checkpoint: str, concurrency: int = 4, rules_dir: str = DEFAULT_RULES_DIR,
+               exclude_paths: List = [], cache_dir: str = semgrepl.cache.DEFAULT_CACHE_DIR) -> FleetCheckpoint:
+    """ Scan many repos (paths, or a glob like "repos/*") as separate
+        (repo, language, query) units, `concurrency` of them at a time on
+        as many semgrep workers, the largest repos first.
+
+        Each unit's results are written to the `checkpoint` database as soon
+        as it's done. Running fleet_scan again with the same checkpoint
+        after a crash or Ctrl-C only runs the units that hadn't finished,
+        or whose repo or rules changed since. Returns the checkpoint, e.g.
+
+            fleet = fleet_scan("repos/*", ["imports.yaml", "sinks.yaml"], "fleet.sqlite3")
+            fleet.results("sinks.yaml")     # {repo: results}
+    """
+    if isinstance(repos, str):
+        repos = glob.glob(repos)
+    repos = sorted(os.path.abspath(r) for r in repos)
+    queries = [_normalize_query(q) for q in queries]
+    fleet = FleetCheckpoint(checkpoint)
+    # One connection to the result cache for every repo
+    cache_dir = semgrepl.cache.resolve_dir(cache_dir)
+    result_cache = semgrepl.cache.ResultCache(cache_dir) if cache_dir else None
+
+    def detect(repo):
+        semgrepl_config = SemgreplConfig([repo], rules_dir, exclude_paths=exclude_paths, cache_dir=cache_dir,
+                                         background_detection=True, result_cache=result_cache)
+        # Built before the repo's units run side by side
+        semgrepl_config.manifest
+        state = semgrepl.fleet.repo_state(repo, exclude_paths)
+        versions = [semgrepl.fleet.unit_version(_query_rules(semgrepl_config, q), state) for q in queries]
+        return semgrepl_config, versions
+
+    with ThreadPoolExecutor(max_workers=concurrency) as threads:
+        detected = dict(zip(repos, threads.map(detect, repos)))
+    configs = {repo: c for repo, (c, _) in detected.items()}
+    languages_used = {repo: next(iter(c.languages_used.values())) for repo, c in configs.items()}
+    units = semgrepl.fleet.plan(languages_used, queries, SEMGREP_SUPPORTED_LANGUAGES)
+
+    def version(unit):
+        return detected[unit.repo][1][queries.index(unit.query)]
+
+    todo = [u for u in units if not fleet.done(u, version(u))]
+    logging.info("Fleet scan: {} of {} units left".format(len(todo), len(units)))
+    try:
+        if todo:
+            _run_units(fleet, configs, todo, version, concurrency)
+    finally:
+        for semgrepl_config in configs.values():
+            semgrepl_config.close()
+        if result_cache is not None:
+            result_cache.close()
+    return fleet
+
+def _run_units(fleet: FleetCheckpoint, configs: Dict[str, SemgreplConfig], todo: List[Unit], version,
+               concurrency: int):
+    # Units run from threads, so their scans go to separate processes
+    pool = WorkerPool(concurrency)
+    threads = ThreadPoolExecutor(max_workers=concurrency)
+    futures = {threads.submit(_run_unit, configs[u.repo], u, pool): u for u in todo}
+    try:
+        for future in as_completed(futures):
+            unit = futures[future]
+            try:
+                fleet.save(unit, future.result(), version(unit))
+            except Exception as e:
+                # Left for the next run to retry
+                logging.warning("Fleet scan: {} {} {} failed: {}".format(unit.repo, unit.language, unit.query[0], e))
+    finally:
+        # On Ctrl-C, drop the units not started and stop the running ones
+        for future in futures:
+            future.cancel()
+        pool.stop()
+        threads.shutdown(wait=True)
+
+def _query_rules(semgrepl_config: SemgreplConfig, query: Tuple[str, Dict]) -> List[Dict]:
+    """ Every rule `query` renders to for the config's languages.
+    """
+    rules_by_lang = _render_rules(semgrepl_config, [query])
+    return [rule for lang in sorted(rules_by_lang) for rule in rules_by_lang[lang][0]]
+
+def _run_unit(semgrepl_config: SemgreplConfig, unit: Unit, worker_pool: WorkerPool) -> SemgreplResults:
+    files = set(semgrepl_config.language_files(unit.language) or [])
+    matches = _run_queries(semgrepl_config, [unit.query], files, semgrepl_config.stats, worker_pool)[0]
+    return SemgreplResults(_build(unit.query, matches), unit.query)
+
+async def arun_many(semgrepl_config: SemgreplConfig, queries: List) -> List[List[SemgreplObject]]:
+    """ asyncio version of run_many. The scan runs in semgrep subprocesses,
+        so awaiting it doesn't block the event loop, several can run at once
+        with asyncio.gather, and cancelling the task kills them.
+    """
+    loop = asyncio.get_running_loop()
+    queries = [_normalize_query(q) for q in queries]
+    if semgrepl_config.snapshot is None:
+        semgrepl_config.snapshot = await loop.run_in_executor(
+            None, Snapshot.take, semgrepl_config.targets, semgrepl_config.exclude_paths)
+    stats = QueryStats()
+    results = [_track(semgrepl_config, query, _build(query, matches, stats), stats)
+               for query, matches in zip(queries, await _arun_queries(semgrepl_config, queries, stats))]
+    semgrepl_config.stats.merge(stats)
+    return results
+
+def iter_many(semgrepl_config: SemgreplConfig, queries: List, batch_size: int = DEFAULT_BATCH_SIZE):
+    """ Streaming version of run_many: yields (query index, SemgreplObject)
+        pairs as each batch of files is scanned, instead of returning every
+        result at once.
+    """
+    queries = [_normalize_query(q) for q in queries]
+    stats = QueryStats()
+    try:
+        for index, matches in _iter_queries(semgrepl_config, queries, batch_size, stats):
+            yield from ((index, x) for x in _build(queries[index], matches, stats))
+    finally:
+        semgrepl_config.stats.merge(stats)
+
+def _iter_query(semgrepl_config: SemgreplConfig, query, batch_size: int):
+    for _, x in iter_many(semgrepl_config, [query], batch_size):
+        yield x
+
+# Every helper takes an optional `scope`: earlier results to search inside,
+# see run_many. E.g. methods named get of classes named Handler:
+#   function_defs_by_name(config, "get", scope=classes_by_name(config, "Handler"))
+def imports(semgrepl_config: SemgreplConfig, scope=None) -> List[SemgreplImport]:
+    return run_many(semgrepl_config, ["imports.yaml"], scope)[0]
+
+def _from_index(semgrepl_config: SemgreplConfig, query: Tuple[str, Dict], objects: List[SemgreplObject], scope):
+    scope = _scope(scope)
+    if scope is not None:
+        objects = scope.filter(objects)
+    return _track(semgrepl_config, query, objects, scope=scope)
+
+def function_calls_by_name(semgrepl_config: SemgreplConfig, function_name: str, scope=None) -> List[SemgreplFunctionCall]:
     template_vars = {"function_name": function_name}
-    matches = _render_and_run(semgrepl_config, "function-calls.yaml", template_vars)
-    call_matches = [SemgreplFunctionCall(function_name, x) for x in matches]
-    return call_matches
+    index = _index_for(semgrepl_config, function_name)
+    if index is not None:
+        return _from_index(semgrepl_config, ("function-calls.yaml", template_vars), index.calls_by_name.get(function_name, []), scope)
+    return run_many(semgrepl_config, [("function-calls.yaml", template_vars)], scope)[0]
 
-def function_calls(semgrepl_config: SemgreplConfig) -> List[SemgreplFunctionCall]:
-    return function_calls_by_name(semgrepl_config, "$NAME")
+def function_calls(semgrepl_config: SemgreplConfig, scope=None) -> List[SemgreplFunctionCall]:
+    return function_calls_by_name(semgrepl_config, "$NAME", scope)
 
-def function_defs_by_name(semgrepl_config: SemgreplConfig, function_name: str) -> List[SemgreplFunctionDef]:
+def function_defs_by_name(semgrepl_config: SemgreplConfig, function_name: str, scope=None) -> List[SemgreplFunctionDef]:
     template_vars = {"function_name": function_name}
-    matches = _render_and_run(semgrepl_config, "function-defs.yaml", template_vars)
-    function_def_matches = [SemgreplFunctionDef(x, function_name) for x in matches]
-    return function_def_matches
+    index = _index_for(semgrepl_config, function_name)
+    if index is not None:
+        return _from_index(semgrepl_config, ("function-defs.yaml", template_vars), index.defs_by_name.get(function_name, []), scope)
+    return run_many(semgrepl_config, [("function-defs.yaml", template_vars)], scope)[0]
 
-def function_defs(semgrepl_config: SemgreplConfig) -> List[SemgreplFunctionDef]:
-    return function_defs_by_name(semgrepl_config, "$X")
+def function_defs(semgrepl_config: SemgreplConfig, scope=None) -> List[SemgreplFunctionDef]:
+    return function_defs_by_name(semgrepl_config, "$X", scope)
 
-def classes_by_name(semgrepl_config: SemgreplConfig, class_name: str):
+def classes_by_name(semgrepl_config: SemgreplConfig, class_name: str, scope=None):
     template_vars = {"class_name": class_name}
-    matches = _render_and_run(semgrepl_config, "classes.yaml", template_vars)
-    class_matches = [SemgreplClass(x, class_name) for x in matches]
-    return class_matches
+    index = _index_for(semgrepl_config, class_name)
+    if index is not None:
+        return _from_index(semgrepl_config, ("classes.yaml", template_vars), index.classes_by_name.get(class_name, []), scope)
+    return run_many(semgrepl_config, [("classes.yaml", template_vars)], scope)[0]
 
-def classes(semgrepl_config: SemgreplConfig):
-    return classes_by_name(semgrepl_config, "$X")
+def classes(semgrepl_config: SemgreplConfig, scope=None):
+    return classes_by_name(semgrepl_config, "$X", scope)
 
 # What should this do?
 def annotations(semgrepl_config: SemgreplConfig):
@@ -263,7 +1221,83 @@ def annotations(semgrepl_config: SemgreplConfig):
             annotations.add(a)
     return annotations
 
-def strings(semgrepl_config: SemgreplConfig):
-    matches = _render_and_run(semgrepl_config, "strings.yaml")
-    string_matches = [SemgreplString(x) for x in matches]
-    return string_matches
\ No newline at end of file
+def strings(semgrepl_config: SemgreplConfig, scope=None):
+    """ Every string literal in the targets, one result per occurrence.
+    """
+    return run_many(semgrepl_config, ["strings.yaml"], scope)[0]
+
+def string_literals(semgrepl_config: SemgreplConfig, min_length: int = 0, min_entropy: float = 0.0,
+                    scope=None) -> List[StringLiteral]:
+    """ The distinct strings of the targets, each with every place it
+        appears, most frequent first. min_length and min_entropy drop the
+        short and the word-like ones, e.g. to hunt for hardcoded secrets:
+
+            string_literals(config, min_length=16, min_entropy=4.0)
+    """
+    by_value = defaultdict(list)
+    for s in strings(semgrepl_config, scope):
+        by_value[s.value].append(s)
+    literals = [StringLiteral(value, occurrences) for value, occurrences in by_value.items()
+                if len(value) >= min_length]
+    literals = [x for x in literals if x.entropy >= min_entropy]
+    return sorted(literals, key=lambda x: (-x.count, x.value))
+
+# asyncio versions of the helpers above, e.g. in a notebook:
+#   imports, classes = await asyncio.gather(aimports(config), aclasses(config))
+# Index lookups run in a thread too, as they may rescan edited files first.
+async def aimports(semgrepl_config: SemgreplConfig) -> List[SemgreplImport]:
+    return (await arun_many(semgrepl_config, ["imports.yaml"]))[0]
+
+async def afunction_calls_by_name(semgrepl_config: SemgreplConfig, function_name: str) -> List[SemgreplFunctionCall]:
+    if semgrepl_config.index is not None and function_name.isidentifier():
+        return await asyncio.get_running_loop().run_in_executor(None, function_calls_by_name, semgrepl_config, function_name)
+    return (await arun_many(semgrepl_config, [("function-calls.yaml", {"function_name": function_name})]))[0]
+
+async def afunction_calls(semgrepl_config: SemgreplConfig) -> List[SemgreplFunctionCall]:
+    return await afunction_calls_by_name(semgrepl_config, "$NAME")
+
+async def afunction_defs_by_name(semgrepl_config: SemgreplConfig, function_name: str) -> List[SemgreplFunctionDef]:
+    if semgrepl_config.index is not None and function_name.isidentifier():
+        return await asyncio.get_running_loop().run_in_executor(None, function_defs_by_name, semgrepl_config, function_name)
+    return (await arun_many(semgrepl_config, [("function-defs.yaml", {"function_name": function_name})]))[0]
+
+async def afunction_defs(semgrepl_config: SemgreplConfig) -> List[SemgreplFunctionDef]:
+    return await afunction_defs_by_name(semgrepl_config, "$X")
+
+async def aclasses_by_name(semgrepl_config: SemgreplConfig, class_name: str):
+    if semgrepl_config.index is not None and class_name.isidentifier():
+        return await asyncio.get_running_loop().run_in_executor(None, classes_by_name, semgrepl_config, class_name)
+    return (await arun_many(semgrepl_config, [("classes.yaml", {"class_name": class_name})]))[0]
+
+async def aclasses(semgrepl_config: SemgreplConfig):
+    return await aclasses_by_name(semgrepl_config, "$X")
+
+async def astrings(semgrepl_config: SemgreplConfig):
+    return (await arun_many(semgrepl_config, ["strings.yaml"]))[0]
+
+# Generator versions of the helpers above, for results too big to keep in
+# memory, e.g.
+#   long_strings = [s for s in iter_strings(config) if len(s.name) > 40]
+def iter_imports(semgrepl_config: SemgreplConfig, batch_size: int = DEFAULT_BATCH_SIZE):
+    return _iter_query(semgrepl_config, "imports.yaml", batch_size)
+
+def iter_function_calls_by_name(semgrepl_config: SemgreplConfig, function_name: str, batch_size: int = DEFAULT_BATCH_SIZE):
+    return _iter_query(semgrepl_config, ("function-calls.yaml", {"function_name": function_name}), batch_size)
+
+def iter_function_calls(semgrepl_config: SemgreplConfig, batch_size: int = DEFAULT_BATCH_SIZE):
+    return iter_function_calls_by_name(semgrepl_config, "$NAME", batch_size)
+
+def iter_function_defs_by_name(semgrepl_config: SemgreplConfig, function_name: str, batch_size: int = DEFAULT_BATCH_SIZE):
+    return _iter_query(semgrepl_config, ("function-defs.yaml", {"function_name": function_name}), batch_size)
+
+def iter_function_defs(semgrepl_config: SemgreplConfig, batch_size: int = DEFAULT_BATCH_SIZE):
+    return iter_function_defs_by_name(semgrepl_config, "$X", batch_size)
+
+def iter_classes_by_name(semgrepl_config: SemgreplConfig, class_name: str, batch_size: int = DEFAULT_BATCH_SIZE):
+    return _iter_query(semgrepl_config, ("classes.yaml", {"class_name": class_name}), batch_size)
+
+def iter_classes(semgrepl_config: SemgreplConfig, batch_size: int = DEFAULT_BATCH_SIZE):
+    return iter_classes_by_name(semgrepl_config, "$X", batch_size)
+
+def iter_strings(semgrepl_config: SemgreplConfig, batch_size: int = DEFAULT_BATCH_SIZE):
+    return _iter_query(semgrepl_config, "strings.yaml", batch_size)
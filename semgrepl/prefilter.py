@@ -0,0 +1,68 @@
+import functools
+import mmap
+import os
+import re
+import threading
+from typing import List, Dict
+
+# Identifiers in a template variable's value, e.g. "os.system" => os, system
+_IDENTIFIER = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+
+# Files whose search results are kept, shared by every query of the session
+# so a file is searched for a given literal once. Least recently searched
+# files (and old versions of edited ones) are forgotten past this.
+MEMO_SIZE = 100000
+_memo_lock = threading.Lock()
+
+def literals(template_vars: Dict[str, str]) -> List[str]:
+    """ Identifiers a file has to contain for rules rendered with
+        `template_vars` to match in it. Metavariables ("$X") and ellipses
+        require nothing.
+    """
+    found = []
+    for value in template_vars.values():
+        if not isinstance(value, str) or "$" in value or "..." in value:
+            continue
+        found.extend(_IDENTIFIER.findall(value))
+    return sorted(set(found))
+
+@functools.lru_cache(maxsize=MEMO_SIZE)
+def _known(path: str, mtime_ns: int, size: int) -> Dict[str, bool]:
+    """ {literal: found} of one version of a file, filled in by _contains.
+    """
+    return {}
+
+def _contains(path: str, wanted: List[str]) -> Dict[str, bool]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return {lit: False for lit in wanted}
+    with _memo_lock:
+        known = _known(path, st.st_mtime_ns, st.st_size)
+        missing = [lit for lit in wanted if lit not in known]
+    if missing:
+        results = {lit: False for lit in missing}
+        if st.st_size:
+            try:
+                with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                    for lit in missing:
+                        results[lit] = m.find(lit.encode('utf-8')) != -1
+            except (OSError, ValueError):
+                # Can't tell, so let semgrep look
+                results = {lit: True for lit in missing}
+        with _memo_lock:
+            known.update(results)
+    return {lit: known[lit] for lit in wanted}
+
+def candidates(files: List[str], required: List[List[str]]) -> List[str]:
+    """ The files that contain every literal of at least one of the lists
+        in `required`, searched for as plain bytes in a memory map. This
+        never drops a file that could match, only ones that can't.
+    """
+    wanted = sorted({lit for lits in required for lit in lits})
+    keep = []
+    for path in files:
+        found = _contains(path, wanted)
+        if any(all(found[lit] for lit in lits) for lits in required):
+            keep.append(path)
+    return keep
@@ -0,0 +1,72 @@
+import hashlib
+import os
+import pickle
+import time
+from collections import Counter
+from typing import List, Dict
+from semgrepl.abstract import *
+from semgrepl.cache import atomic_write
+from semgrepl.snapshot import Snapshot
+
+# Bump when the pickled layout changes, so old reports are rebuilt
+PROFILE_VERSION = 2
+
+def profile_path(cache_dir: str, targets: List[str], exclude_paths: List[str]) -> str:
+    h = hashlib.sha1(repr((PROFILE_VERSION, sorted(targets), sorted(exclude_paths))).encode('utf-8'))
+    return os.path.join(cache_dir, "profile-{}.pickle".format(h.hexdigest()))
+
+class Profile:
+    """ The results of main.profile(): one result list per category
+        (imports, classes, routes, sinks, ...), reachable as attributes,
+        e.g. report.routes, plus the languages used.
+    """
+    def __init__(self, results: Dict[str, SemgreplResults], languages: Dict[str, Dict[str, Dict[str, int]]],
+                 snapshot: Snapshot = None, rules_key: str = None):
+        self.results = results
+        self.languages = languages
+        self.snapshot = snapshot
+        # Identifies the rule pack the report was made with
+        self.rules_key = rules_key
+        self.created = time.time()
+
+    def __getattr__(self, name):
+        results = self.__dict__.get("results", {})
+        if name in results:
+            return results[name]
+        raise AttributeError(name)
+
+    def __dir__(self):
+        return list(super().__dir__()) + list(self.results)
+
+    def __repr__(self):
+        return "<Profile {}>".format(" ".join("{}={}".format(k, v) for k, v in self.summary().items()))
+
+    @property
+    def categories(self) -> List[str]:
+        return list(self.results)
+
+    @property
+    def annotations(self) -> Counter:
+        """ Decorators of the function defs found, by number of uses.
+        """
+        return Counter(a for f in self.results.get("function_defs", []) for a in f.annotations)
+
+    def summary(self) -> Dict[str, int]:
+        return {category: len(results) for category, results in self.results.items()}
+
+    def print_summary(self):
+        for repo, languages in self.languages.items():
+            print(repo)
+            for lang, info in languages.items():
+                print("  {}: LOC={}, files={}".format(lang, info["code"], info["files"]))
+        for category, count in self.summary().items():
+            print("{}: {}".format(category, count))
+
+    def save(self, path: str):
+        with atomic_write(path, 'wb') as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def load(path: str) -> 'Profile':
+        with open(path, 'rb') as f:
+            return pickle.load(f)
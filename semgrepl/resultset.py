@@ -0,0 +1,215 @@
+import bisect
+from collections import defaultdict
+from itertools import accumulate
+from typing import List, Dict, Tuple, Callable, Iterable
+from semgrepl.table import ResultTable
+
+def location(x) -> Tuple[str, int, int, int, int]:
+    """ What makes two results the same in a ResultSet: where they are.
+    """
+    return (x.file_path, x.start_line, x.start_col, x.end_line, x.end_col)
+
+class ResultSet:
+    """ Results of one or more queries, combined as sets.
+
+        Results are the same if they're at the same location (see
+        `location`), whatever query or type they come from; when two are,
+        the one of the left operand is kept. Union, intersection and
+        difference are dict operations over locations computed once per
+        set, and the joins go through per-file indexes built on first use,
+        so combining sets takes about linear time.
+
+        A ResultSet isn't changed by operations, each returns a new one.
+    """
+    def __init__(self, objects: Iterable = ()):
+        self._index = {}
+        for x in objects:
+            self._index.setdefault(location(x), x)
+        self._by_file = None
+        self._spans = None
+
+    @classmethod
+    def _of(cls, index: Dict) -> 'ResultSet':
+        result = cls.__new__(cls)
+        result._index = index
+        result._by_file = None
+        result._spans = None
+        return result
+
+    def __repr__(self):
+        return "<ResultSet results={} files={}>".format(len(self), len(self.files))
+
+    def __len__(self):
+        return len(self._index)
+
+    def __iter__(self):
+        return iter(self._index.values())
+
+    def __contains__(self, x) -> bool:
+        return location(x) in self._index
+
+    def to_list(self) -> List:
+        return list(self._index.values())
+
+    def to_table(self) -> ResultTable:
+        return ResultTable.from_results(self.to_list())
+
+    @staticmethod
+    def _set(other) -> 'ResultSet':
+        return other if isinstance(other, ResultSet) else ResultSet(other)
+
+    def union(self, *others) -> 'ResultSet':
+        index = dict(self._index)
+        for other in others:
+            for key, x in self._set(other)._index.items():
+                index.setdefault(key, x)
+        return self._of(index)
+
+    def intersection(self, *others) -> 'ResultSet':
+        others = [self._set(o)._index for o in others]
+        return self._of({k: x for k, x in self._index.items() if all(k in o for o in others)})
+
+    def difference(self, *others) -> 'ResultSet':
+        others = [self._set(o)._index for o in others]
+        return self._of({k: x for k, x in self._index.items() if not any(k in o for o in others)})
+
+    def symmetric_difference(self, other) -> 'ResultSet':
+        other = self._set(other)
+        return self.difference(other).union(other.difference(self))
+
+    __or__ = union
+    __and__ = intersection
+    __sub__ = difference
+    __xor__ = symmetric_difference
+
+    def filter(self, predicate: Callable) -> 'ResultSet':
+        return self._of({k: x for k, x in self._index.items() if predicate(x)})
+
+    @property
+    def files(self):
+        return set(self.by_file)
+
+    @property
+    def by_file(self) -> Dict[str, List]:
+        """ {file: results}, each file's sorted by position.
+        """
+        if self._by_file is None:
+            by_file = defaultdict(list)
+            for key, x in sorted(self._index.items(), key=lambda kx: kx[0]):
+                by_file[key[0]].append(x)
+            self._by_file = dict(by_file)
+        return self._by_file
+
+    def _file_spans(self) -> Dict[str, Tuple[List[int], List[int], List[int]]]:
+        """ file => (sorted start lines, running max of the ends, running
+            min of the ends from the back), for line range joins.
+        """
+        if self._spans is None:
+            self._spans = {}
+            for path, objects in self.by_file.items():
+                starts = [x.start_line for x in objects]
+                ends = [x.end_line for x in objects]
+                suffix_min = list(accumulate(reversed(ends), min))[::-1]
+                self._spans[path] = (starts, list(accumulate(ends, max)), suffix_min)
+        return self._spans
+
+    # Joins by file
+
+    def in_files_of(self, other) -> 'ResultSet':
+        """ Results in a file where `other` has a result, e.g. calls to
+            yaml.load in files that also import yaml.
+        """
+        files = self._set(other).by_file
+        return self.filter(lambda x: x.file_path in files)
+
+    def not_in_files_of(self, other) -> 'ResultSet':
+        files = self._set(other).by_file
+        return self.filter(lambda x: x.file_path not in files)
+
+    def join_file(self, other) -> List[Tuple[object, List]]:
+        """ (result, results of `other` in its file) pairs.
+        """
+        files = self._set(other).by_file
+        return [(x, files.get(x.file_path, [])) for x in self]
+
+    # Joins by line range
+
+    def _inside(self, other, x) -> bool:
+        spans = other._file_spans().get(x.file_path)
+        if spans is None:
+            return False
+        starts, max_ends, _ = spans
+        # Some result starting at or before x ends at or after it
+        i = bisect.bisect_right(starts, x.start_line)
+        return i > 0 and max_ends[i - 1] >= x.end_line
+
+    def _contains(self, other, x) -> bool:
+        spans = other._file_spans().get(x.file_path)
+        if spans is None:
+            return False
+        starts, _, min_ends = spans
+        # Some result starting at or after x ends at or before it
+        i = bisect.bisect_left(starts, x.start_line)
+        return i < len(starts) and min_ends[i] <= x.end_line
+
+    def inside(self, other) -> 'ResultSet':
+        """ Results within the lines of a result of `other`, e.g. calls
+            inside some set of function defs.
+        """
+        other = self._set(other)
+        return self.filter(lambda x: self._inside(other, x))
+
+    def not_inside(self, other) -> 'ResultSet':
+        other = self._set(other)
+        return self.filter(lambda x: not self._inside(other, x))
+
+    def containing(self, other) -> 'ResultSet':
+        """ Results whose lines hold a result of `other`, e.g. the defs
+            calling exec: defs.containing(calls_to_exec).
+        """
+        other = self._set(other)
+        return self.filter(lambda x: self._contains(other, x))
+
+    def not_containing(self, other) -> 'ResultSet':
+        other = self._set(other)
+        return self.filter(lambda x: not self._contains(other, x))
+
+    # Join by enclosing function
+
+    def join_enclosing(self, functions) -> List[Tuple[object, object]]:
+        """ (result, innermost of `functions` around it, or None) pairs, in
+            one sweep per file over both sets sorted by position.
+
+            To keep results in functions lacking a decorator, pass every def
+            and filter the pairs:
+
+                [c for c, f in calls.join_enclosing(defs) if f and "@login_required" not in f.annotations]
+        """
+        functions = self._set(functions)
+        enclosing = {}
+        for path, objects in self.by_file.items():
+            funcs = functions.by_file.get(path, [])
+            items = sorted([(f.start_line, -f.end_line, 0, i) for i, f in enumerate(funcs)]
+                           + [(x.start_line, -x.end_line, 1, i) for i, x in enumerate(objects)])
+            stack = []
+            for start, neg_end, is_result, i in items:
+                while stack and stack[-1][0] < start:
+                    stack.pop()
+                if is_result:
+                    x = objects[i]
+                    # The innermost open function that also covers its end
+                    f = next((funcs[j] for end, j in reversed(stack) if end >= x.end_line), None)
+                    enclosing[location(x)] = f
+                else:
+                    stack.append((-neg_end, i))
+        return [(x, enclosing[key]) for key, x in self._index.items()]
+
+    def group_by_enclosing(self, functions) -> List[Tuple[object, 'ResultSet']]:
+        """ (function, results it encloses) pairs; results outside every
+            function are grouped under None.
+        """
+        groups = defaultdict(dict)
+        for x, f in self.join_enclosing(functions):
+            groups[location(f) if f is not None else None][location(x)] = x
+        functions = self._set(functions)._index
+        return [(functions[k] if k is not None else None, self._of(v)) for k, v in groups.items()]
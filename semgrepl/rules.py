@@ -0,0 +1,101 @@
+import atexit
+import copy
+import functools
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+from typing import List, Dict, Tuple
+import yaml
+from jinja2 import Environment, FileSystemLoader
+from semgrepl.cache import atomic_write
+
+# Appended to every rule id when rules from several queries are merged into
+# one semgrep config, so matches can be routed back to the query that asked
+# for them. semgrep may prefix rule ids with the config path, so the tag has
+# to be at the end.
+QUERY_ID_SEP = "-semgrepl-q"
+
+# One Jinja2 environment per rules dir, so compiled templates are reused
+# (and recompiled when the template file changes)
+_environments = {}
+
+# Rendered and parsed rules templates kept, by template, template mtime
+# and template_vars. Old mtimes and one-off template_vars age out.
+PARSED_CACHE_SIZE = 256
+
+# Rendered semgrep configs are written here once per session
+_config_dir = None
+_config_dir_lock = threading.Lock()
+
+def _environment(lang_dir: str) -> Environment:
+    if lang_dir not in _environments:
+        _environments[lang_dir] = Environment(loader = FileSystemLoader(lang_dir), trim_blocks=True, lstrip_blocks=True)
+    return _environments[lang_dir]
+
+def render(rules_dir: str, lang: str, rules_yaml_file: str, template_vars: Dict = {}) -> str:
+    """ Render the Jinja2 template `rules_yaml_file` from `rules_dir/lang`.
+        Returns None if the language has no such rules file.
+    """
+    lang_dir = os.path.join(rules_dir, lang)
+    if not os.path.exists(os.path.join(lang_dir, rules_yaml_file)):
+        return None
+    template = _environment(lang_dir).get_template(rules_yaml_file)
+    return template.render(**template_vars)
+
+def load(rules_dir: str, lang: str, rules_yaml_file: str, template_vars: Dict = {}) -> List[Dict]:
+    """ Render a rules template and return its list of rule dicts.
+    """
+    path = os.path.join(rules_dir, lang, rules_yaml_file)
+    if not os.path.exists(path):
+        return None
+    rules = _parse(rules_dir, lang, rules_yaml_file, os.stat(path).st_mtime_ns,
+                   json.dumps(template_vars, sort_keys=True))
+    return copy.deepcopy(rules)
+
+@functools.lru_cache(maxsize=PARSED_CACHE_SIZE)
+def _parse(rules_dir: str, lang: str, rules_yaml_file: str, mtime_ns: int, template_vars: str) -> List[Dict]:
+    return yaml.safe_load(render(rules_dir, lang, rules_yaml_file, json.loads(template_vars)))['rules']
+
+def config_path(rules: List[Dict]) -> str:
+    """ Path of a semgrep config file holding `rules`.
+
+        semgrep only takes configs as file paths, so each distinct set of
+        rules is written once per session, named after its hash, and reused
+        by later runs.
+    """
+    rendered = json.dumps({"rules": rules}, sort_keys=True)
+    path = os.path.join(_session_dir(), hashlib.sha1(rendered.encode('utf-8')).hexdigest() + ".yaml")
+    if not os.path.exists(path):
+        # Written through a temporary file, so a concurrent query rendering
+        # the same rules never hands semgrep a partial config
+        with atomic_write(path) as f:
+            f.write(rendered)
+    return path
+
+def _session_dir() -> str:
+    global _config_dir
+    with _config_dir_lock:
+        if _config_dir is None:
+            _config_dir = tempfile.mkdtemp(prefix="semgrepl-")
+            atexit.register(shutil.rmtree, _config_dir, True)
+        return _config_dir
+
+def tag_rule(rule: Dict, query_index: int) -> Dict:
+    tagged = dict(rule)
+    tagged['id'] = "{}{}{}".format(rule['id'], QUERY_ID_SEP, query_index)
+    return tagged
+
+def untag_check_id(check_id: str) -> Tuple[str, int]:
+    """ Split a tagged rule id into (original id, query index).
+    """
+    check_id, index = check_id.rsplit(QUERY_ID_SEP, 1)
+    return check_id, int(index)
+
+def language_key(rule: Dict) -> str:
+    # Rules are grouped by the languages they declare rather than by the
+    # rules/ subdir they came from, so language-agnostic templates join the
+    # run of the language they actually target.
+    return ",".join(sorted(rule.get('languages', [])))
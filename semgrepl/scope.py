@@ -0,0 +1,42 @@
+import bisect
+import os
+from collections import defaultdict
+from itertools import accumulate
+from typing import List, Dict, Set
+
+class Scope:
+    """ The line ranges covered by earlier results (classes, function defs,
+        ...), to restrict a query to, e.g. the methods named `get` inside
+        classes named Handler.
+    """
+    def __init__(self, objects: List):
+        ranges = defaultdict(list)
+        for obj in objects:
+            ranges[os.path.abspath(obj.file_path)].append((obj.start_line, obj.end_line))
+        # path => (sorted range starts, running max of their ends). A line is
+        # in scope if a range starting at or before it ends at or after it.
+        self._ranges = {}
+        for path, spans in ranges.items():
+            spans.sort()
+            self._ranges[path] = ([s for s, _ in spans], list(accumulate((e for _, e in spans), max)))
+
+    def __repr__(self):
+        return "<Scope files={}>".format(len(self._ranges))
+
+    @property
+    def files(self) -> Set[str]:
+        return set(self._ranges)
+
+    def contains(self, path: str, line: int) -> bool:
+        ranges = self._ranges.get(os.path.abspath(path))
+        if ranges is None:
+            return False
+        starts, ends = ranges
+        i = bisect.bisect_right(starts, line)
+        return i > 0 and ends[i - 1] >= line
+
+    def filter_matches(self, matches: List[Dict]) -> List[Dict]:
+        return [m for m in matches if self.contains(m['path'], m['start']['line'])]
+
+    def filter(self, objects: List) -> List:
+        return [x for x in objects if self.contains(x.file_path, x.start_line)]
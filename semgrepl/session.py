@@ -0,0 +1,278 @@
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from typing import List, Dict, Tuple
+from semgrepl.abstract import *
+from semgrepl.snapshot import Snapshot
+
+# Bump when the tables change, so old session databases aren't reused
+SESSION_VERSION = 1
+
+# Triage tags from the workflow in main.py. Any other string works too.
+INTERESTING = "interesting"
+NOT_INTERESTING = "not interesting"
+REVIEW_LATER = "review later"
+
+# Table => the SemgreplObject class stored in it and the columns it adds to
+# the location
+TABLES = {
+    "imports": (SemgreplImport, ["import_path"]),
+    "function_calls": (SemgreplFunctionCall, ["name", "instance"]),
+    "function_defs": (SemgreplFunctionDef, ["name"]),
+    "classes": (SemgreplClass, ["name", "bases"]),
+    "strings": (SemgreplString, ["name"]),
+    "annotations": (SemgreplAnnotation, ["name"]),
+    "routes": (SemgreplRoute, ["path", "function_name", "app"]),
+    "sinks": (SemgreplSink, ["category"]),
+    "import_statements": (SemgreplImportStatement, ["imports"]),
+    "matches": (SemgreplMatch, ["rule_id", "message"]),
+}
+
+TABLE_OF = {cls: table for table, (cls, _) in TABLES.items()}
+
+# Columns holding lists, stored as JSON
+JSON_COLUMNS = {"bases", "imports"}
+
+LOCATION = ["file_path", "start_line", "start_col", "end_line", "end_col"]
+
+def session_path(cache_dir: str, targets: List[str], exclude_paths: List[str]) -> str:
+    h = hashlib.sha1(repr((SESSION_VERSION, sorted(targets), sorted(exclude_paths))).encode('utf-8'))
+    return os.path.join(cache_dir, "session-{}.sqlite3".format(h.hexdigest()))
+
+def query_name(query: Tuple[str, Dict]) -> str:
+    """ Default name of a query's results, e.g.
+        "function-calls.yaml function_name=exec".
+    """
+    rules_yaml_file, template_vars = query
+    return " ".join([rules_yaml_file] + ["{}={}".format(k, v) for k, v in sorted(template_vars.items())])
+
+def _encode(column: str, value):
+    return json.dumps(value) if column in JSON_COLUMNS else value
+
+def _decode(column: str, value):
+    if column not in JSON_COLUMNS:
+        return value
+    return [tuple(x) if isinstance(x, list) else x for x in json.loads(value)]
+
+class SessionStore:
+    """ Results and triage tags of a session, in SQLite, so they can be
+        reopened after a restart instead of recomputed, and filtered with
+        SQL instead of held in memory.
+
+        Each saved result list is a named result set; its objects go to the
+        table of their type (see TABLES), indexed by location and name.
+        Triage tags are kept by type and location, so they stick to a
+        finding across result sets and reruns of a query.
+    """
+    def __init__(self, path: str):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        # Used from the asyncio helpers' worker threads too
+        self.db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.lock = threading.RLock()
+        self.db.execute("PRAGMA foreign_keys = ON")
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS result_sets (
+                id INTEGER PRIMARY KEY,
+                name TEXT NOT NULL UNIQUE,
+                query TEXT,
+                snapshot BLOB,
+                created REAL NOT NULL
+            )""")
+        for table, (_, columns) in TABLES.items():
+            self.db.execute("""
+                CREATE TABLE IF NOT EXISTS {} (
+                    result_set INTEGER NOT NULL REFERENCES result_sets (id) ON DELETE CASCADE,
+                    file_path TEXT NOT NULL,
+                    start_line INTEGER NOT NULL,
+                    start_col INTEGER NOT NULL,
+                    end_line INTEGER NOT NULL,
+                    end_col INTEGER NOT NULL,
+                    {}
+                )""".format(table, ", ".join("{} TEXT".format(c) for c in columns)))
+            self.db.execute("CREATE INDEX IF NOT EXISTS {0}_result_set ON {0} (result_set)".format(table))
+            self.db.execute("CREATE INDEX IF NOT EXISTS {0}_location ON {0} (file_path, start_line)".format(table))
+            if "name" in columns:
+                self.db.execute("CREATE INDEX IF NOT EXISTS {0}_name ON {0} (name)".format(table))
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS tags (
+                kind TEXT NOT NULL,
+                file_path TEXT NOT NULL,
+                start_line INTEGER NOT NULL,
+                start_col INTEGER NOT NULL,
+                end_line INTEGER NOT NULL,
+                end_col INTEGER NOT NULL,
+                tag TEXT NOT NULL,
+                note TEXT NOT NULL DEFAULT '',
+                updated REAL NOT NULL,
+                PRIMARY KEY (kind, file_path, start_line, start_col, end_line, end_col, tag)
+            )""")
+        self.db.execute("CREATE INDEX IF NOT EXISTS tags_tag ON tags (tag)")
+        self.db.commit()
+
+    def __repr__(self):
+        return "<SessionStore path={} result_sets={}>".format(self.path, len(self.result_sets()))
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+    def save(self, results: SemgreplResults, name: str = None, snapshot: Snapshot = None) -> str:
+        """ Store `results` as the result set `name` (by default named after
+            its query), replacing any earlier one of that name. `snapshot` is
+            the state of the files the results are for, see main.saved().
+        """
+        if name is None:
+            name = query_name(results.query)
+        rows = {}
+        for x in results:
+            table = TABLE_OF.get(type(x))
+            if table is None:
+                raise ValueError("Can't store {} in a session".format(type(x).__name__))
+            rows.setdefault(table, []).append(
+                [getattr(x, c) for c in LOCATION] + [_encode(c, getattr(x, c)) for c in TABLES[table][1]])
+        query = json.dumps(results.query) if results.query is not None else None
+        with self.lock, self.db:
+            self.db.execute("DELETE FROM result_sets WHERE name = ?", (name,))
+            set_id = self.db.execute(
+                "INSERT INTO result_sets (name, query, snapshot, created) VALUES (?, ?, ?, ?)",
+                (name, query, pickle.dumps(snapshot) if snapshot is not None else None, time.time())).lastrowid
+            for table, table_rows in rows.items():
+                columns = LOCATION + TABLES[table][1]
+                self.db.executemany(
+                    "INSERT INTO {} (result_set, {}) VALUES (?, {})".format(
+                        table, ", ".join(columns), ", ".join("?" * len(columns))),
+                    [[set_id] + row for row in table_rows])
+        results.session_name = name
+        return name
+
+    def _result_set(self, name: str):
+        with self.lock:
+            row = self.db.execute("SELECT id, query, snapshot FROM result_sets WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            raise KeyError(name)
+        return row
+
+    def result_sets(self) -> List[str]:
+        with self.lock:
+            return [name for name, in self.db.execute("SELECT name FROM result_sets ORDER BY created")]
+
+    def __contains__(self, name: str) -> bool:
+        with self.lock:
+            return self.db.execute("SELECT 1 FROM result_sets WHERE name = ?", (name,)).fetchone() is not None
+
+    def delete(self, name: str):
+        with self.lock, self.db:
+            self.db.execute("DELETE FROM result_sets WHERE name = ?", (name,))
+
+    def snapshot(self, name: str) -> Snapshot:
+        data = self._result_set(name)[2]
+        return pickle.loads(data) if data is not None else None
+
+    def load(self, name: str) -> SemgreplResults:
+        """ The result set `name`, as it was saved.
+        """
+        set_id, query, _ = self._result_set(name)
+        objects = []
+        for table in TABLES:
+            objects.extend(self.select(table, "result_set = ?", (set_id,)))
+        objects.sort(key=lambda x: (x.file_path, x.start_line, x.start_col))
+        results = SemgreplResults(objects, _query(query))
+        results.session_name = name
+        return results
+
+    def select(self, table: str, where: str = "", params=(), result_set: str = None) -> SemgreplResults:
+        """ Objects of `table` matching an SQL condition, optionally only
+            from one result set, e.g.
+
+                session.select("function_calls", "name = ? AND file_path LIKE ?", ("exec", "%/api/%"))
+        """
+        cls, columns = TABLES[table]
+        conditions = [where] if where else []
+        params = list(params)
+        if result_set is not None:
+            conditions.append("result_set = ?")
+            params.append(self._result_set(result_set)[0])
+        sql = "SELECT {} FROM {}".format(", ".join(LOCATION + columns), table)
+        if conditions:
+            sql += " WHERE " + " AND ".join("({})".format(c) for c in conditions)
+        with self.lock:
+            rows = self.db.execute(sql, params).fetchall()
+        return SemgreplResults([self._object(cls, columns, row) for row in rows])
+
+    @staticmethod
+    def _object(cls, columns: List[str], row) -> SemgreplObject:
+        x = cls.__new__(cls)
+        for column, value in zip(LOCATION, row):
+            setattr(x, column, value)
+        for column, value in zip(columns, row[len(LOCATION):]):
+            setattr(x, column, _decode(column, value))
+        return x
+
+    def sql(self, query: str, params=()) -> List[Tuple]:
+        """ Rows of any SQL query over the tables (see TABLES, result_sets
+            and tags).
+        """
+        with self.lock:
+            return self.db.execute(query, params).fetchall()
+
+    def tag(self, objects, tag: str, note: str = ""):
+        """ Tag results, e.g. tag(calls, INTERESTING, "user input reaches it").
+        """
+        if isinstance(objects, SemgreplObject):
+            objects = [objects]
+        now = time.time()
+        rows = [[TABLE_OF[type(x)]] + [getattr(x, c) for c in LOCATION] + [tag, note, now] for x in objects]
+        with self.lock, self.db:
+            self.db.executemany("INSERT OR REPLACE INTO tags VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+    def untag(self, objects, tag: str = None):
+        """ Remove `tag` from results, or every tag if it's None.
+        """
+        if isinstance(objects, SemgreplObject):
+            objects = [objects]
+        rows = [[TABLE_OF[type(x)]] + [getattr(x, c) for c in LOCATION] for x in objects]
+        sql = "DELETE FROM tags WHERE kind = ? AND {}".format(" AND ".join("{} = ?".format(c) for c in LOCATION))
+        if tag is not None:
+            sql += " AND tag = ?"
+            rows = [row + [tag] for row in rows]
+        with self.lock, self.db:
+            self.db.executemany(sql, rows)
+
+    def tags(self, x: SemgreplObject) -> Dict[str, str]:
+        """ {tag: note} of one result.
+        """
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT tag, note FROM tags WHERE kind = ? AND {}".format(
+                    " AND ".join("{} = ?".format(c) for c in LOCATION)),
+                [TABLE_OF[type(x)]] + [getattr(x, c) for c in LOCATION]).fetchall()
+        return dict(rows)
+
+    def tagged(self, tag: str, table: str = None) -> SemgreplResults:
+        """ Saved results carrying `tag`, once each even if they're in
+            several result sets.
+        """
+        objects = []
+        for t in ([table] if table is not None else TABLES):
+            cls, columns = TABLES[t]
+            where = " AND ".join("t.{0} = tags.{0}".format(c) for c in LOCATION)
+            with self.lock:
+                rows = self.db.execute(
+                    "SELECT {} FROM {} t JOIN tags ON tags.kind = ? AND {} WHERE tags.tag = ? GROUP BY {}".format(
+                        ", ".join("t." + c for c in LOCATION + columns), t, where,
+                        ", ".join("t." + c for c in LOCATION)),
+                    (t, tag)).fetchall()
+            objects.extend(self._object(cls, columns, row) for row in rows)
+        return SemgreplResults(objects)
+
+def _query(data: str) -> Tuple[str, Dict]:
+    if data is None:
+        return None
+    rules_yaml_file, template_vars = json.loads(data)
+    return rules_yaml_file, template_vars
@@ -0,0 +1,84 @@
+import os
+import subprocess
+from typing import List, Dict, Set, Tuple
+import semgrepl.targets as targets
+
+def _git(target: str, *args) -> List[str]:
+    output = subprocess.check_output(['git', '-C', target] + list(args), stderr=subprocess.DEVNULL)
+    return [l for l in output.decode('utf-8').split("\n") if l]
+
+def git_head(target: str) -> str:
+    """ HEAD of the git checkout `target`, or None if it isn't one.
+    """
+    if not os.path.isdir(target):
+        return None
+    try:
+        return _git(target, 'rev-parse', 'HEAD')[0]
+    except (subprocess.CalledProcessError, FileNotFoundError, IndexError):
+        return None
+
+def _stat(path: str) -> Tuple[int, int]:
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+class Snapshot:
+    """ State of the files in a set of targets, to find out which files
+        changed since.
+
+        Plain directories are recorded as the mtime and size of every file.
+        For git checkouts only HEAD and the stats of the files that differ
+        from it are recorded, and git is asked what changed.
+    """
+    def __init__(self, stats: Dict[str, Tuple[int, int]], git_heads: Dict[str, str], exclude_paths: List[str]):
+        self.stats = stats
+        self.git_heads = git_heads
+        self.exclude_paths = exclude_paths
+
+    def __repr__(self):
+        return "<Snapshot files={} git_heads={}>".format(len(self.stats), self.git_heads)
+
+    @staticmethod
+    def _git_dirty(target: str, since: str) -> List[str]:
+        # Tracked files differing from `since` plus untracked files
+        paths = _git(target, 'diff', '--name-only', '--relative', since, '--', '.')
+        paths += _git(target, 'ls-files', '--others', '--exclude-standard')
+        return [os.path.join(target, p) for p in paths]
+
+    @staticmethod
+    def take(target_paths: List[str], exclude_paths: List[str] = []) -> 'Snapshot':
+        stats = {}
+        git_heads = {}
+        for target in target_paths:
+            head = git_head(target)
+            if head is not None:
+                git_heads[target] = head
+                paths = Snapshot._git_dirty(target, head)
+            else:
+                paths = targets.walk(target, exclude_paths)
+            for path in paths:
+                stats[path] = _stat(path)
+        return Snapshot(stats, git_heads, exclude_paths)
+
+    def changed_files(self, target_paths: List[str]) -> Set[str]:
+        """ Files added, modified or deleted since the snapshot was taken.
+        """
+        changed = set()
+        for target in target_paths:
+            previous = [p for p in self.stats if p == target or p.startswith(target + os.sep)]
+            head = self.git_heads.get(target)
+            if head is not None and git_head(target) is not None:
+                # Files that were dirty may since have been reverted to HEAD,
+                # files that weren't but differ from the old HEAD now changed
+                candidates = set(Snapshot._git_dirty(target, head)) | set(previous)
+            else:
+                candidates = set(targets.walk(target, self.exclude_paths)) | set(previous)
+
+            for path in candidates:
+                if targets.is_excluded(path, self.exclude_paths):
+                    continue
+                if path not in self.stats or _stat(path) != self.stats[path]:
+                    changed.add(path)
+        return changed
@@ -0,0 +1,98 @@
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict
+
+# Stages of a query, in the order they happen:
+#   render     Jinja rendering and YAML parsing of the rules
+#   prefilter  skipping files without the identifiers a query looks for
+#   cache      hashing target files, reading and writing the result cache
+#   write      writing the merged rules to a temporary semgrep config
+#   semgrep    semgrep itself: walking the targets, parsing and matching
+#   extract    queries answered in-process instead, e.g. string literals
+#   decode     parsing semgrep's JSON output
+#   build      turning matches into SemgreplObjects
+STAGES = ["render", "prefilter", "cache", "write", "semgrep", "extract", "decode", "build"]
+
+class QueryStats:
+    """ Time spent in each stage of one or more queries, plus counters
+        (files scanned, files served from the cache, matches, bytes of JSON,
+        objects built, semgrep runs).
+
+        Every timed stage is also kept as a span, so a run can be looked at
+        on a timeline with export_trace().
+    """
+    def __init__(self):
+        self.timings = defaultdict(float)
+        self.counters = defaultdict(int)
+        # (stage, wall clock start, duration, pid, thread id)
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        return {"timings": dict(self.timings), "counters": dict(self.counters), "spans": self.spans}
+
+    def __setstate__(self, state):
+        self.__init__()
+        self.timings.update(state["timings"])
+        self.counters.update(state["counters"])
+        self.spans = state["spans"]
+
+    def __repr__(self):
+        timings = ", ".join("{}={:.3f}s".format(s, self.timings[s]) for s in self._stages())
+        counters = ", ".join("{}={}".format(k, v) for k, v in sorted(self.counters.items()))
+        return "<QueryStats {}{}{}>".format(timings, "; " if timings and counters else "", counters)
+
+    def _stages(self):
+        return [s for s in STAGES if s in self.timings] + sorted(s for s in self.timings if s not in STAGES)
+
+    @contextmanager
+    def timer(self, stage: str):
+        start = time.time()
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, start, time.perf_counter() - t0)
+
+    def record(self, stage: str, start: float, duration: float):
+        with self._lock:
+            self.timings[stage] += duration
+            self.spans.append((stage, start, duration, os.getpid(), threading.get_ident()))
+
+    def count(self, counter: str, n: int = 1):
+        with self._lock:
+            self.counters[counter] += n
+
+    def merge(self, other: "QueryStats"):
+        with self._lock:
+            for stage, duration in other.timings.items():
+                self.timings[stage] += duration
+            for counter, n in other.counters.items():
+                self.counters[counter] += n
+            self.spans.extend(other.spans)
+
+    def reset(self):
+        with self._lock:
+            self.timings.clear()
+            self.counters.clear()
+            self.spans = []
+
+    def to_dict(self) -> Dict:
+        return {"timings": {s: self.timings[s] for s in self._stages()}, "counters": dict(self.counters)}
+
+    def to_trace(self) -> Dict:
+        """ The spans in Chrome's trace event format, which chrome://tracing
+            and https://ui.perfetto.dev open.
+        """
+        events = [{"name": stage, "cat": "semgrepl", "ph": "X", "ts": start * 1e6, "dur": duration * 1e6,
+                   "pid": pid, "tid": tid}
+                  for stage, start, duration, pid, tid in sorted(self.spans, key=lambda s: s[1])]
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def export_trace(self, path: str):
+        with open(path, 'w') as f:
+            json.dump(self.to_trace(), f)
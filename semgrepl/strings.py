@@ -0,0 +1,168 @@
+import ast
+import bisect
+import math
+import mmap
+import re
+import tokenize
+from collections import Counter
+from typing import List, Dict, Tuple
+
+_COMMENTS = rb'//[^\n]*|/\*.*?\*/|'
+_DOUBLE = rb'"(?:[^"\\\n]|\\.)*"'
+_SINGLE = rb"'(?:[^'\\\n]|\\.)*'"
+
+# Language key => regex for the languages not tokenized with Python's own
+# tokenizer. Group 1 of a match is a string literal, anything else (a
+# comment, or a char literal like Go's 'a') is skipped.
+PATTERNS = {
+    # "...", `raw`
+    "go": re.compile(_COMMENTS + _SINGLE + rb'|(' + _DOUBLE + rb'|`[^`]*`)', re.S),
+    # """text block""", "..."
+    "java": re.compile(_COMMENTS + _SINGLE + rb'|("""(?:[^\\]|\\.)*?"""|' + _DOUBLE + rb')', re.S),
+    # "...", '...', `template`
+    "javascript": re.compile(_COMMENTS + rb'(' + _DOUBLE + rb'|' + _SINGLE + rb'|`(?:[^`\\]|\\.)*`)', re.S),
+    # "...", '...'
+    "ruby": re.compile(rb'#[^\n]*|(' + _DOUBLE + rb'|' + _SINGLE + rb')'),
+}
+
+LANGUAGES = ["python"] + list(PATTERNS)
+
+# (start line, start col, end line, end col, source text), cols 1-based
+Literal = Tuple[int, int, int, int, str]
+
+# Python 3.12+ splits an f-string into several tokens, with the tokens of
+# its replacement fields (which may hold strings and f-strings) in between
+FSTRING_START = getattr(tokenize, "FSTRING_START", None)
+FSTRING_END = getattr(tokenize, "FSTRING_END", None)
+
+def _source(lines: List[bytes], encoding: str, start: Tuple[int, int], end: Tuple[int, int]) -> str:
+    text = [lines[row - 1].decode(encoding, 'replace') for row in range(start[0], end[0] + 1)]
+    text[-1] = text[-1][:end[1]]
+    text[0] = text[0][start[1]:]
+    return "".join(text)
+
+def _python_literals(m: mmap.mmap) -> List[Literal]:
+    found = []
+    lines = []
+
+    def readline():
+        line = m.readline()
+        lines.append(line)
+        return line
+
+    encoding = 'utf-8'
+    # Start tokens of the f-strings being read, outermost first. Only whole
+    # outermost f-strings are literals, like the single STRING token older
+    # Pythons make of them.
+    fstrings = []
+    try:
+        for tok in tokenize.tokenize(readline):
+            if tok.type == tokenize.ENCODING:
+                encoding = tok.string
+            elif tok.type == tokenize.STRING and not fstrings:
+                found.append((tok.start[0], tok.start[1] + 1, tok.end[0], tok.end[1] + 1, tok.string))
+            elif tok.type == FSTRING_START:
+                fstrings.append(tok)
+            elif tok.type == FSTRING_END and fstrings:
+                start = fstrings.pop()
+                if not fstrings:
+                    found.append((start.start[0], start.start[1] + 1, tok.end[0], tok.end[1] + 1,
+                                  _source(lines, encoding, start.start, tok.end)))
+    except (tokenize.TokenError, SyntaxError):
+        # Keep what was found before the file stopped making sense
+        pass
+    return found
+
+def _regex_literals(m: mmap.mmap, pattern) -> List[Literal]:
+    newlines = [nl.start() for nl in re.finditer(rb"\n", m)]
+
+    def position(offset):
+        line = bisect.bisect_left(newlines, offset)
+        return line + 1, offset - (newlines[line - 1] + 1 if line else 0) + 1
+
+    found = []
+    for match in pattern.finditer(m):
+        if match.group(1) is None:
+            continue
+        start_line, start_col = position(match.start(1))
+        end_line, end_col = position(match.end(1))
+        found.append((start_line, start_col, end_line, end_col, match.group(1).decode('utf-8', 'replace')))
+    return found
+
+def extract_file(path: str, language: str) -> List[Literal]:
+    """ String literals in one file, read through a memory map.
+    """
+    try:
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+            if language == "python":
+                return _python_literals(m)
+            return _regex_literals(m, PATTERNS[language])
+    except (OSError, ValueError):
+        # Unreadable, or empty (which can't be mapped)
+        return []
+
+def extract_files(files: List[Tuple[str, str]]) -> List[Tuple[str, List[Literal]]]:
+    """ extract_file for each (path, language), as one job of a process pool.
+    """
+    return [(path, extract_file(path, language)) for path, language in files]
+
+def to_match(path: str, literal: Literal) -> Dict:
+    """ A literal in the form of a semgrep match of rules/strings.yaml had
+        it been run, so it goes through the same pipeline as other queries.
+    """
+    start_line, start_col, end_line, end_col, text = literal
+    return {
+        "check_id": "strings",
+        "path": path,
+        "start": {"line": start_line, "col": start_col},
+        "end": {"line": end_line, "col": end_col},
+        "extra": {"metavars": {"$X": {"abstract_content": text}}},
+    }
+
+def unquote(text: str) -> str:
+    """ Value of a string literal's source text, e.g. '"a\\nb"' => 'a\nb'.
+    """
+    if text.startswith("`"):
+        return text[1:-1]
+    try:
+        value = ast.literal_eval(text)
+    except (ValueError, SyntaxError):
+        # f-strings, or escapes Python doesn't know
+        return text.lstrip("bBrRuUfF")[1:-1]
+    if isinstance(value, bytes):
+        return value.decode('latin-1')
+    return value if isinstance(value, str) else text
+
+def entropy(value: str) -> float:
+    """ Shannon entropy of `value` in bits per character. Random keys and
+        tokens score high (4+), words and identifiers low.
+    """
+    if not value:
+        return 0.0
+    n = len(value)
+    return -sum(c / n * math.log2(c / n) for c in Counter(value).values())
+
+class StringLiteral:
+    """ One distinct string value and every place it appears.
+    """
+    __slots__ = ('value', 'occurrences', 'entropy')
+
+    def __init__(self, value: str, occurrences: List):
+        self.value = value
+        self.occurrences = occurrences
+        self.entropy = entropy(value)
+
+    def __repr__(self):
+        return "<StringLiteral value={!r} count={} entropy={:.2f}>".format(self.value, self.count, self.entropy)
+
+    @property
+    def count(self) -> int:
+        return len(self.occurrences)
+
+    @property
+    def length(self) -> int:
+        return len(self.value)
+
+    @property
+    def files(self) -> List[str]:
+        return sorted({x.file_path for x in self.occurrences})
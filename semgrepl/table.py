@@ -0,0 +1,182 @@
+from typing import List, Dict, Tuple
+import numpy as np
+
+# Columns holding strings. They are stored dictionary encoded: an int32
+# code per row plus the list of distinct values, so grouping, counting and
+# comparing only ever touch integer arrays.
+INT_COLUMNS = ["start_line", "start_col", "end_line", "end_col"]
+
+class StringColumn:
+    def __init__(self, codes: np.ndarray, values: List[str]):
+        self.codes = codes
+        self.values = values
+        self._lookup = None
+
+    @staticmethod
+    def encode(strings) -> 'StringColumn':
+        lookup = {}
+        codes = np.fromiter((lookup.setdefault(s, len(lookup)) for s in strings), dtype=np.int32)
+        return StringColumn(codes, list(lookup))
+
+    def code(self, value: str) -> int:
+        """ Code of `value`, or -1 if it never occurs.
+        """
+        if self._lookup is None:
+            self._lookup = {v: i for i, v in enumerate(self.values)}
+        return self._lookup.get(value, -1)
+
+    def take(self, rows: np.ndarray) -> 'StringColumn':
+        return StringColumn(self.codes[rows], self.values)
+
+    def recode(self, values: List[str]) -> np.ndarray:
+        """ This column's codes translated into codes of `values`, -1 where
+            a value doesn't occur in `values`.
+        """
+        lookup = {v: i for i, v in enumerate(values)}
+        mapping = np.array([lookup.get(v, -1) for v in self.values] or [-1], dtype=np.int32)
+        return mapping[self.codes]
+
+    def decode(self) -> np.ndarray:
+        return np.array(self.values, dtype=object)[self.codes] if len(self.codes) else np.array([], dtype=object)
+
+class ResultTable:
+    """ Query results stored column-wise, for summarizing big result sets
+        with array operations instead of Python loops:
+
+            table = sm.function_calls(config).to_table()
+            table.counts("name")
+            table.where(name="exec").counts("file_path")
+
+        Columns are kind, file_path, name (the object's key), instance,
+        start_line, start_col, end_line and end_col. The objects each row came
+        from are available as `table.objects`.
+    """
+    def __init__(self, columns: Dict, objects: List = None):
+        self.columns = columns
+        self.objects = objects
+
+    @staticmethod
+    def from_results(results: List) -> 'ResultTable':
+        columns = {
+            "kind": StringColumn.encode(type(x).__name__ for x in results),
+            "file_path": StringColumn.encode(x.file_path for x in results),
+            "name": StringColumn.encode(x.key for x in results),
+            "instance": StringColumn.encode(getattr(x, "instance", None) for x in results),
+        }
+        for column in INT_COLUMNS:
+            columns[column] = np.fromiter((getattr(x, column) for x in results), dtype=np.int64, count=len(results))
+        return ResultTable(columns, list(results))
+
+    def __len__(self):
+        return len(self.columns["start_line"])
+
+    def __repr__(self):
+        return "<ResultTable rows={}>".format(len(self))
+
+    def column(self, name: str) -> np.ndarray:
+        column = self.columns[name]
+        return column.decode() if isinstance(column, StringColumn) else column
+
+    def take(self, rows: np.ndarray) -> 'ResultTable':
+        columns = {name: column.take(rows) if isinstance(column, StringColumn) else column[rows]
+                   for name, column in self.columns.items()}
+        objects = [self.objects[i] for i in rows] if self.objects is not None else None
+        return ResultTable(columns, objects)
+
+    def filter(self, mask: np.ndarray) -> 'ResultTable':
+        return self.take(np.flatnonzero(mask))
+
+    def mask(self, **equals) -> np.ndarray:
+        """ Boolean mask of the rows where every column equals the given value
+            (or any of the given values, for lists/sets/tuples).
+        """
+        mask = np.ones(len(self), dtype=bool)
+        for name, value in equals.items():
+            column = self.columns[name]
+            values = value if isinstance(value, (list, set, tuple)) else [value]
+            if isinstance(column, StringColumn):
+                mask &= np.isin(column.codes, [column.code(v) for v in values])
+            else:
+                mask &= np.isin(column, list(values))
+        return mask
+
+    def where(self, **equals) -> 'ResultTable':
+        """ e.g. table.where(name="exec", kind="SemgreplFunctionCall")
+        """
+        return self.filter(self.mask(**equals))
+
+    def counts(self, by: str = "name") -> Dict[str, int]:
+        """ {value: number of rows}, most frequent first.
+        """
+        column = self.columns[by]
+        if isinstance(column, StringColumn):
+            counts = np.bincount(column.codes, minlength=len(column.values))
+            values = column.values
+        else:
+            values, counts = np.unique(column, return_counts=True)
+            values = values.tolist()
+        order = np.argsort(-counts, kind="stable")
+        return {values[i]: int(counts[i]) for i in order if counts[i] > 0}
+
+    def group_by(self, by: str = "name") -> Dict[str, np.ndarray]:
+        """ {value: indexes of the rows holding it}
+        """
+        column = self.columns[by]
+        keys = column.codes if isinstance(column, StringColumn) else column
+        order = np.argsort(keys, kind="stable")
+        sorted_keys = keys[order]
+        boundaries = np.flatnonzero(np.diff(sorted_keys)) + 1
+        groups = np.split(order, boundaries) if len(order) else []
+        if isinstance(column, StringColumn):
+            return {column.values[keys[g[0]]]: g for g in groups}
+        return {keys[g[0]].item(): g for g in groups}
+
+    def _key_codes(self, on: Tuple[str], other: 'ResultTable') -> Tuple[np.ndarray, np.ndarray]:
+        """ One int64 key per row of self and of other, equal where all the
+            `on` columns are equal.
+        """
+        left = np.zeros(len(self), dtype=np.int64)
+        right = np.zeros(len(other), dtype=np.int64)
+        for name in on:
+            lcol, rcol = self.columns[name], other.columns[name]
+            if isinstance(lcol, StringColumn):
+                # Shifted by one so values missing on the left get code 0,
+                # which no left row has
+                lcodes = lcol.codes.astype(np.int64) + 1
+                rcodes = rcol.recode(lcol.values).astype(np.int64) + 1
+                width = len(lcol.values) + 1
+            else:
+                values, inverse = np.unique(np.concatenate([lcol, rcol]), return_inverse=True)
+                lcodes, rcodes, width = inverse[:len(lcol)], inverse[len(lcol):], len(values)
+            left = left * width + lcodes
+            right = right * width + rcodes
+        return left, right
+
+    def join(self, other: 'ResultTable', on=("file_path",)) -> Tuple[np.ndarray, np.ndarray]:
+        """ Inner join on the `on` columns. Returns (left rows, right rows):
+            matching pairs of row indexes into self and other.
+        """
+        left, right = self._key_codes(tuple(on), other)
+        order = np.argsort(right, kind="stable")
+        sorted_right = right[order]
+        lo = np.searchsorted(sorted_right, left, side="left")
+        hi = np.searchsorted(sorted_right, left, side="right")
+        counts = hi - lo
+        left_rows = np.repeat(np.arange(len(self)), counts)
+        # For each left row, the positions lo..hi in sorted_right
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        right_rows = order[np.repeat(lo, counts) + offsets]
+        return left_rows, right_rows
+
+    def to_dataframe(self):
+        """ The table as a pandas DataFrame (pandas must be installed).
+        """
+        import pandas as pd
+        data = {}
+        for name, column in self.columns.items():
+            if isinstance(column, StringColumn):
+                data[name] = pd.Categorical.from_codes(column.codes, categories=pd.Index(column.values, dtype=object)) \
+                    if None not in column.values else column.decode()
+            else:
+                data[name] = column
+        return pd.DataFrame(data)
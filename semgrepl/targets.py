@@ -0,0 +1,47 @@
+import os
+from fnmatch import fnmatch
+from typing import List, Iterator
+
+# Other names rules use for languages
+LANGUAGE_ALIASES = {
+    "golang": "go",
+    "py": "python",
+    "js": "javascript",
+    "rb": "ruby",
+}
+
+# Never worth descending into
+SKIP_DIRS = {".git", ".hg", ".svn"}
+
+def canonical_language(lang: str) -> str:
+    lang = lang.lower()
+    return LANGUAGE_ALIASES.get(lang, lang)
+
+def is_excluded(path: str, exclude_paths: List[str]) -> bool:
+    """ Mirrors semgrep's --exclude: a pattern excludes a path if it matches
+        the path itself or any of its components.
+    """
+    parts = path.split(os.sep)
+    for pattern in exclude_paths:
+        if fnmatch(path, pattern) or any(fnmatch(p, pattern) for p in parts):
+            return True
+    return False
+
+def walk(target: str, exclude_paths: List[str] = []) -> Iterator[str]:
+    """ Yield every file under `target` (which may itself be a file).
+    """
+    if not os.path.isdir(target):
+        if os.path.isfile(target) and not is_excluded(target, exclude_paths):
+            yield target
+        return
+    stack = [target]
+    while stack:
+        with os.scandir(stack.pop()) as it:
+            for entry in it:
+                if is_excluded(entry.path, exclude_paths):
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name not in SKIP_DIRS:
+                        stack.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    yield entry.path
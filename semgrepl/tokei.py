@@ -1,7 +1,7 @@
 import json
 import os
 import subprocess
-from typing import Dict
+from typing import List, Dict
 
 class TokeiOutput:
     def __init__(self, data: Dict[str, str], repo_path):
@@ -35,12 +35,17 @@ class TokeiOutput:
         pass
 
 class TokeiLanguageInfo:
-    def __init__(self, tokei_dict: Dict[str, int], repo_path: str):
+    def __init__(self, tokei_dict: Dict[str, int], repo_path: str, files: List[str] = None, paths: List[str] = None):
         self.blanks = tokei_dict['blanks']
         self.code = tokei_dict['code']
         self.comments = tokei_dict['comments']
-        self.files = [Tokei.relative_path(repo_path, x['name']) for x in
-                         tokei_dict['reports']]
+        # `files` are relative to the repo's parent dir, `paths` as reported
+        if paths is None:
+            paths = [x['name'] for x in tokei_dict['reports']]
+        self.paths = paths
+        if files is None:
+            files = [Tokei.relative_path(repo_path, x) for x in paths]
+        self.files = files
 
 
     def __repr__(self):
@@ -0,0 +1,143 @@
+import atexit
+import os
+import queue
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from multiprocessing.connection import Listener, Client
+from typing import List, Dict
+from semgrepl.stats import QueryStats
+
+# How long to wait for a new worker to start listening
+START_TIMEOUT = 30
+
+def _serve(address: str, authkey: bytes):
+    """ Worker process main loop: import semgrep once, then run every
+        semgrep_pattern request sent over the socket.
+    """
+    import semgrepl.main
+    with Listener(address, family='AF_UNIX', authkey=authkey) as listener:
+        while True:
+            with listener.accept() as conn:
+                while True:
+                    try:
+                        request = conn.recv()
+                    except EOFError:
+                        break
+                    if request is None:
+                        return
+                    try:
+                        stats = QueryStats()
+                        output = semgrepl.main.semgrep_pattern(*request, stats=stats)
+                        conn.send(("ok", (output, stats)))
+                    except Exception as e:
+                        conn.send(("error", "{}: {}".format(type(e).__name__, e)))
+
+class SemgrepWorker:
+    """ A background process with semgrep already imported, which runs
+        semgrep_pattern calls sent to it over a local socket.
+    """
+    def __init__(self):
+        self._dir = tempfile.mkdtemp(prefix="semgrepl-worker-")
+        self.address = os.path.join(self._dir, "worker.sock")
+        self._authkey = os.urandom(32)
+        self.process = None
+        self.conn = None
+        self.start()
+
+    def __repr__(self):
+        return "<SemgrepWorker pid={}>".format(self.process.pid if self.process else None)
+
+    def start(self):
+        # A fresh interpreter rather than a fork, so the worker doesn't
+        # inherit the REPL's threads and memory. It finds semgrepl the same
+        # way this process did.
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(p for p in sys.path if p))
+        self.process = subprocess.Popen([sys.executable, "-m", "semgrepl.worker", self.address],
+                                        stdin=subprocess.PIPE, env=env)
+        self.process.stdin.write(self._authkey.hex().encode('ascii'))
+        self.process.stdin.close()
+        deadline = time.time() + START_TIMEOUT
+        while True:
+            try:
+                self.conn = Client(self.address, family='AF_UNIX', authkey=self._authkey)
+                return
+            except (FileNotFoundError, ConnectionRefusedError):
+                if time.time() > deadline or self.process.poll() is not None:
+                    raise Exception("semgrep worker failed to start")
+                time.sleep(0.05)
+
+    def run(self, pattern: str, targets: List[str], exclude_paths: List, config: str,
+            stats: QueryStats = None) -> Dict:
+        self.conn.send((pattern, targets, exclude_paths, config))
+        status, result = self.conn.recv()
+        if status != "ok":
+            raise Exception("semgrep worker: " + result)
+        output, worker_stats = result
+        if stats is not None:
+            stats.merge(worker_stats)
+        return output
+
+    def kill(self):
+        # Process first, so a run waiting on the connection sees it close
+        if self.process is not None:
+            self.process.kill()
+            self.process.wait()
+            self.process = None
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+        if os.path.exists(self.address):
+            os.unlink(self.address)
+
+    def restart(self):
+        """ Kill the worker, even mid-run, and start a fresh one.
+        """
+        self.kill()
+        self.start()
+
+    def stop(self):
+        if self.conn is not None:
+            try:
+                self.conn.send(None)
+            except OSError:
+                pass
+        self.kill()
+        shutil.rmtree(self._dir, ignore_errors=True)
+
+class WorkerPool:
+    """ A fixed set of SemgrepWorkers. Each run is handed to an idle one.
+    """
+    def __init__(self, size: int):
+        self.workers = [SemgrepWorker() for _ in range(max(1, size))]
+        self._idle = queue.Queue()
+        for w in self.workers:
+            self._idle.put(w)
+        atexit.register(self.stop)
+
+    def __repr__(self):
+        return "<WorkerPool workers={}>".format(len(self.workers))
+
+    def acquire(self) -> SemgrepWorker:
+        return self._idle.get()
+
+    def release(self, worker: SemgrepWorker):
+        self._idle.put(worker)
+
+    def run(self, pattern: str, targets: List[str], exclude_paths: List, config: str,
+            stats: QueryStats = None) -> Dict:
+        worker = self.acquire()
+        try:
+            return worker.run(pattern, targets, exclude_paths, config, stats)
+        finally:
+            self.release(worker)
+
+    def stop(self):
+        atexit.unregister(self.stop)
+        for w in self.workers:
+            w.stop()
+
+if __name__ == "__main__":
+    _serve(sys.argv[1], bytes.fromhex(sys.stdin.read()))
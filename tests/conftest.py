@@ -0,0 +1,26 @@
+import pytest
+from semgrepl.config import SemgreplConfig
+
+@pytest.fixture(autouse=True)
+def cache_home(tmp_path_factory, monkeypatch):
+    """ Give every test an empty default cache dir, so tests don't write to
+        ~/.cache or depend on what earlier runs left there.
+    """
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path_factory.mktemp("cache")))
+
+@pytest.fixture(autouse=True)
+def close_configs(monkeypatch):
+    """ Close every config a test creates once it's done, so process pools,
+        caches and sessions don't outlive the test.
+    """
+    configs = []
+    init = SemgreplConfig.__init__
+
+    def tracked(self, *args, **kwargs):
+        init(self, *args, **kwargs)
+        configs.append(self)
+
+    monkeypatch.setattr(SemgreplConfig, "__init__", tracked)
+    yield
+    for config in configs:
+        config.close()
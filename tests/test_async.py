@@ -0,0 +1,20 @@
+import asyncio
+import pytest
+import semgrepl.main as sm
+
+def test_python_async_gather():
+    config = sm.init("tests/testcases/python/function_calls/simple.py")
+
+    async def run():
+        return await asyncio.gather(sm.afunction_defs(config), sm.afunction_calls(config))
+
+    defs, calls = asyncio.run(run())
+    assert sorted(d.name for d in defs) == ["bar", "foo"]
+    assert [c.name for c in calls] == ["bar"]
+
+def test_async_semgrep_error(tmp_path):
+    with pytest.raises(sm.SemgrepError) as e:
+        asyncio.run(sm._arun_rules(str(tmp_path / "missing.yaml"),
+                                   ["tests/testcases/python/function_calls/simple.py"], []))
+    assert e.value.returncode != 0
+    assert "missing.yaml" in e.value.stderr
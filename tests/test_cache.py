@@ -0,0 +1,45 @@
+import shutil
+import semgrepl.cache
+import semgrepl.main as sm
+from semgrepl.config import SemgreplConfig
+
+def test_python_cache_changed_file(tmp_path):
+    target = tmp_path / "simple.py"
+    shutil.copy("tests/testcases/python/function_defs/simple.py", str(target))
+    config = SemgreplConfig([str(target)], sm.DEFAULT_RULES_DIR, cache_dir=str(tmp_path / "cache"))
+
+    assert [d.name for d in sm.function_defs(config)] == ["foo"]
+    assert [d.name for d in sm.function_defs(config)] == ["foo"]
+
+    target.write_text("def foo():\n    pass\n\ndef bar():\n    pass\n")
+    assert sorted(d.name for d in sm.function_defs(config)) == ["bar", "foo"]
+
+def test_python_cache_clear(tmp_path):
+    config = SemgreplConfig(["tests/testcases/python/function_defs/simple.py"], sm.DEFAULT_RULES_DIR,
+                            cache_dir=str(tmp_path))
+    sm.function_defs(config)
+    assert config.cache.size > 0
+    config.clear_cache()
+    assert config.cache.size == 0
+
+def test_cache_get_many(tmp_path, monkeypatch):
+    monkeypatch.setattr(semgrepl.cache, "LOOKUP_CHUNK", 2)
+    cache = semgrepl.cache.ResultCache(str(tmp_path))
+    cache.put_many([("k", "/a.py", "1", [{"a": 1}]), ("k", "/b.py", "2", []), ("k", "/c.py", "3", []),
+                    ("other", "/a.py", "1", [])])
+    hits = cache.get_many("k", {"/a.py": "1", "/b.py": "changed", "/c.py": "3", "/d.py": "4"})
+    assert hits == {"/a.py": [{"a": 1}], "/c.py": []}
+
+def test_cache_default_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    config = SemgreplConfig(["tests/testcases/python/function_defs/simple.py"], sm.DEFAULT_RULES_DIR)
+    assert config.cache.path == str(tmp_path / "semgrepl" / "results.sqlite3")
+
+def test_file_hash_memo(tmp_path):
+    path = tmp_path / "a.py"
+    path.write_text("a = 1\n")
+    before = semgrepl.cache.file_hash(str(path))
+    assert semgrepl.cache.file_hash(str(path)) == before
+    path.write_text("a = 22\n")
+    assert semgrepl.cache.file_hash(str(path)) != before
+    assert semgrepl.cache._hash.cache_info().maxsize == semgrepl.cache.HASH_MEMO_SIZE
@@ -0,0 +1,23 @@
+import semgrepl.main as sm
+from semgrepl.config import SemgreplConfig
+
+def test_python_call_graph_callers():
+    config = SemgreplConfig(["tests/testcases/python/call_graph/simple.py"], sm.DEFAULT_RULES_DIR, cache_dir=None)
+    graph = sm.call_graph(config)
+    assert [f.name for f in graph.callers_of("exec")] == ["run"]
+    assert sorted(f.name for f in graph.callers_of("run")) == ["handle", "unused"]
+    assert sorted(f.name for f in graph.callers_of("exec", depth=None)) == ["handle", "main", "run", "unused"]
+
+def test_python_call_graph_paths():
+    config = SemgreplConfig(["tests/testcases/python/call_graph/simple.py"], sm.DEFAULT_RULES_DIR, cache_dir=None)
+    graph = sm.call_graph(config)
+    paths = graph.paths_to(["main"], "exec")
+    assert [[f.name for f in path] for path in paths] == [["main", "handle", "run"]]
+    assert [f.name for f in graph.reachable("main")] == ["main", "handle", "run"]
+
+def test_python_call_graph_dotted_calls():
+    config = SemgreplConfig(["tests/testcases/python/call_graph/dotted.py"], sm.DEFAULT_RULES_DIR, cache_dir=None)
+    graph = sm.call_graph(config)
+    assert [f.name for f in graph.callees_of("get")] == ["helper"]
+    assert [f.name for f in graph.callers_of("os.system")] == ["helper"]
+    assert [[f.name for f in path] for path in graph.paths_to(["main"], "system")] == [["main", "get", "helper"]]
@@ -0,0 +1,29 @@
+import semgrepl.main as sm
+
+def test_python_class_hierarchy():
+    config = sm.init("tests/testcases/python/class_hierarchy/simple.py")
+    sm.build_index(config, rebuild=True)
+    hierarchy = sm.class_hierarchy(config)
+
+    assert [c.bases for c in hierarchy.classes if c.name == "AdminLoginHandler"] == [["LoginHandler", "Mixin"]]
+    assert [c.name for c in hierarchy.subclasses_of("RequestHandler")] == [
+        "BaseHandler", "LoginHandler", "AdminLoginHandler"]
+    assert [c.name for c in hierarchy.subclasses_of("BaseHandler", transitive=False)] == ["LoginHandler"]
+    assert [c.name for c in hierarchy.superclasses_of("AdminLoginHandler")] == ["LoginHandler", "BaseHandler"]
+    assert hierarchy.subclasses_of("Unrelated") == []
+
+    assert [m.name for m in hierarchy.methods_of("LoginHandler")] == ["get"]
+    assert [m.name for m in hierarchy.methods_of("Form")] == ["validate"]
+    assert sorted((m.name, m.start_line) for m in hierarchy.methods_of("AdminLoginHandler", inherited=True)) == [
+        ("get", 13), ("post", 24), ("prepare", 5)]
+
+def test_python_class_hierarchy_import_styles():
+    config = sm.init("tests/testcases/python/class_hierarchy/import_styles.py")
+    sm.build_index(config, rebuild=True)
+    hierarchy = sm.class_hierarchy(config)
+
+    tornado = ["Full", "Module", "Bare"]
+    assert [c.name for c in hierarchy.subclasses_of("tornado.web.RequestHandler")] == tornado
+    assert [c.name for c in hierarchy.subclasses_of("web.RequestHandler")] == tornado
+    assert [c.name for c in hierarchy.subclasses_of("RequestHandler")] == tornado + ["Other"]
+    assert [c.name for c in hierarchy.subclasses_of("django.RequestHandler")] == ["Bare", "Other"]
@@ -0,0 +1,43 @@
+import threading
+import semgrepl.main as sm
+from semgrepl import detect
+
+def test_detect_languages():
+    output = detect.detect("tests/testcases")
+    assert sorted(output.language_names) == ["Go", "Java", "JavaScript", "Python"]
+    assert "testcases/python/imports/simple.py" in output.data["Python"].files
+
+def test_detect_shebang(tmp_path):
+    script = tmp_path / "run"
+    script.write_text("#!/usr/bin/env python3\nprint('hi')\n")
+    assert detect.language_of(str(script)) == "Python"
+
+def test_detect_background():
+    config = sm.init("tests/testcases/go", background=True)
+    assert config.languages == ["go"]
+
+def test_manifest():
+    config = sm.init("tests/testcases")
+    assert config.language_files("golang") == [config.targets[0] + "/go/imports/simple.go",
+                                               config.targets[0] + "/go/strings/main.go"]
+    assert config.language_files("python") == sorted(config.manifest["python"])
+    assert config.language_files("cobol") is None
+
+def test_manifest_new_file(tmp_path):
+    (tmp_path / "a.py").write_text("def foo():\n    pass\n")
+    config = sm.init(str(tmp_path))
+    (tmp_path / "b.py").write_text("def bar():\n    pass\n")
+    defs = sm.function_defs(config)
+    assert sorted(d.name for d in defs) == ["bar", "foo"]
+    assert str(tmp_path / "b.py") in config.language_files("python")
+
+def test_detect_cache_concurrent(tmp_path):
+    threads = [threading.Thread(target=detect.detect, args=("tests/testcases/go", [], str(tmp_path)))
+               for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    # One cache file, no temporary files left behind
+    cache_file = detect._cache_file(str(tmp_path), "tests/testcases/go", [])
+    assert [str(p) for p in tmp_path.iterdir()] == [cache_file]
@@ -0,0 +1,59 @@
+import json
+import semgrepl.fleet
+import semgrepl.main as sm
+
+def _repos(tmp_path):
+    repos = tmp_path / "repos"
+    if not repos.exists():
+        (repos / "small").mkdir(parents=True)
+        (repos / "small" / "a.py").write_text("import os\n\ndef foo():\n    pass\n")
+        (repos / "big").mkdir()
+        (repos / "big" / "a.py").write_text("".join("def f{}():\n    pass\n\n".format(i) for i in range(20)))
+        (repos / "big" / "b.py").write_text("import sys\nimport json\n")
+    return str(repos / "*")
+
+def _scan(tmp_path, queries):
+    return sm.fleet_scan(_repos(tmp_path), queries, str(tmp_path / "fleet.sqlite3"), concurrency=2, cache_dir=None)
+
+def test_python_fleet_scan(tmp_path):
+    fleet = _scan(tmp_path, ["imports.yaml", "function-defs.yaml"])
+    assert len(fleet.units()) == 4
+
+    defs = fleet.results("function-defs.yaml")
+    assert len(defs[str(tmp_path / "repos" / "big")]) == 20
+    assert [d.name for d in defs[str(tmp_path / "repos" / "small")]] == ["foo"]
+    imports = fleet.results("imports.yaml")
+    assert sorted(i.import_path for i in imports[str(tmp_path / "repos" / "big")]) == ["json", "sys"]
+
+def test_python_fleet_plan_largest_first(tmp_path):
+    _repos(tmp_path)
+    repos = [str(tmp_path / "repos" / "small"), str(tmp_path / "repos" / "big")]
+    languages_used = {r: next(iter(sm.init(r).languages_used.values())) for r in repos}
+    units = semgrepl.fleet.plan(languages_used, [("imports.yaml", {})], ["python"])
+    assert [u.repo for u in units] == [repos[1], repos[0]]
+
+def test_python_fleet_scan_resumes(tmp_path):
+    fleet = _scan(tmp_path, ["imports.yaml", "function-defs.yaml"])
+    before = dict(fleet.session.sql("SELECT name, created FROM result_sets"))
+    # As if the scan had been interrupted before this unit finished
+    lost = sorted(before)[0]
+    fleet.session.delete(lost)
+    fleet.close()
+
+    fleet = _scan(tmp_path, ["imports.yaml", "function-defs.yaml"])
+    after = dict(fleet.session.sql("SELECT name, created FROM result_sets"))
+    assert set(after) == set(before)
+    assert [name for name in after if after[name] != before[name]] == [lost]
+
+def test_python_fleet_scan_reruns_changed_repos(tmp_path):
+    fleet = _scan(tmp_path, ["function-defs.yaml"])
+    before = dict(fleet.session.sql("SELECT name, created FROM result_sets"))
+    fleet.close()
+    (tmp_path / "repos" / "small" / "b.py").write_text("def bar():\n    pass\n")
+
+    fleet = _scan(tmp_path, ["function-defs.yaml"])
+    after = dict(fleet.session.sql("SELECT name, created FROM result_sets"))
+    assert [json.loads(name)[0] for name in after if after[name] != before[name]] == [
+        str(tmp_path / "repos" / "small")]
+    defs = fleet.results("function-defs.yaml")[str(tmp_path / "repos" / "small")]
+    assert sorted(d.name for d in defs) == ["bar", "foo"]
@@ -1,3 +1,5 @@
+import linecache
+import sys
 import semgrepl.main as sm
 
 def test_python_function_defs_simple():
@@ -17,3 +19,26 @@ def test_python_function_defs_annotations():
     defs = sm.all_function_defs(config)
     assert len(defs[0].annotations) == 1
     assert defs[0].annotations[0] == "@my_decorator"
+
+def test_python_function_defs_compact():
+    config = sm.init("tests/testcases/python/function_defs/annotations.py")
+    d = sm.function_defs(config)[0]
+    # Only the location and name are kept, the rest is derived or read back
+    assert not hasattr(d, "__dict__") and not hasattr(d, "match")
+    assert d.name is sys.intern("annotated")
+    assert d.start == {"line": d.start_line, "col": d.start_col}
+    assert d.end == {"line": 3, "col": d.end_col}
+    assert d.location == "{}:{}".format(d.file_path, d.start_line)
+    assert "def annotated():" in d.lines and d.lines.endswith("pass")
+    assert d.annotations == ["@my_decorator"]
+
+def test_python_function_defs_lines_not_cached(tmp_path):
+    path = tmp_path / "big.py"
+    path.write_text("X = 1\n" * 10000 + "@my_decorator\ndef last():\n    pass\n")
+    d = sm.function_defs(sm.init(str(path)))[0]
+    assert d.lines.startswith("def last():") and d.annotations == ["@my_decorator"]
+    # Read from disk on demand: neither the result nor a process-wide
+    # cache holds on to the file
+    assert str(path) not in linecache.cache
+    path.write_text("")
+    assert d.lines == "" and d.annotations == []
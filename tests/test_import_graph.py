@@ -0,0 +1,45 @@
+import os
+import semgrepl.main as sm
+
+ROOT = os.path.abspath("tests/testcases/python/import_graph")
+
+def _rel(paths):
+    return [os.path.relpath(p, ROOT) if os.path.isabs(p) else p for p in paths]
+
+def test_python_import_graph():
+    config = sm.init(ROOT)
+    graph = sm.import_graph(config)
+
+    assert _rel(graph.imports_of(os.path.join(ROOT, "app/handlers/users.py"))) == [
+        "app/handlers/base.py", "requests"]
+    assert _rel(graph.imports_of("app.models")) == ["app/handlers/base.py", "pickle"]
+    assert graph.external == {"os", "pickle", "requests", "sys"}
+
+    assert _rel(graph.importers_of("pickle", transitive=False)) == ["app/models.py"]
+    assert _rel(graph.importers_of("pickle")) == [
+        "app/models.py", "app/__init__.py", "app/handlers/base.py", "app/handlers/users.py", "main.py"]
+
+    assert [_rel(c) for c in graph.cycles()] == [["app/handlers/base.py", "app/models.py"]]
+    assert graph.fan_in[os.path.join(ROOT, "app/models.py")] == 2
+    assert graph.fan_out[os.path.join(ROOT, "main.py")] == 2
+
+def test_python_import_statements():
+    config = sm.init("tests/testcases/python/import_statements/odd.py")
+    statements = sm.run_many(config, ["import-statements.yaml"])[0]
+    assert [(s.start_line, s.imports) for s in statements] == [
+        (4, [("json", None, 0)]), (6, [("os", "path", 0), ("os", "sep", 0)])]
+
+def test_python_import_statement_parse_error(caplog):
+    match = {"path": "a.py", "start": {"line": 1, "col": 1}, "end": {"line": 1, "col": 10},
+             "extra": {"lines": "import (a"}}
+    assert sm.SemgreplImportStatement(match).imports == []
+    assert "a.py:1" in caplog.text
+
+def test_python_import_graph_deep_relative():
+    root = os.path.abspath("tests/testcases/python/import_graph_deep")
+    config = sm.init(root)
+    graph = sm.import_graph(config)
+    worker = os.path.join(root, "pkg/a/b/c/worker.py")
+    assert graph.imports_of(worker) == [os.path.join(root, "pkg/a/b/c/helpers.py"),
+                                        os.path.join(root, "pkg/a/settings.py")]
+    assert graph.external == set()
@@ -0,0 +1,69 @@
+import asyncio
+import pytest
+import semgrepl.main as sm
+from semgrepl.config import SemgreplConfig
+
+def test_python_index_by_name(tmp_path):
+    config = SemgreplConfig(["tests/testcases/python/function_calls"], sm.DEFAULT_RULES_DIR,
+                            cache_dir=str(tmp_path))
+    index = sm.build_index(config)
+    assert [d.name for d in sm.function_defs_by_name(config, "foo")] == ["foo"]
+    assert [c.instance for c in sm.function_calls_by_name(config, "write")] == ["tf"]
+    assert sm.classes_by_name(config, "Handler") == []
+
+    foo = index.defs_by_name["foo"][0]
+    assert [c.name for c in index.calls_in(foo)] == ["bar"]
+    assert index.enclosing_function(index.calls_by_name["bar"][0]) is foo
+
+def test_python_index_reload(tmp_path):
+    target = tmp_path / "target"
+    target.mkdir()
+    (target / "a.py").write_text("def foo():\n    pass\n")
+    config = SemgreplConfig([str(target)], sm.DEFAULT_RULES_DIR, cache_dir=str(tmp_path / "cache"))
+    sm.build_index(config)
+
+    (target / "a.py").write_text("def bar():\n    pass\n")
+    config = SemgreplConfig([str(target)], sm.DEFAULT_RULES_DIR, cache_dir=str(tmp_path / "cache"))
+    index = sm.build_index(config)
+    assert list(index.defs_by_name) == ["bar"]
+
+def test_python_index_dotted_name(tmp_path):
+    config = SemgreplConfig(["tests/testcases/python/function_calls"], sm.DEFAULT_RULES_DIR,
+                            cache_dir=str(tmp_path))
+    before = [(c.file_path, c.start_line) for c in sm.function_calls_by_name(config, "tf.write")]
+    sm.build_index(config)
+    # Not a bare name, so answered by semgrep rather than the index
+    assert [(c.file_path, c.start_line) for c in sm.function_calls_by_name(config, "tf.write")] == before
+    assert len(before) == 1
+
+def test_python_index_not_stale(tmp_path):
+    target = tmp_path / "target"
+    target.mkdir()
+    (target / "a.py").write_text("def foo():\n    pass\n")
+    config = SemgreplConfig([str(target)], sm.DEFAULT_RULES_DIR, cache_dir=str(tmp_path / "cache"))
+    sm.build_index(config)
+    (target / "b.py").write_text("def foo():\n    pass\n")
+    assert sorted(d.file_path for d in sm.function_defs_by_name(config, "foo")) == [
+        str(target / "a.py"), str(target / "b.py")]
+
+def test_python_index_check_throttled(tmp_path, monkeypatch):
+    target = tmp_path / "target"
+    target.mkdir()
+    (target / "a.py").write_text("def foo():\n    pass\n")
+    config = SemgreplConfig([str(target)], sm.DEFAULT_RULES_DIR, cache_dir=str(tmp_path / "cache"))
+    sm.build_index(config)
+
+    checks = []
+    changed_files = sm.Snapshot.changed_files
+    monkeypatch.setattr(sm.Snapshot, "changed_files", lambda self, t: checks.append(t) or changed_files(self, t))
+    monkeypatch.setattr(sm.Snapshot, "take", lambda *args: pytest.fail("nothing changed"))
+    for name in ["foo", "bar", "baz"]:
+        sm.function_defs_by_name(config, name)
+    assert len(checks) == 1
+
+def test_python_index_async(tmp_path):
+    config = SemgreplConfig(["tests/testcases/python/function_calls"], sm.DEFAULT_RULES_DIR,
+                            cache_dir=str(tmp_path))
+    sm.build_index(config)
+    defs = asyncio.run(sm.afunction_defs_by_name(config, "foo"))
+    assert [d.name for d in defs] == ["foo"]
@@ -0,0 +1,13 @@
+import semgrepl.main as sm
+
+def test_python_iter_function_calls():
+    config = sm.init("tests/testcases/python/function_calls")
+    expected = [c.location for c in sm.function_calls(config)]
+    calls = sm.iter_function_calls(config, batch_size=1)
+    assert not isinstance(calls, list)
+    assert sorted(c.location for c in calls) == sorted(expected)
+
+def test_python_iter_many():
+    config = sm.init("tests/testcases/python/function_calls/simple.py")
+    results = list(sm.iter_many(config, ["function-defs.yaml", "function-calls.yaml"]))
+    assert sorted((index, x.name) for index, x in results) == [(0, "bar"), (0, "foo"), (1, "bar")]
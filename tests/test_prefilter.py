@@ -0,0 +1,24 @@
+import shutil
+import semgrepl.main as sm
+
+def test_python_prefilter_skips_files_without_literal():
+    config = sm.init("tests/testcases/python")
+    config.cache = None
+    calls = sm.function_calls_by_name(config, "exec")
+    assert sorted(c.file_path.rsplit("/", 1)[-1] for c in calls) == ["simple.py"]
+    assert calls.stats.counters["files"] == 1
+    assert calls.stats.counters["prefiltered_files"] > 0
+
+    # Metavariables can match anything, so nothing is skipped
+    defs = sm.function_defs(config)
+    assert "prefiltered_files" not in defs.stats.counters
+
+def test_python_prefilter_custom_rules_dir(tmp_path):
+    # Rules of another rules dir may match without the literal, so every
+    # file is scanned
+    rules_dir = str(tmp_path / "rules")
+    shutil.copytree(sm.DEFAULT_RULES_DIR, rules_dir)
+    config = sm.init("tests/testcases/python", rules_dir=rules_dir)
+    config.cache = None
+    calls = sm.function_calls_by_name(config, "exec")
+    assert "prefiltered_files" not in calls.stats.counters
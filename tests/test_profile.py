@@ -0,0 +1,25 @@
+import shutil
+import semgrepl.main as sm
+from semgrepl.config import SemgreplConfig
+
+def test_python_profile(tmp_path):
+    target = tmp_path / "app"
+    shutil.copytree("tests/testcases/python/profile", str(target))
+    config = SemgreplConfig([str(target)], sm.DEFAULT_RULES_DIR, cache_dir=str(tmp_path / "cache"))
+
+    report = sm.profile(config)
+    assert sorted(i.import_path for i in report.imports) == ["os", "pickle", "subprocess"]
+    assert [c.name for c in report.classes] == ["Handler"]
+    assert [(r.path, r.function_name, r.method) for r in report.routes] == [("/users/<id>", "user", "route"),
+                                                                           ("/run", "run", "post")]
+    assert sorted(s.category for s in report.sinks) == ["deserialization", "env", "env", "eval", "shell"]
+    assert report.annotations['@app.route("/users/<id>")'] == 1
+    assert report.languages["app"]["Python"]["files"] == 1
+
+    # A new session loads the saved report, rescanning only changed files
+    (target / "app.py").write_text("import os\n\nos.system('ls')\n")
+    config = SemgreplConfig([str(target)], sm.DEFAULT_RULES_DIR, cache_dir=str(tmp_path / "cache"))
+    report = sm.profile(config)
+    assert [i.import_path for i in report.imports] == ["os"]
+    assert [s.category for s in report.sinks] == ["shell"]
+    assert report.routes == []
@@ -0,0 +1,18 @@
+import semgrepl.main as sm
+from semgrepl.config import SemgreplConfig
+
+def test_python_refresh_changed_file(tmp_path):
+    (tmp_path / "a.py").write_text("def foo():\n    pass\n")
+    (tmp_path / "b.py").write_text("def bar():\n    pass\n")
+    config = SemgreplConfig([str(tmp_path)], sm.DEFAULT_RULES_DIR, cache_dir=None)
+    defs = sm.function_defs(config)
+    assert sorted(d.name for d in defs) == ["bar", "foo"]
+
+    (tmp_path / "a.py").write_text("def foo():\n    pass\n\ndef baz():\n    pass\n")
+    (tmp_path / "b.py").unlink()
+    (tmp_path / "c.py").write_text("def qux():\n    pass\n")
+    changed = sm.refresh(config)
+
+    assert changed == {str(tmp_path / x) for x in ["a.py", "b.py", "c.py"]}
+    assert sorted(d.name for d in defs) == ["baz", "foo", "qux"]
+    assert sm.refresh(config) == set()
@@ -0,0 +1,44 @@
+import semgrepl.main as sm
+from semgrepl.resultset import ResultSet
+
+VIEWS = "tests/testcases/python/resultset/views.py"
+
+def _lines(results):
+    return sorted(x.start_line for x in results)
+
+def test_python_result_set_algebra():
+    config = sm.init(VIEWS)
+    calls = sm.function_calls(config).to_set()
+    renders = sm.function_calls_by_name(config, "render").to_set()
+    systems = sm.function_calls_by_name(config, "system").to_set()
+
+    assert len(ResultSet(list(renders) + list(renders))) == 3
+    assert _lines(renders | systems) == [6, 10, 11, 17, 19]
+    assert _lines(calls & renders) == [6, 11, 19]
+    assert all(x in calls for x in renders)
+    assert [x.name for x in calls - renders - systems] == ["helper"]
+    assert _lines(renders ^ (systems | renders.filter(lambda x: x.start_line == 6))) == [10, 11, 17, 19]
+
+def test_python_result_set_joins():
+    config = sm.init(VIEWS)
+    defs = sm.function_defs(config).to_set()
+    calls = sm.function_calls(config).to_set()
+    systems = sm.function_calls_by_name(config, "system").to_set()
+
+    assert sorted(d.name for d in defs.containing(systems)) == ["admin", "helper", "run"]
+    assert [d.name for d in defs.not_containing(systems)] == ["profile"]
+    protected = defs.filter(lambda d: "@login_required" in d.annotations)
+    assert _lines(systems.inside(protected)) == [17]
+    assert _lines(systems.not_inside(protected)) == [10]
+
+    # Calls whose own function lacks @login_required
+    pairs = systems.join_enclosing(defs)
+    assert [(c.start_line, f.name) for c, f in pairs] == [(10, "admin"), (17, "helper")]
+    groups = dict((f.name, _lines(g)) for f, g in calls.group_by_enclosing(defs))
+    assert groups["run"] == [18, 19]
+    assert groups["helper"] == [17]
+
+    imports = sm.imports(config)
+    assert len(systems.in_files_of(imports)) == 2
+    assert len(systems.not_in_files_of(imports)) == 0
+    assert [len(same_file) for _, same_file in systems.join_file(imports)] == [1, 1]
@@ -0,0 +1,41 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+import semgrepl.main as sm
+import semgrepl.rules
+
+def test_python_run_many_simple():
+    config = sm.init("tests/testcases/python/function_calls/simple.py")
+    defs, calls = sm.run_many(config, ["function-defs.yaml", "function-calls.yaml"])
+    assert sorted(d.name for d in defs) == ["bar", "foo"]
+    assert len(calls) == 1
+    assert calls[0].name == "bar"
+
+def test_python_run_many_template_vars():
+    config = sm.init("tests/testcases/python/function_calls/simple.py")
+    defs, classes = sm.run_many(config, [("function-defs.yaml", {"function_name": "foo"}), "classes.yaml"])
+    assert len(defs) == 1
+    assert defs[0].name == "foo"
+    assert len(classes) == 0
+
+def test_python_run_many_workers():
+    serial = sm.init("tests/testcases/python/function_calls")
+    parallel = sm.init("tests/testcases/python/function_calls", workers=2)
+    expected = [c.location for c in sm.run_many(serial, ["function-calls.yaml"])[0]]
+    assert [c.location for c in sm.run_many(parallel, ["function-calls.yaml"])[0]] == expected
+
+def test_python_config_close():
+    with sm.init("tests/testcases/python/function_calls", workers=2) as config:
+        sm.run_many(config, ["function-calls.yaml"])
+        executor = config.executor
+    assert config.cache is None
+    with pytest.raises(RuntimeError):
+        executor.submit(int)
+
+def test_config_path_concurrent():
+    rules = [{"id": "concurrent-{}".format(i), "pattern": "x", "languages": ["python"]} for i in range(200)]
+    with ThreadPoolExecutor(8) as pool:
+        paths = list(pool.map(lambda _: semgrepl.rules.config_path(rules), range(32)))
+    assert len(set(paths)) == 1
+    with open(paths[0]) as f:
+        assert json.load(f) == {"rules": rules}
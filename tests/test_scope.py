@@ -0,0 +1,16 @@
+import semgrepl.main as sm
+
+def test_python_scope_methods_of_class():
+    config = sm.init("tests/testcases/python/scope/simple.py")
+    handlers = sm.classes_by_name(config, "Handler")
+    gets = sm.function_defs_by_name(config, "get", scope=handlers)
+    assert [g.start_line for g in gets] == [2]
+
+    calls = sm.function_calls(config, scope=gets)
+    assert [(c.name, c.start_line) for c in calls] == [("render", 3)]
+
+def test_python_scope_from_index():
+    config = sm.init("tests/testcases/python/scope/simple.py")
+    sm.build_index(config, rebuild=True)
+    others = sm.classes_by_name(config, "Other")
+    assert [g.start_line for g in sm.function_defs_by_name(config, "get", scope=others)] == [10]
@@ -0,0 +1,54 @@
+import semgrepl.main as sm
+import semgrepl.session
+from semgrepl.config import SemgreplConfig
+
+def test_python_session_save_and_reopen(tmp_path):
+    (tmp_path / "a.py").write_text("import os\n\ndef foo():\n    os.system('ls')\n")
+    db = str(tmp_path / "session.sqlite3")
+    config = SemgreplConfig([str(tmp_path / "a.py")], sm.DEFAULT_RULES_DIR, cache_dir=None)
+    sm.open_session(config, db)
+    calls = sm.function_calls(config)
+    defs = sm.function_defs(config)
+    sm.close_session(config)
+
+    # A new session reads them back without scanning
+    config = SemgreplConfig([str(tmp_path / "a.py")], sm.DEFAULT_RULES_DIR, cache_dir=None)
+    session = sm.open_session(config, db)
+    assert set(session.result_sets()) == {calls.session_name, defs.session_name}
+    reopened = sm.saved(config, calls.session_name)
+    assert [(c.name, c.instance, c.start_line) for c in reopened] == [(c.name, c.instance, c.start_line) for c in calls]
+    assert reopened.query == calls.query
+    assert [d.name for d in session.select("function_defs", "name = ?", ("foo",))] == ["foo"]
+    assert session.sql("SELECT COUNT(*) FROM function_calls")[0][0] == len(calls)
+
+def test_python_session_saved_catches_up(tmp_path):
+    (tmp_path / "a.py").write_text("def foo():\n    pass\n")
+    db = str(tmp_path / "session.sqlite3")
+    config = SemgreplConfig([str(tmp_path / "a.py")], sm.DEFAULT_RULES_DIR, cache_dir=None)
+    sm.open_session(config, db)
+    sm.function_defs(config)
+    sm.close_session(config)
+
+    (tmp_path / "a.py").write_text("def foo():\n    pass\n\ndef bar():\n    pass\n")
+    config = SemgreplConfig([str(tmp_path / "a.py")], sm.DEFAULT_RULES_DIR, cache_dir=None)
+    sm.open_session(config, db)
+    defs = sm.saved(config, "function-defs.yaml function_name=$X")
+    assert sorted(d.name for d in defs) == ["bar", "foo"]
+
+def test_python_session_tags(tmp_path):
+    config = SemgreplConfig(["tests/testcases/python/classes/simple.py"], sm.DEFAULT_RULES_DIR, cache_dir=None)
+    session = sm.open_session(config, str(tmp_path / "session.sqlite3"))
+    classes = sm.classes(config)
+    first, rest = classes[0], classes[1:]
+    session.tag(first, semgrepl.session.INTERESTING, "look at this")
+    session.tag(rest, semgrepl.session.REVIEW_LATER)
+
+    assert session.tags(first) == {semgrepl.session.INTERESTING: "look at this"}
+    assert [c.name for c in session.tagged(semgrepl.session.INTERESTING)] == [first.name]
+    assert len(session.tagged(semgrepl.session.REVIEW_LATER, "classes")) == len(rest)
+
+    # Tags belong to the finding, not to one run of the query
+    sm.classes_by_name(config, first.name)
+    assert len(session.tagged(semgrepl.session.INTERESTING)) == 1
+    session.untag(first)
+    assert session.tags(first) == {}
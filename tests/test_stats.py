@@ -0,0 +1,25 @@
+import json
+import semgrepl.main as sm
+from semgrepl.config import SemgreplConfig
+
+def test_python_stats(tmp_path):
+    config = SemgreplConfig(["tests/testcases/python/function_calls/simple.py"], sm.DEFAULT_RULES_DIR,
+                            cache_dir=str(tmp_path / "cache"))
+    defs, calls = sm.run_many(config, ["function-defs.yaml", "function-calls.yaml"])
+    assert defs.stats is calls.stats
+    assert defs.stats.counters["files"] == 1
+    assert defs.stats.counters["matches"] == 3
+    assert defs.stats.counters["objects"] == 3
+    assert defs.stats.counters["json_bytes"] > 0
+    assert set(defs.stats.timings) >= {"render", "cache", "write", "semgrep", "decode", "build"}
+
+    # Served from the result cache the second time
+    again = sm.function_defs(config)
+    assert again.stats.counters["cached_files"] == 1
+    assert "semgrep" not in again.stats.timings
+    assert config.stats.counters["objects"] == 5
+
+    trace = tmp_path / "trace.json"
+    config.stats.export_trace(str(trace))
+    events = json.loads(trace.read_text())["traceEvents"]
+    assert {e["name"] for e in events} >= {"render", "semgrep", "build"}
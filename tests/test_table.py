@@ -0,0 +1,26 @@
+import semgrepl.main as sm
+
+def test_python_table_counts():
+    config = sm.init("tests/testcases/python/function_calls/instance.py")
+    table = sm.function_calls(config).to_table()
+    assert len(table) == 3
+    assert table.where(instance="tf").counts("name") == {"write": 1, "flush": 1}
+
+def test_python_table_join():
+    config = sm.init("tests/testcases/python/function_calls")
+    defs, calls = sm.run_many(config, ["function-defs.yaml", "function-calls.yaml"])
+    left, right = defs.to_table().join(calls.to_table(), on=("file_path",))
+    pairs = sorted((defs[i].name, calls[j].name) for i, j in zip(left, right))
+    assert pairs == [("bar", "bar"), ("foo", "bar")]
+
+def _sink(path, line, category):
+    return sm.SemgreplSink({"path": path, "check_id": "sink-" + category,
+                            "start": {"line": line, "col": 1}, "end": {"line": line, "col": 10}, "extra": {}})
+
+def test_print_match_summary_counts_like_eq(capsys):
+    sinks = [_sink("a.py", 1, "shell"), _sink("a.py", 2, "shell"), _sink("a.py", 2, "shell"),
+             _sink("b.py", 1, "eval")]
+    expected = sm.count_collection(sm.collect_matches(sinks))
+    sm.print_match_summary(sinks)
+    assert capsys.readouterr().out == "eval: 1\nshell: 2\n"
+    assert expected == {"shell": 2, "eval": 1}
@@ -0,0 +1,24 @@
+import asyncio
+import os
+import semgrepl.main as sm
+
+def test_python_worker_pool():
+    config = sm.init("tests/testcases/python/function_calls/simple.py", workers=2)
+    config.cache = None
+    sm.start_workers(config)
+    try:
+        defs, calls = sm.run_many(config, ["function-defs.yaml", "function-calls.yaml"])
+
+        async def run():
+            return await sm.afunction_defs(config)
+
+        adefs = asyncio.run(run())
+    finally:
+        sm.stop_workers(config)
+    assert sorted(d.name for d in defs) == ["bar", "foo"]
+    assert [c.name for c in calls] == ["bar"]
+    assert sorted(d.name for d in adefs) == ["bar", "foo"]
+    assert config.worker_pool is None
+    # The sync scans ran here, only the async one went to a worker
+    assert {pid for stage, _, _, pid, _ in defs.stats.spans if stage == "semgrep"} == {os.getpid()}
+    assert {pid for stage, _, _, pid, _ in adefs.stats.spans if stage == "semgrep"} - {os.getpid()}
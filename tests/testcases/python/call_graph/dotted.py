@@ -0,0 +1,11 @@
+import os
+
+class Handler:
+    def get(self):
+        self.helper()
+
+    def helper(self):
+        os.system("ls")
+
+def main():
+    Handler().get()
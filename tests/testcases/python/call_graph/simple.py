@@ -0,0 +1,11 @@
+def main():
+    handle()
+
+def handle():
+    run("ls")
+
+def run(cmd):
+    exec(cmd)
+
+def unused():
+    run("pwd")
@@ -0,0 +1,20 @@
+import tornado.web
+from tornado import web
+from tornado.web import RequestHandler
+import django
+
+
+class Full(tornado.web.RequestHandler):
+    pass
+
+
+class Module(web.RequestHandler):
+    pass
+
+
+class Bare(RequestHandler):
+    pass
+
+
+class Other(django.RequestHandler):
+    pass
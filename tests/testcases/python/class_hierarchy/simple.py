@@ -0,0 +1,29 @@
+import web
+
+
+class BaseHandler(web.RequestHandler):
+    def prepare(self):
+        pass
+
+    def get(self):
+        pass
+
+
+class LoginHandler(BaseHandler):
+    def get(self):
+        def helper():
+            pass
+        return helper()
+
+    class Form:
+        def validate(self):
+            pass
+
+
+class AdminLoginHandler(LoginHandler, Mixin):
+    def post(self):
+        pass
+
+
+class Unrelated:
+    pass
@@ -0,0 +1,2 @@
+import os.path
+from .. import models
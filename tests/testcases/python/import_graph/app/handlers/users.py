@@ -0,0 +1,3 @@
+from .base import *
+from requests import (get,
+                      post)
@@ -0,0 +1,2 @@
+import pickle
+from app.handlers import base
@@ -0,0 +1,2 @@
+import app.handlers.users
+import sys
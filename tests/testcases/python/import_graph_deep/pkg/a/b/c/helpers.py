@@ -0,0 +1,2 @@
+def retry():
+    pass
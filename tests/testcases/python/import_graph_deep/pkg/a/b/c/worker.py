@@ -0,0 +1,2 @@
+from ...settings import TIMEOUT
+import pkg.a.b.c.helpers
@@ -0,0 +1 @@
+TIMEOUT = 10
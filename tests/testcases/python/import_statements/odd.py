@@ -0,0 +1,8 @@
+""" Not an import:
+import secrets
+"""
+try: import json
+except ImportError: json = None
+from os import (path,
+                sep)
+HELP = "from shutil import rmtree"
@@ -0,0 +1,21 @@
+import os
+import pickle
+import subprocess
+from flask import Flask
+
+app = Flask(__name__)
+
+
+class Handler(object):
+    pass
+
+
+@app.route("/users/<id>")
+def user(id):
+    return pickle.loads(os.environ["STATE"])
+
+
+@app.post("/run")
+def run():
+    subprocess.call("ls " + os.getenv("DIR"), shell=True)
+    return eval("1 + 1")
@@ -0,0 +1,19 @@
+import os
+
+
+@login_required
+def profile(request):
+    return render(request, "profile.html")
+
+
+def admin(request):
+    os.system(request.GET["cmd"])
+    return render(request, "admin.html")
+
+
+@login_required
+def run(request):
+    def helper():
+        os.system("ls")
+    helper()
+    return render(request, "run.html")
@@ -0,0 +1,15 @@
+class Handler:
+    def get(self):
+        return render()
+
+    def post(self):
+        return save()
+
+
+class Other:
+    def get(self):
+        return render()
+
+
+def get():
+    return render()
@@ -0,0 +1,7 @@
+def greet(name, items):
+    one = f"hello {name}"
+    many = f"""
+    {name}: {", ".join(items)}
+    """
+    nested = f"{f'{name!r}'} and {'plain'}"
+    return one + many + nested